@@ -3,6 +3,7 @@
 import { useState, useEffect } from "react"
 import { useRouter } from "next/navigation"
 import { useAuth } from "@/context/auth-context"
+import { waitForJob } from "@/lib/jobs"
 import { Dumbbell, Salad, BarChart3, Clock, ArrowUpRight, ChevronRight, Flame, Trophy } from "lucide-react"
 
 import { Button } from "@/components/ui/button"
@@ -93,60 +94,32 @@ export default function Dashboard() {
       setLoading(true)
       try {
 
-        const profileResponse = await fetch(`${API_URL}/api/profile`, {
+        // Profile, plans and progress come in one request
+        const dashboardResponse = await fetch(`${API_URL}/api/dashboard/`, {
           headers: {
             Authorization: `Bearer ${user.token}`,
           },
         })
 
-        if (!profileResponse.ok) {
-          throw new Error("Failed to fetch profile")
+        if (!dashboardResponse.ok) {
+          throw new Error("Failed to fetch dashboard")
         }
 
-        const profileData = await profileResponse.json()
-        setUserProfile(profileData)
-
-        // In a real app, these would be actual API calls
-        const workoutResponse = await fetch(`${API_URL}/api/workout-plan`, {
-          headers: {
-            Authorization: `Bearer ${user.token}`,
-          },
-        })
-
-        if (!workoutResponse.ok) {
+        const dashboardData = await dashboardResponse.json()
+        if (!dashboardData.profile) {
+          throw new Error("Failed to fetch profile")
+        }
+        if (!dashboardData.workout_plan) {
           throw new Error("Failed to fetch workout plan")
         }
-
-        const workoutData = await workoutResponse.json()
-        setWorkoutPlan(workoutData)
-
-        // Simulated meal plan data
-        const mealPlanResponse = await fetch(`${API_URL}/api/meal-plan`, {
-          headers: {
-            Authorization: `Bearer ${user.token}`,
-          },
-        })
-
-        if (!mealPlanResponse.ok) {
+        if (!dashboardData.meal_plan) {
           throw new Error("Failed to fetch meal plan")
         }
 
-        const mealPlanData = await mealPlanResponse.json()
-        setMealPlan(mealPlanData)
-
-        // fetch progress data
-        const progressResponse = await fetch(`${API_URL}/api/progress`, {
-          headers: {
-            Authorization: `Bearer ${user.token}`,
-          },
-        })
-
-        if (!progressResponse.ok) {
-          throw new Error("Failed to fetch progress data")
-        }
-
-        const progressData = await progressResponse.json()
-        setProgress(progressData)
+        setUserProfile(dashboardData.profile)
+        setWorkoutPlan(dashboardData.workout_plan)
+        setMealPlan(dashboardData.meal_plan)
+        setProgress(dashboardData.progress)
 
         const currentDate = new Date();
         const dayOfWeek = currentDate.toLocaleDateString("en-US", { weekday: "long" });
@@ -167,54 +140,30 @@ export default function Dashboard() {
     if (!progress) return;
 
     try {
-      // Get today's date as YYYYMMDD integer
+      // Record the workout, the server updates the streak and totals
       const today = new Date();
-      const formattedToday = parseInt(
-        `${today.getFullYear()}${(today.getMonth() + 1).toString().padStart(2, "0")}${today.getDate().toString().padStart(2, "0")}`
-      );
-
-      let newStreak = progress.streak;
-
-      // Check if the API provides last_workout_day
-      if (progress.last_workout_day) {
-        const lastWorkoutDay = progress.last_workout_day;
-
-        if (formattedToday === lastWorkoutDay) {
-          // Same day workout, don't increase streak
-          newStreak = progress.streak;
-        } else if (formattedToday === lastWorkoutDay + 1) {
-          // Consecutive day, increase streak
-          newStreak = progress.streak + 1;
-        } else {
-          // Missed a day, reset streak
-          newStreak = 1;
-        }
-      }
-
-      // Update progress
+      const formattedToday = `${today.getFullYear()}-${(today.getMonth() + 1).toString().padStart(2, "0")}-${today.getDate().toString().padStart(2, "0")}`;
       const randomCalories = Math.floor(Math.random() * (500 - 300 + 1)) + 300;
-      const updatedProgress = {
-        ...progress,
-        workouts_completed: progress.workouts_completed + 1,
-        streak: newStreak,
-        calories_burned: progress.calories_burned + randomCalories,
-        last_workout_day: formattedToday,
-      };
 
-      const response = await fetch(`${API_URL}/api/progress`, {
+      const response = await fetch(`${API_URL}/api/progress/events/`, {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
           Authorization: `Bearer ${user?.token}`,
         },
-        body: JSON.stringify(updatedProgress),
+        body: JSON.stringify({
+          events: [{ kind: "workout", date: formattedToday, value: randomCalories }],
+        }),
       });
-      console.log(user)
 
       if (!response.ok) {
         throw new Error("Failed to finish workout");
       }
 
+      const { progress: summary } = await response.json();
+      const updatedProgress: ProgressData = { ...progress, ...summary };
+      const newStreak = updatedProgress.streak;
+
       const popup = document.createElement("div");
       popup.className = "fixed inset-0 flex items-center justify-center bg-black bg-opacity-50 z-50";
       popup.innerHTML = `
@@ -244,7 +193,8 @@ export default function Dashboard() {
         throw new Error("Failed to fetch new workout plan");
       }
 
-      const newWorkoutData = await newWorkoutResponse.json();
+      const { job_id } = await newWorkoutResponse.json();
+      const newWorkoutData = await waitForJob<WorkoutPlan>(API_URL, user!.token, job_id);
       setWorkoutPlan(newWorkoutData);
       removePopup();
     } catch (error) {
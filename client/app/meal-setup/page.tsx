@@ -15,6 +15,7 @@ import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from "@
 import { Input } from "@/components/ui/input"
 import { Badge } from "@/components/ui/badge"
 import { useAuth } from "@/context/auth-context"
+import { waitForJob } from "@/lib/jobs"
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from "@/components/ui/card"
 
 const formSchema = z.object({
@@ -87,6 +88,9 @@ export default function MealSetup() {
         throw new Error("Failed to create meal plan")
       }
 
+      const { job_id } = await response.json()
+      await waitForJob(API_URL, user.token, job_id)
+
       setHasMealPlan(true)
       router.push("/dashboard")
     } catch (err) {
@@ -13,6 +13,7 @@ import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from "@
 import { Input } from "@/components/ui/input"
 import { Checkbox } from "@/components/ui/checkbox"
 import { useAuth } from "@/context/auth-context"
+import { waitForJob } from "@/lib/jobs"
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from "@/components/ui/card"
 import { ApiError } from "next/dist/server/api-utils"
 
@@ -78,6 +79,9 @@ export default function WorkoutSetup() {
         throw new Error("Failed to create workout plan")
       }
 
+      const { job_id } = await response.json()
+      await waitForJob(API_URL, user.token, job_id)
+
       setHasWorkoutPlan(true)
       router.push("/meal-setup")
     } catch (err) {
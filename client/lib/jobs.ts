@@ -0,0 +1,44 @@
+export type Job<T = unknown> = {
+  id: string
+  kind: string
+  status: "queued" | "running" | "succeeded" | "failed"
+  result: T | null
+  error: string | null
+}
+
+// Plan generation endpoints return 202 with a job id, poll until it finishes
+export async function waitForJob<T = unknown>(
+  apiUrl: string,
+  token: string,
+  jobId: string,
+  intervalMs = 1000,
+): Promise<T> {
+  while (true) {
+    const response = await fetch(`${apiUrl}/api/jobs/${jobId}`, {
+      headers: {
+        Authorization: `Bearer ${token}`,
+      },
+    })
+
+    if (response.status === 429) {
+      // Rate limited, wait as long as the server asks before polling again
+      const retryAfter = Number(response.headers.get("Retry-After")) || 1
+      await new Promise((resolve) => setTimeout(resolve, retryAfter * 1000))
+      continue
+    }
+
+    if (!response.ok) {
+      throw new Error("Failed to fetch job status")
+    }
+
+    const job: Job<T> = await response.json()
+    if (job.status === "succeeded") {
+      return job.result as T
+    }
+    if (job.status === "failed") {
+      throw new Error(job.error || "Plan generation failed")
+    }
+
+    await new Promise((resolve) => setTimeout(resolve, intervalMs))
+  }
+}
@@ -1,24 +1,218 @@
 """The logic for the fitmate LLM interactions."""
 
+import asyncio
+import json
+import logging
 import os
-import sys
+import random
+import time
+from collections import deque
+from contextlib import aclosing
 from threading import Lock
 
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.output_parsers import JsonOutputParser
 from langchain_core.exceptions import OutputParserException
+from langchain_core.output_parsers import JsonOutputParser
 from pydantic import ValidationError
 
-from prompts import DIET_PLAN_PROMPT, WORKOUT_PLAN_PROMPT
+from cache import plan_cache_key
+from metrics import LLM_CALLS, LLM_RETRIES, record_llm_usage, span, timed
 from models import ServerDietResponse, ServerWorkoutResponse
+from plans import merge_days, summarize_days
+from prompt_builder import (
+    DIET_DAYS_PROMPT,
+    DIET_PLAN_PROMPT,
+    WORKOUT_DAYS_PROMPT,
+    WORKOUT_PLAN_PROMPT,
+)
+from providers import create_provider
+from repair import PLAN_SHAPES, count, repair_day, repair_response
+from scheduler import PriorityScheduler
+from singleflight import SingleFlight
+from streaming import IncrementalArrayParser
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of LLM calls that may be outstanding at once, shared by the
+# sync and async generation paths and handed out by priority.
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "16"))
+
+# Retry policy and circuit breaker settings for model calls.
+LLM_CALL_TIMEOUT = float(os.environ.get("LLM_CALL_TIMEOUT", "30"))
+LLM_TOTAL_TIMEOUT = float(os.environ.get("LLM_TOTAL_TIMEOUT", "90"))
+LLM_RETRY_BASE_DELAY = float(os.environ.get("LLM_RETRY_BASE_DELAY", "0.5"))
+LLM_RETRY_MAX_DELAY = float(os.environ.get("LLM_RETRY_MAX_DELAY", "8"))
+LLM_BREAKER_FAILURE_RATE = float(
+    os.environ.get("LLM_BREAKER_FAILURE_RATE", "0.5")
+)
+LLM_BREAKER_WINDOW = int(os.environ.get("LLM_BREAKER_WINDOW", "20"))
+LLM_BREAKER_MIN_CALLS = int(os.environ.get("LLM_BREAKER_MIN_CALLS", "5"))
+LLM_BREAKER_RESET_TIMEOUT = float(
+    os.environ.get("LLM_BREAKER_RESET_TIMEOUT", "30")
+)
+
+# HTTP statuses and provider error names worth retrying.
+TRANSIENT_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+TRANSIENT_ERROR_NAMES = {
+    "DeadlineExceeded",
+    "InternalServerError",
+    "ResourceExhausted",
+    "ServiceUnavailable",
+    "TooManyRequests",
+    "ConnectError",
+    "ReadTimeout",
+    "RemoteProtocolError",
+}
+
+
+def is_transient_error(error):
+    """Return whether a failed model call is worth retrying.
+
+    Timeouts, connection errors, rate limiting and 5xx responses are
+    transient. Provider SDKs are matched on status codes and error names so
+    no particular client library has to be imported.
+    """
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    for attribute in ("code", "status_code"):
+        code = getattr(error, attribute, None)
+        if isinstance(code, int) and code in TRANSIENT_STATUS_CODES:
+            return True
+    return any(
+        cls.__name__ in TRANSIENT_ERROR_NAMES for cls in type(error).__mro__
+    )
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter, bounded by an overall deadline."""
+
+    def __init__(
+        self,
+        base_delay=LLM_RETRY_BASE_DELAY,
+        max_delay=LLM_RETRY_MAX_DELAY,
+        call_timeout=LLM_CALL_TIMEOUT,
+        total_timeout=LLM_TOTAL_TIMEOUT,
+    ):
+        """
+        Args:
+            base_delay (float): The backoff before the second attempt, in
+                seconds.
+            max_delay (float): The upper bound of a single backoff, in seconds.
+            call_timeout (float): The timeout of a single model call, in
+                seconds. Async calls are cancelled after it, sync calls rely
+                on the provider client's timeout, which is set to it.
+            total_timeout (float): The deadline for all attempts, in seconds.
+        """
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.call_timeout = call_timeout
+        self.total_timeout = total_timeout
+
+    def deadline(self):
+        """float: The monotonic time by which all attempts must be done."""
+        return time.monotonic() + self.total_timeout
+
+    def backoff(self, attempt):
+        """Return a random delay before retrying after the given attempt."""
+        ceiling = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return random.uniform(0, ceiling)
+
+    def timeout(self, deadline):
+        """Return the timeout for the next call, capped by the deadline."""
+        return max(0.0, min(self.call_timeout, deadline - time.monotonic()))
+
 
-GEMINI_MODEL = "gemini-2.0-flash-lite"
+class CircuitOpenError(Exception):
+    """Raised instead of calling the model while the circuit is open."""
 
-try:
-    GOOGLE_API_KEY = os.environ["GOOGLE_API_KEY"]
-except KeyError as e:
-    print("GOOGLE_API_KEY not set. Please set it in your environment variables.")
-    sys.exit(1)
+
+class CircuitBreaker:
+    """Fails model calls fast when the provider's error rate is too high.
+
+    The breaker opens when at least `failure_rate` of the last `window`
+    calls failed, rejects calls for `reset_timeout` seconds, then lets a
+    single trial call through and closes again if it succeeds.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_rate=LLM_BREAKER_FAILURE_RATE,
+        window=LLM_BREAKER_WINDOW,
+        min_calls=LLM_BREAKER_MIN_CALLS,
+        reset_timeout=LLM_BREAKER_RESET_TIMEOUT,
+    ):
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.opened_at = None
+        self.trips = 0
+        self.rejected = 0
+        self._outcomes = deque(maxlen=window)
+        self._trial_running = False
+        self._lock = Lock()
+
+    def _current_failure_rate(self):
+        if not self._outcomes:
+            return 0.0
+        return self._outcomes.count(False) / len(self._outcomes)
+
+    def before_call(self):
+        """Raise `CircuitOpenError` unless a call may go through."""
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at >= self.reset_timeout:
+                    self.state = self.HALF_OPEN
+                    self._trial_running = False
+            if self.state == self.HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return
+            if self.state == self.CLOSED:
+                return
+            self.rejected += 1
+            raise CircuitOpenError("LLM circuit breaker is open")
+
+    def record_success(self):
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.CLOSED
+                self._outcomes.clear()
+            self._outcomes.append(True)
+
+    def record_cancelled(self):
+        """Forget a call that was cancelled before it finished.
+
+        A cancelled call says nothing about the provider, but if it was the
+        trial call, the next call becomes the trial.
+        """
+        with self._lock:
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._outcomes.append(False)
+            if self.state == self.HALF_OPEN or (
+                self.state == self.CLOSED
+                and len(self._outcomes) >= self.min_calls
+                and self._current_failure_rate() >= self.failure_rate
+            ):
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self.trips += 1
+
+    def snapshot(self):
+        """dict: The breaker state for monitoring."""
+        with self._lock:
+            return {
+                "state": self.state,
+                "failure_rate": round(self._current_failure_rate(), 3),
+                "calls_in_window": len(self._outcomes),
+                "trips": self.trips,
+                "rejected": self.rejected,
+            }
 
 
 class WorkoutTrainer:
@@ -35,9 +229,345 @@ class WorkoutTrainer:
         return cls._instance
 
     def __init__(self):
-        """Initialize the Gemini LLM instance."""
-        self.llm = ChatGoogleGenerativeAI(model=GEMINI_MODEL, api_key=GOOGLE_API_KEY)
+        """Initialize the configured model provider."""
+        # __init__ runs on every WorkoutTrainer() call, keep the shared state.
+        if getattr(self, "_initialized", False):
+            return
+        self.llm = create_provider(default_timeout=LLM_CALL_TIMEOUT)
+        # Retries are handled by `retry_policy`, not by the provider.
+        self.retry_policy = RetryPolicy(call_timeout=self.llm.timeout)
         self.parser = JsonOutputParser()
+        self.limiter = PriorityScheduler(LLM_MAX_CONCURRENCY)
+        self.breaker = CircuitBreaker()
+        # Identical concurrent requests share one model call.
+        self.flights = SingleFlight()
+        self._initialized = True
+
+    @timed("llm.parse")
+    def _parse(self, response, response_model):
+        """Parse the LLM response and validate it against the response model."""
+        output = self.parser.parse(response.content)
+        response_model(**output)
+        return output
+
+    def _on_call_error(self, error, attempt, max_retries):
+        """Record a failed model call and re-raise it unless it is transient."""
+        self.breaker.record_failure()
+        LLM_CALLS.inc(outcome="error")
+        if not is_transient_error(error):
+            raise error
+        self._log_retry("error", error, attempt, max_retries)
+
+    def _on_call_success(self, response):
+        self.breaker.record_success()
+        LLM_CALLS.inc(outcome="success")
+        record_llm_usage(response)
+
+    def _on_parse_error(self, error, attempt, max_retries):
+        self._log_retry("malformed", error, attempt, max_retries)
+
+    def _log_retry(self, reason, error, attempt, max_retries):
+        LLM_RETRIES.inc(reason=reason)
+        logger.warning(
+            json.dumps(
+                {
+                    "event": "llm_retry",
+                    "reason": reason,
+                    "error": f"{type(error).__name__}: {error}",
+                    "attempt": attempt,
+                    "max_retries": max_retries,
+                }
+            )
+        )
+
+    @timed("llm.repair")
+    def _repair_locally(self, response, response_model):
+        """Repair malformed output without calling the model.
+
+        Returns:
+            tuple[dict, list[str]] | None: The repaired output and the days
+                that could not be repaired, or None if nothing is usable.
+        """
+        try:
+            output, broken = repair_response(response.content, response_model)
+        except ValueError as e:
+            logger.warning(f"Could not repair response: {e}")
+            count("unrepairable")
+            return None
+        if not output[PLAN_SHAPES[response_model][0]]:
+            count("unrepairable")
+            return None
+        if not broken:
+            count("repaired")
+        return output, broken
+
+    def _merge_salvaged(self, output, broken, salvaged, response_model):
+        """Merge the regenerated broken days into the repaired output."""
+        if "error" in salvaged:
+            count("salvage_failed")
+            return None
+        array_key = PLAN_SHAPES[response_model][0]
+        count("salvaged_days", len(broken))
+        return {
+            array_key: merge_days(
+                output[array_key], salvaged[array_key], broken
+            )
+        }
+
+    def _repair(self, response, response_model, plan_name, days_prompt):
+        """Repair malformed output, regenerating only the broken days.
+
+        Args:
+            days_prompt (callable, optional): Builds the prompt for the
+                given broken days from the repaired output. Without it only
+                fully repairable output is returned.
+
+        Returns:
+            dict | None: The repaired output, or None if a full retry is needed.
+        """
+        repaired = self._repair_locally(response, response_model)
+        if repaired is None:
+            return None
+        output, broken = repaired
+        if not broken:
+            return output
+        if days_prompt is None:
+            count("unrepairable")
+            return None
+        logger.warning(f"Regenerating malformed days: {', '.join(broken)}")
+        try:
+            salvaged = self._generate(
+                days_prompt(broken, output),
+                response_model,
+                1,
+                plan_name,
+                request_type=f"{plan_name}_days",
+            )
+        except CircuitOpenError:
+            return None
+        return self._merge_salvaged(output, broken, salvaged, response_model)
+
+    async def _arepair(self, response, response_model, plan_name, days_prompt):
+        """Async counterpart of `_repair`."""
+        repaired = self._repair_locally(response, response_model)
+        if repaired is None:
+            return None
+        output, broken = repaired
+        if not broken:
+            return output
+        if days_prompt is None:
+            count("unrepairable")
+            return None
+        logger.warning(f"Regenerating malformed days: {', '.join(broken)}")
+        try:
+            salvaged = await self._agenerate(
+                days_prompt(broken, output),
+                response_model,
+                1,
+                plan_name,
+                request_type=f"{plan_name}_days",
+            )
+        except CircuitOpenError:
+            return None
+        return self._merge_salvaged(output, broken, salvaged, response_model)
+
+    def _generate(
+        self,
+        prompt,
+        response_model,
+        max_retries,
+        plan_name,
+        days_prompt=None,
+        request_type=None,
+    ):
+        """Invoke the LLM, retrying transient errors and malformed output.
+
+        Transient errors are retried with exponential backoff and jitter,
+        all within the policy's deadline. Malformed output is first repaired
+        locally, regenerating only broken days if `days_prompt` is given,
+        and retried in full only if that fails. The provider picks the model
+        by `request_type`, which defaults to `plan_name`. A blocking call
+        cannot be cancelled, so each call is bounded by the provider client's
+        timeout only, not by the policy's deadline.
+
+        Returns:
+            dict: The validated output, or an error if every attempt failed.
+
+        Raises:
+            CircuitOpenError: If the circuit breaker rejects the call.
+        """
+        policy = self.retry_policy
+        deadline = policy.deadline()
+        for attempt in range(1, max_retries + 1):
+            delay = 0
+            self.breaker.before_call()
+            try:
+                with self.limiter.hold(), span("llm.invoke"):
+                    response = self.llm.invoke(
+                        prompt, request_type=request_type or plan_name
+                    )
+            except Exception as e:
+                self._on_call_error(e, attempt, max_retries)
+                delay = policy.backoff(attempt)
+            except BaseException:
+                self.breaker.record_cancelled()
+                raise
+            else:
+                self._on_call_success(response)
+                try:
+                    # Parse and validate
+                    return self._parse(response, response_model)
+                except (OutputParserException, ValidationError) as e:
+                    self._on_parse_error(e, attempt, max_retries)
+                output = self._repair(
+                    response, response_model, plan_name, days_prompt
+                )
+                if output is not None:
+                    return output
+                count("full_retry")
+
+            if time.monotonic() + delay >= deadline:
+                break
+            if attempt < max_retries:
+                time.sleep(delay)
+        return {
+            "error": f"Failed to generate {plan_name} plan "
+            f"after {max_retries} retries"
+        }
+
+    async def _agenerate(
+        self,
+        prompt,
+        response_model,
+        max_retries,
+        plan_name,
+        days_prompt=None,
+        request_type=None,
+    ):
+        """Async counterpart of `_generate` using the LLM's `ainvoke`.
+
+        Each call is also cancelled after the policy's per-call timeout.
+        """
+        policy = self.retry_policy
+        deadline = policy.deadline()
+        for attempt in range(1, max_retries + 1):
+            delay = 0
+            self.breaker.before_call()
+            try:
+                async with self.limiter.ahold():
+                    with span("llm.invoke"):
+                        response = await asyncio.wait_for(
+                            self.llm.ainvoke(
+                                prompt, request_type=request_type or plan_name
+                            ),
+                            policy.timeout(deadline),
+                        )
+            except Exception as e:
+                self._on_call_error(e, attempt, max_retries)
+                delay = policy.backoff(attempt)
+            except BaseException:
+                # Cancelled, e.g. the client went away or the job was
+                # cancelled, which is not a provider failure
+                self.breaker.record_cancelled()
+                raise
+            else:
+                self._on_call_success(response)
+                try:
+                    # Parse and validate
+                    return self._parse(response, response_model)
+                except (OutputParserException, ValidationError) as e:
+                    self._on_parse_error(e, attempt, max_retries)
+                output = await self._arepair(
+                    response, response_model, plan_name, days_prompt
+                )
+                if output is not None:
+                    return output
+                count("full_retry")
+
+            if time.monotonic() + delay >= deadline:
+                break
+            if attempt < max_retries:
+                await asyncio.sleep(delay)
+        return {
+            "error": f"Failed to generate {plan_name} plan "
+            f"after {max_retries} retries"
+        }
+
+    async def _astream(self, prompt, response_model, request_type):
+        """Stream the LLM response and yield each day once it is valid.
+
+        Malformed days are repaired locally where possible and skipped
+        otherwise. Like the attempts of `_agenerate`, the stream fails with
+        a `TimeoutError` if no chunk arrives within the policy's per-call
+        timeout, or if it is not done by the policy's overall deadline.
+        """
+        array_key = PLAN_SHAPES[response_model][0]
+        parser = IncrementalArrayParser(array_key)
+        policy = self.retry_policy
+        deadline = policy.deadline()
+        self.breaker.before_call()
+        try:
+            async with (
+                self.limiter.ahold(),
+                aclosing(
+                    self.llm.astream(prompt, request_type=request_type)
+                ) as chunks,
+            ):
+                while True:
+                    # Only the wait for the provider is timed, not the
+                    # consumer, which runs while this generator is suspended
+                    try:
+                        async with asyncio.timeout(policy.timeout(deadline)):
+                            chunk = await anext(chunks)
+                    except StopAsyncIteration:
+                        break
+                    record_llm_usage(chunk)
+                    for item in parser.feed(chunk.content):
+                        day = repair_day(item, response_model)
+                        if day is None:
+                            count("unrepairable")
+                            logger.warning(
+                                f"Invalid {array_key} item, skipping it"
+                            )
+                            continue
+                        yield day
+        except Exception:
+            self.breaker.record_failure()
+            LLM_CALLS.inc(outcome="error")
+            raise
+        except BaseException:
+            # Closed or cancelled by the consumer, not a provider failure.
+            self.breaker.record_cancelled()
+            raise
+        self.breaker.record_success()
+        LLM_CALLS.inc(outcome="success")
+
+    def _workout_days_prompt(self, goal, biometrics):
+        """Return a builder of prompts that regenerate broken workout days."""
+
+        def days_prompt(days, output):
+            return WORKOUT_DAYS_PROMPT.render(
+                days=", ".join(days),
+                other_days=summarize_days(output["workout"], "exercises", days),
+                goal=goal,
+                biometrics=biometrics,
+            )
+
+        return days_prompt
+
+    def _diet_days_prompt(self, goal, biometrics, dietary_preferences):
+        """Return a builder of prompts that regenerate broken diet days."""
+
+        def days_prompt(days, output):
+            return DIET_DAYS_PROMPT.render(
+                days=", ".join(days),
+                other_days=summarize_days(output["diet_plan"], "meals", days),
+                goal=goal,
+                biometrics=biometrics,
+                dietary_preferences=dietary_preferences,
+            )
+
+        return days_prompt
 
     def generate_workout_plan(
         self, goal="general fitness", biometrics="not provided", max_retries=3
@@ -45,6 +575,9 @@ class WorkoutTrainer:
         """
         Generate a workout plan based on user goals.
 
+        Concurrent calls with the same normalized arguments share one model
+        call and all receive its result.
+
         Args:
             goal (str, optional): The fitness goal for which the workout plan is being generated.
                 Defaults to "general fitness".
@@ -56,26 +589,102 @@ class WorkoutTrainer:
         Returns:
             dict: A dictionary containing the generated workout plan.
         """
-        retry = max_retries
-        while retry > 0:
-            try:
-                response = self.llm.invoke(
-                    WORKOUT_PLAN_PROMPT.format(goal=goal, biometrics=biometrics)
-                )
+        return self.flights.do(
+            plan_cache_key("workout", goal=goal, biometrics=biometrics),
+            self._generate,
+            WORKOUT_PLAN_PROMPT.render(goal=goal, biometrics=biometrics),
+            ServerWorkoutResponse,
+            max_retries,
+            "workout",
+            self._workout_days_prompt(goal, biometrics),
+        )
 
-                # Parse and validate
-                output = self.parser.parse(response.content)
-                ServerWorkoutResponse(**output)
+    async def agenerate_workout_plan(
+        self, goal="general fitness", biometrics="not provided", max_retries=3
+    ):
+        """
+        Generate a workout plan without blocking the event loop.
 
-                return output
-            except OutputParserException as e:
-                print(f"OutputParserException occurred: {e}. Retrying ({retry})...")
-                retry -= 1
-            except ValidationError as e:
-                print(f"ValidationError occurred: {e}. Retrying ({retry})...")
-                retry -= 1
+        Takes the same arguments and returns the same result as
+        `generate_workout_plan`.
+        """
+        return await self.flights.ado(
+            plan_cache_key("workout", goal=goal, biometrics=biometrics),
+            self._agenerate,
+            WORKOUT_PLAN_PROMPT.render(goal=goal, biometrics=biometrics),
+            ServerWorkoutResponse,
+            max_retries,
+            "workout",
+            self._workout_days_prompt(goal, biometrics),
+        )
 
-        return {"error": f"Failed to generate workout plan after {max_retries} retries"}
+    async def astream_workout_plan(
+        self, goal="general fitness", biometrics="not provided"
+    ):
+        """
+        Stream a workout plan, yielding each day as soon as it is generated.
+
+        Args:
+            goal (str, optional): The fitness goal for which the workout plan is being generated.
+                Defaults to "general fitness".
+            biometrics (str, optional): The user's biometric information, such as age, weight,
+                and height. Defaults to "not provided".
+
+        Yields:
+            dict: A validated `Workout` day.
+        """
+        async for day in self._astream(
+            WORKOUT_PLAN_PROMPT.render(goal=goal, biometrics=biometrics),
+            ServerWorkoutResponse,
+            "workout",
+        ):
+            yield day
+
+    async def agenerate_workout_days(
+        self,
+        days,
+        other_days="none",
+        goal="general fitness",
+        biometrics="not provided",
+        max_retries=3,
+    ):
+        """
+        Generate the workouts of some days of an existing weekly plan.
+
+        Args:
+            days (list[str]): The days to generate, e.g. ["Monday", "Friday"].
+            other_days (str, optional): A summary of the rest of the week, so
+                the new days fit in with it. Defaults to "none".
+            goal (str, optional): The fitness goal for which the workout plan is being generated.
+                Defaults to "general fitness".
+            biometrics (str, optional): The user's biometric information, such as age, weight,
+                and height. Defaults to "not provided".
+            max_retries (int, optional): The maximum number of retries to attempt if the
+               API call fails. Defaults to 3.
+
+        Returns:
+            dict: A dictionary with the "workout" of the requested days.
+        """
+        return await self.flights.ado(
+            plan_cache_key(
+                "workout_days",
+                days=days,
+                other_days=other_days,
+                goal=goal,
+                biometrics=biometrics,
+            ),
+            self._agenerate,
+            WORKOUT_DAYS_PROMPT.render(
+                days=", ".join(days),
+                other_days=other_days,
+                goal=goal,
+                biometrics=biometrics,
+            ),
+            ServerWorkoutResponse,
+            max_retries,
+            "workout",
+            request_type="workout_days",
+        )
 
     def generate_diet_plan(
         self,
@@ -87,6 +696,9 @@ class WorkoutTrainer:
         """
         Generate a diet plan based on user preferences.
 
+        Concurrent calls with the same normalized arguments share one model
+        call and all receive its result.
+
         Args:
             goal (str, optional): The health or fitness goal for which the diet plan is
                 being generated. Defaults to "general fitness".
@@ -100,27 +712,135 @@ class WorkoutTrainer:
         Returns:
             dict: A dictionary containing the generated diet plan.
         """
-        retry = max_retries
-        while retry > 0:
-            try:
-                response = self.llm.invoke(
-                    DIET_PLAN_PROMPT.format(
-                        goal=goal,
-                        biometrics=biometrics,
-                        dietary_preferences=dietary_preferences,
-                    ),
-                )
+        return self.flights.do(
+            plan_cache_key(
+                "diet",
+                goal=goal,
+                biometrics=biometrics,
+                dietary_preferences=dietary_preferences,
+            ),
+            self._generate,
+            DIET_PLAN_PROMPT.render(
+                goal=goal,
+                biometrics=biometrics,
+                dietary_preferences=dietary_preferences,
+            ),
+            ServerDietResponse,
+            max_retries,
+            "diet",
+            self._diet_days_prompt(goal, biometrics, dietary_preferences),
+        )
 
-                # Parse and Validate
-                output = self.parser.parse(response.content)
-                ServerDietResponse(**output)
+    async def agenerate_diet_plan(
+        self,
+        goal="general fitness",
+        biometrics="not provided",
+        dietary_preferences="balanced",
+        max_retries=3,
+    ):
+        """
+        Generate a diet plan without blocking the event loop.
+
+        Takes the same arguments and returns the same result as
+        `generate_diet_plan`.
+        """
+        return await self.flights.ado(
+            plan_cache_key(
+                "diet",
+                goal=goal,
+                biometrics=biometrics,
+                dietary_preferences=dietary_preferences,
+            ),
+            self._agenerate,
+            DIET_PLAN_PROMPT.render(
+                goal=goal,
+                biometrics=biometrics,
+                dietary_preferences=dietary_preferences,
+            ),
+            ServerDietResponse,
+            max_retries,
+            "diet",
+            self._diet_days_prompt(goal, biometrics, dietary_preferences),
+        )
+
+    async def astream_diet_plan(
+        self,
+        goal="general fitness",
+        biometrics="not provided",
+        dietary_preferences="balanced",
+    ):
+        """
+        Stream a diet plan, yielding each day as soon as it is generated.
+
+        Args:
+            goal (str, optional): The health or fitness goal for which the diet plan is
+                being generated. Defaults to "general fitness".
+            biometrics (str, optional): The user's biometric information, such as age, weight,
+                and height. Defaults to "not provided".
+            dietary_preferences (str, optional): The user's dietary preferences, such as
+                vegetarian, vegan, etc. Defaults to "balanced".
+
+        Yields:
+            dict: A validated `DayDietPlan` day.
+        """
+        async for day in self._astream(
+            DIET_PLAN_PROMPT.render(
+                goal=goal,
+                biometrics=biometrics,
+                dietary_preferences=dietary_preferences,
+            ),
+            ServerDietResponse,
+            "diet",
+        ):
+            yield day
+
+    async def agenerate_diet_days(
+        self,
+        days,
+        other_days="none",
+        goal="general fitness",
+        biometrics="not provided",
+        dietary_preferences="balanced",
+        max_retries=3,
+    ):
+        """
+        Generate the meals of some days of an existing weekly diet plan.
 
-                return output
-            except OutputParserException as e:
-                print(f"OutputParserException occurred: {e}. Retrying ({retry})...")
-                retry -= 1
-            except ValidationError as e:
-                print(f"ValidationError occurred: {e}. Retrying ({retry})...")
-                retry -= 1
+        Args:
+            days (list[str]): The days to generate, e.g. ["Monday", "Friday"].
+            other_days (str, optional): A summary of the rest of the week, so
+                the new days add variety. Defaults to "none".
+            goal (str, optional): The health or fitness goal for which the diet plan is
+                being generated. Defaults to "general fitness".
+            biometrics (str, optional): The user's biometric information, such as age, weight,
+                and height. Defaults to "not provided".
+            dietary_preferences (str, optional): The user's dietary preferences, such as
+                vegetarian, vegan, etc. Defaults to "balanced".
+            max_retries (int, optional): The maximum number of retries to attempt if the
+                API call fails. Defaults to 3.
 
-        return {"error": f"Failed to generate diet plan after {max_retries} retries"}
+        Returns:
+            dict: A dictionary with the "diet_plan" of the requested days.
+        """
+        return await self.flights.ado(
+            plan_cache_key(
+                "diet_days",
+                days=days,
+                other_days=other_days,
+                goal=goal,
+                biometrics=biometrics,
+                dietary_preferences=dietary_preferences,
+            ),
+            self._agenerate,
+            DIET_DAYS_PROMPT.render(
+                days=", ".join(days),
+                other_days=other_days,
+                goal=goal,
+                biometrics=biometrics,
+                dietary_preferences=dietary_preferences,
+            ),
+            ServerDietResponse,
+            max_retries,
+            "diet",
+            request_type="diet_days",
+        )
@@ -0,0 +1,68 @@
+"""Admin routes for the fitmate application."""
+
+import os
+import uuid
+
+from fastapi import APIRouter, Depends, HTTPException
+
+from bulk import BulkCheckpoint, BulkGenerator
+from crud import aget_admin_user
+from jobs import job_queue
+from schemas import BulkPlansModel, UserRequest
+
+router = APIRouter()
+
+
+# Runs in the job queue, progress is checkpointed so a failed job can be
+# resubmitted with the same run id to resume it.
+@job_queue.handler("bulk_plans")
+async def generate_bulk_plans_job(user_email: str, payload: dict):
+    generator = BulkGenerator(
+        BulkCheckpoint.load(payload["run_id"]),
+        kinds=tuple(payload["kinds"]),
+        workout_preferences=payload["workout_preferences"],
+    )
+    checkpoint = await generator.run(payload["emails"])
+    result = checkpoint.to_dict()
+    result["done"] = len(checkpoint.done)
+    return result
+
+
+@router.post("/admin/bulk-plans/", status_code=202)
+async def create_bulk_plans(
+    request: BulkPlansModel,
+    user: UserRequest = Depends(aget_admin_user),
+):
+    run_id = request.run_id or uuid.uuid4().hex
+    job = await job_queue.submit(
+        "bulk_plans",
+        user.email,
+        {
+            "run_id": run_id,
+            "emails": request.emails,
+            "kinds": request.kinds,
+            "workout_preferences": (
+                request.workout_preferences.dict()
+                if request.workout_preferences
+                else None
+            ),
+        },
+    )
+    return {
+        "message": "Bulk plan generation queued",
+        "job_id": job["id"],
+        "run_id": run_id,
+        "status": job["status"],
+    }
+
+
+@router.get("/admin/bulk-plans/{run_id}")
+async def get_bulk_plans(
+    run_id: str, user: UserRequest = Depends(aget_admin_user)
+):
+    checkpoint = BulkCheckpoint.load(run_id)
+    if not os.path.exists(checkpoint.path):
+        raise HTTPException(status_code=404, detail="Bulk run not found")
+    progress = checkpoint.to_dict()
+    progress["done"] = len(checkpoint.done)
+    return progress
@@ -2,33 +2,32 @@
 
 from typing import Annotated
 
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from models import User
 from crud import (
-    create_user,
-    get_current_user,
-    get_user_by_email,
-    hash_password,
-    verify_password,
+    aauthenticate_user,
+    acreate_user,
+    aget_user_by_email,
     create_jwt_token,
 )
-from database import get_db
-
+from database import get_async_db
+from models import User
 from schemas import TokenResponse, UserRequest
 
 router = APIRouter()
 
 
 @router.post("/register/")
-def register(user: UserRequest, db: Annotated[Session, Depends(get_db)]):
+async def register(
+    user: UserRequest, db: Annotated[AsyncSession, Depends(get_async_db)]
+):
 
-    db_user = get_user_by_email(db, user.email)
+    db_user = await aget_user_by_email(db, user.email)
     if db_user:
         raise HTTPException(status_code=400, detail="User already exists")
 
-    new_user = create_user(db, user.email, user.password)
+    new_user = await acreate_user(db, user.email, user.password)
     return {
         "message": "User registered successfully",
         "token": create_jwt_token(new_user.email),
@@ -36,9 +35,11 @@ def register(user: UserRequest, db: Annotated[Session, Depends(get_db)]):
 
 
 @router.post("/login/", response_model=TokenResponse)
-def login(user: UserRequest, db: Annotated[Session, Depends(get_db)]):
-    db_user = get_user_by_email(db, user.email)
-    if not db_user or not verify_password(user.password, db_user.password):
+async def login(
+    user: UserRequest, db: Annotated[AsyncSession, Depends(get_async_db)]
+):
+    db_user = await aauthenticate_user(db, user.email, user.password)
+    if not db_user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
     return {"token": create_jwt_token(db_user.email)}
@@ -0,0 +1,76 @@
+"""Dashboard routes for the fitmate application."""
+
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.progress import progress_window
+from crud import DASHBOARD_SECTIONS, aget_current_user, aget_dashboard
+from database import get_async_db
+from llm import MOCK_PROGRESS
+from responses import FastJSONResponse
+from schemas import UserRequest
+
+router = APIRouter()
+
+
+def _columns(row):
+    return {
+        attr.key: getattr(row, attr.key)
+        for attr in inspect(row).mapper.column_attrs
+    }
+
+
+@router.get("/dashboard/")
+async def get_dashboard(
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    user: UserRequest = Depends(aget_current_user),
+):
+    """Get everything the dashboard renders in one request.
+
+    `fields` is a comma separated list of the sections to return, out of
+    "profile", "workout_plan", "meal_plan" and "progress", and defaults to
+    all of them. The sections hold what the profile, workout plan, meal plan
+    and progress routes return, missing profiles and plans are null.
+    """
+    if fields is None:
+        sections = list(DASHBOARD_SECTIONS)
+    else:
+        sections = list(
+            dict.fromkeys(
+                field.strip() for field in fields.split(",") if field.strip()
+            )
+        )
+        if not sections:
+            raise HTTPException(
+                status_code=400, detail="No dashboard fields requested"
+            )
+        unknown = [
+            section for section in sections if section not in DASHBOARD_SECTIONS
+        ]
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown dashboard fields: {', '.join(unknown)}",
+            )
+
+    rows = await aget_dashboard(db, user.email, sections)
+    dashboard = {}
+    if "profile" in rows:
+        profile = rows["profile"]
+        dashboard["profile"] = _columns(profile) if profile else None
+    for section in ("workout_plan", "meal_plan"):
+        if section in rows:
+            plan = rows[section]
+            dashboard[section] = plan.generated_plan if plan else None
+    if "progress" in rows:
+        progress = rows["progress"]
+        dashboard["progress"] = (
+            await progress_window(db, progress)
+            if progress
+            else MOCK_PROGRESS.model_dump()
+        )
+    return FastJSONResponse(dashboard)
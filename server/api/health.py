@@ -0,0 +1,25 @@
+"""Health and monitoring routes for the fitmate application."""
+
+from fastapi import APIRouter
+
+from agent import WorkoutTrainer
+from cache import plan_cache
+from crud import principal_cache
+from repair import repair_stats
+
+router = APIRouter()
+
+
+@router.get("/health/")
+def get_health():
+    llm_instance = WorkoutTrainer()
+    return {
+        "llm_provider": llm_instance.llm.name,
+        "llm_circuit": llm_instance.breaker.snapshot(),
+        "llm_active_calls": llm_instance.limiter.active,
+        "llm_scheduler": llm_instance.limiter.snapshot(),
+        "llm_coalesced_calls": llm_instance.flights.followers,
+        "plan_cache": plan_cache.stats(),
+        "llm_repairs": repair_stats(),
+        "cached_users": len(principal_cache),
+    }
@@ -0,0 +1,17 @@
+"""Background job routes for the fitmate application."""
+
+from fastapi import APIRouter, Depends, HTTPException
+
+from crud import aget_current_user
+from jobs import job_queue
+from schemas import JobResponse, UserRequest
+
+router = APIRouter()
+
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str, user: UserRequest = Depends(aget_current_user)):
+    job = await job_queue.get(job_id)
+    if job is None or job["user_email"] != user.email:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
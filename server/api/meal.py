@@ -1,65 +1,173 @@
 """Meal routes for the fitmate application."""
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from schemas import MealPlanModel, UserRequest
-from models import MealPlan
 from crud import (
-    get_profile,
-    get_current_user,
-    get_workout_plan,
-    create_meal_plan,
-    update_meal_plan,
-    get_meal_plan,
+    aget_current_user,
+    aget_meal_plan,
+    aget_preferences,
+    aget_profile,
+    aget_version,
+    aupdate_meal_plan,
+    aupsert_meal_plan,
 )
-from database import get_db  # Assuming you have a function to get DB session
-from llm import generate_meal_plan
+from database import get_async_db, run_with_async_session
+from etags import anot_modified, etag_headers, make_etag
+from jobs import job_queue
+from llm import agenerate_meal_plan, aregenerate_meal_days, astream_meal_plan
+from models import MealPlan, WorkoutPlan
+from plans import find_day
+from ratelimit import rate_limit
+from responses import FastJSONResponse
+from scheduler import INTERACTIVE, REGENERATION, llm_priority, prioritized
+from schemas import MealPlanModel, PlanDaysModel, UserRequest
+from streaming import ndjson_stream
 
 router = APIRouter()
 
+# Routes that start a plan generation have their own, smaller budget
+LLM_RATE_LIMIT = Depends(rate_limit("llm"))
+
+
+# Generation runs in the background job queue, the handlers below are run by
+# its workers and DB work happens in short-lived sessions, so no connection
+# is held while waiting for the LLM.
+@job_queue.handler("meal_plan")
+@prioritized(INTERACTIVE)
+async def generate_meal_job(user_email: str, preferences: dict):
+    # Retrieve user profile
+    profile = await run_with_async_session(aget_profile, user_email)
+    # The meal plan is tailored to the workout preferences, if there are any
+    workout = await run_with_async_session(
+        aget_preferences, WorkoutPlan, user_email
+    )
+
+    generated_meal = await agenerate_meal_plan(
+        workout and workout.preferences, MealPlanModel(**preferences), profile
+    )
+
+    # Store meal preferences
+    await run_with_async_session(
+        aupsert_meal_plan, user_email, preferences, generated_meal
+    )
+    return generated_meal
+
 
-@router.post("/meal-plan/")
-def create_meal(
+@job_queue.handler("meal_days")
+@prioritized(REGENERATION)
+async def regenerate_meal_days_job(user_email: str, payload: dict):
+    profile = await run_with_async_session(aget_profile, user_email)
+    workout = await run_with_async_session(
+        aget_preferences, WorkoutPlan, user_email
+    )
+    meal_plan = await run_with_async_session(aget_meal_plan, user_email)
+    new_meal_plan = await aregenerate_meal_days(
+        meal_plan, workout and workout.preferences, profile, payload["days"]
+    )
+    await run_with_async_session(
+        aupdate_meal_plan, user_email, meal_plan.preferences, new_meal_plan
+    )
+    return new_meal_plan
+
+
+@router.post("/meal-plan/", status_code=202, dependencies=[LLM_RATE_LIMIT])
+async def create_meal(
     meal: MealPlanModel,
-    db: Session = Depends(get_db),
-    user: UserRequest = Depends(get_current_user),
+    user: UserRequest = Depends(aget_current_user),
 ):
-    user_email = user.email
-    # Retrieve user profile
-    profile = get_profile(db, user_email)
-    # retrieve workout plan
-    workout_plan = get_workout_plan(db, user_email)
+    job = await job_queue.submit("meal_plan", user.email, meal.dict())
+    return {
+        "message": "Meal plan generation queued",
+        "job_id": job["id"],
+        "status": job["status"],
+    }
+
 
-    generated_meal = generate_meal_plan(workout_plan, meal, profile)
-    meal_plan = MealPlan(
-        user_email=user_email, preferences=meal, generated_plan=generated_meal
+# Streams each day as NDJSON while it is generated, the last line carries the
+# assembled meal plan once it has been saved.
+@router.post(
+    "/meal-plan/stream/",
+    dependencies=[LLM_RATE_LIMIT, Depends(llm_priority(INTERACTIVE))],
+)
+async def stream_meal(
+    meal: MealPlanModel,
+    user: UserRequest = Depends(aget_current_user),
+):
+    profile = await run_with_async_session(aget_profile, user.email)
+    workout = await run_with_async_session(
+        aget_preferences, WorkoutPlan, user.email
     )
 
-    check_meal_plan = get_meal_plan(db, user_email)
-    if check_meal_plan:
-        update_meal_plan(
-            db, user_email, meal_plan.preferences.dict(), generated_meal
+    async def save(generated_meal):
+        await run_with_async_session(
+            aupsert_meal_plan, user.email, meal.dict(), generated_meal
         )
-        return {"message": "Meal plan updated successfully"}
-    # Store meal preferences
-    db_meal_plans = create_meal_plan(
-        db, user_email, meal_plan.preferences.dict(), generated_meal
+
+    return StreamingResponse(
+        ndjson_stream(
+            astream_meal_plan(workout and workout.preferences, meal, profile),
+            save,
+        ),
+        media_type="application/x-ndjson",
     )
 
+
+# Regenerates only the requested days of the stored plan
+@router.post("/meal-plan/days/", status_code=202, dependencies=[LLM_RATE_LIMIT])
+async def regenerate_meal_days(
+    request: PlanDaysModel,
+    db: AsyncSession = Depends(get_async_db),
+    user: UserRequest = Depends(aget_current_user),
+):
+    if not await aget_version(db, MealPlan, user.email):
+        raise HTTPException(status_code=404, detail="No meal plan found")
+
+    job = await job_queue.submit(
+        "meal_days", user.email, {"days": request.days}
+    )
     return {
-        "message": "Meal plan created successfully",
-        "meal_plan": db_meal_plans,
+        "message": "Meal days generation queued",
+        "job_id": job["id"],
+        "status": job["status"],
     }
 
 
 @router.get("/meal-plan/")
-def get_meal(
-    db: Session = Depends(get_db), user: UserRequest = Depends(get_current_user)
+async def get_meal(
+    day: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db),
+    user: UserRequest = Depends(aget_current_user),
 ):
     user_email = user.email
-    meal_plan = get_meal_plan(db, user_email)
+    # Each day is a different representation of the plan
+    variant = () if day is None else (day,)
+    not_modified = await anot_modified(
+        db, MealPlan, user_email, if_none_match, "meal", *variant
+    )
+    if not_modified:
+        return not_modified
+
+    meal_plan = await aget_meal_plan(db, user_email)
     if not meal_plan:
         raise HTTPException(status_code=404, detail="No meal plan found")
 
-    return meal_plan.generated_plan
+    headers = etag_headers(
+        make_etag("meal", meal_plan.id, meal_plan.version, *variant)
+    )
+    # The stored document is already JSON, so it skips FastAPI's encoder
+    if day is None:
+        return FastJSONResponse(meal_plan.generated_plan, headers=headers)
+
+    # Other days are served from the stored diet plan, without a model call
+    plan_day = find_day(meal_plan.generated_plan.get("diet_plan", []), day)
+    if plan_day is None:
+        raise HTTPException(status_code=404, detail="No meal plan for this day")
+    return FastJSONResponse(
+        {**meal_plan.generated_plan, "meals": plan_day["meals"]},
+        headers=headers,
+    )
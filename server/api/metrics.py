@@ -0,0 +1,13 @@
+"""Prometheus metrics route for the fitmate application."""
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from metrics import registry
+
+router = APIRouter()
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    return registry.render()
@@ -1,15 +1,16 @@
 """Profile routes for the fitmate application."""
 
 import logging
+from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from schemas import UserProfile, UserRequest
+from crud import acreate_profile, aget_current_user, aget_profile
+from database import get_async_db
+from etags import anot_modified, etag_headers, make_etag
 from models import Profile
-from crud import get_profile, create_profile, get_current_user
-from database import get_db  # Assuming you have a function to get DB session
-from fastapi import Depends
+from schemas import UserProfile, UserRequest
 
 router = APIRouter()
 
@@ -17,10 +18,10 @@ logger = logging.getLogger(__name__)
 
 
 @router.post("/profile/")
-def create_profile_endpoint(
+async def create_profile_endpoint(
     profile: UserProfile,
-    db: Session = Depends(get_db),
-    user: UserRequest = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    user: UserRequest = Depends(aget_current_user),
 ):
     try:
         logger.info(f"Creating profile for user: {user}")
@@ -34,7 +35,7 @@ def create_profile_endpoint(
             dietary_preference=profile.dietary_preference,
             user_email=user.email,
         )
-        db_profile = create_profile(
+        db_profile = await acreate_profile(
             db=db, email=user.email, profile=new_profile
         )
         return {
@@ -47,11 +48,23 @@ def create_profile_endpoint(
 
 
 @router.get("/profile/")
-def get_profile_endpoint(
-    db: Session = Depends(get_db), user: UserRequest = Depends(get_current_user)
+async def get_profile_endpoint(
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db),
+    user: UserRequest = Depends(aget_current_user),
 ):
     email = user.email
-    db_profile = get_profile(db=db, email=email)
+    not_modified = await anot_modified(
+        db, Profile, email, if_none_match, "profile"
+    )
+    if not_modified:
+        return not_modified
+
+    db_profile = await aget_profile(db=db, email=email)
     if db_profile is None:
         raise HTTPException(status_code=404, detail="No profile found")
+    response.headers.update(
+        etag_headers(make_etag("profile", db_profile.id, db_profile.version))
+    )
     return db_profile
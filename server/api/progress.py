@@ -1,46 +1,152 @@
 """Progress routes for the fitmate application."""
 
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+import os
+from datetime import date, timedelta
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from schemas import ProgressModel, UserRequest
 from crud import (
-    get_current_user,
-    create_progress,
-    get_progress,
-    update_progress,
+    aappend_progress_events,
+    aget_current_user,
+    aget_progress,
+    aget_progress_events,
+    aget_weight_history,
+    arecord_progress_snapshot,
 )
-from database import get_db
+from database import get_async_db
 from llm import MOCK_PROGRESS
+from progress_log import decode_cursor, downsample, encode_cursor
+from responses import FastJSONResponse
+from schemas import (
+    ProgressEventsModel,
+    ProgressModel,
+    ProgressSummaryModel,
+    UserRequest,
+)
 
 router = APIRouter()
 
+# The weight history returned by default, so responses stay small however
+# long a user has been logging.
+PROGRESS_WINDOW_DAYS = int(os.environ.get("PROGRESS_WINDOW_DAYS", "90"))
+
 
+# Accepts the whole progress for older clients, only the changes are stored
 @router.post("/progress/")
-def create_user_progess(
+async def create_user_progess(
     progress: ProgressModel,
-    db: Session = Depends(get_db),
-    user: UserRequest = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    user: UserRequest = Depends(aget_current_user),
 ):
-    user_email = user.email
-
-    check_progress = get_progress(db, user_email)
-    if check_progress:
-        db_progress = update_progress(db, user_email, progress.model_dump())
-        return {
-            "message": "progress updated successfully",
-            "progress": db_progress,
-        }
-    db_progress = create_progress(db, user_email, progress)
+    db_progress, created = await arecord_progress_snapshot(
+        db, user.email, progress
+    )
+    summary = ProgressSummaryModel.model_validate(db_progress)
+    if not created:
+        return {"message": "progress updated successfully", "progress": summary}
+
+    return {"message": "Progress created successfully", "progress": summary}
 
-    return {"message": "Progress created successfully", "progress": db_progress}
+
+@router.post("/progress/events/")
+async def append_user_progress(
+    request: ProgressEventsModel,
+    db: AsyncSession = Depends(get_async_db),
+    user: UserRequest = Depends(aget_current_user),
+):
+    events = [
+        {
+            "kind": event.kind,
+            "day": event.date,
+            "value": event.value,
+            "exercise": event.exercise,
+            "record": event.record,
+        }
+        for event in request.events
+    ]
+    db_progress = await aappend_progress_events(db, user.email, events)
+    return {
+        "message": "Progress events recorded",
+        "progress": ProgressSummaryModel.model_validate(db_progress),
+    }
 
 
 @router.get("/progress/")
-def get_user_progress(
-    user: UserRequest = Depends(get_current_user), db: Session = Depends(get_db)
+async def get_user_progress(
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    resolution: Literal["day", "week", "month"] = "day",
+    user: UserRequest = Depends(aget_current_user),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    db_progress = get_progress(db, user.email)
+    """Get the progress aggregates and the weight history of a date window.
+
+    The window defaults to the last `PROGRESS_WINDOW_DAYS` days, weights
+    are averaged per day, week or month according to `resolution`.
+    """
+    db_progress = await aget_progress(db, user.email)
     if not db_progress:
         return MOCK_PROGRESS
-    return db_progress
+    return FastJSONResponse(
+        await progress_window(db, db_progress, since, until, resolution)
+    )
+
+
+async def progress_window(
+    db, db_progress, since=None, until=None, resolution="day"
+):
+    """Return the aggregates of `db_progress` and its weight history.
+
+    See `get_user_progress` for the window and the resolution.
+    """
+    if since is None:
+        since = (until or date.today()) - timedelta(days=PROGRESS_WINDOW_DAYS)
+
+    summary = ProgressSummaryModel.model_validate(db_progress)
+    weight = await aget_weight_history(db, db_progress.user_email, since, until)
+    return {**summary.model_dump(), "weight": downsample(weight, resolution)}
+
+
+@router.get("/progress/history/")
+async def get_user_progress_history(
+    kind: Optional[
+        Literal["weight", "workout", "calories", "personal_record"]
+    ] = None,
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    user: UserRequest = Depends(aget_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Page through the progress events, newest first.
+
+    Pass the returned `next_cursor` as `cursor` to get the next page.
+    """
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    events = await aget_progress_events(
+        db, user.email, kind, since, until, after, limit
+    )
+    return FastJSONResponse(
+        {
+            "events": [
+                {
+                    "kind": event.kind,
+                    "date": event.day.isoformat(),
+                    "value": event.value,
+                    "exercise": event.exercise,
+                    "record": event.record,
+                }
+                for event in events
+            ],
+            "next_cursor": (
+                encode_cursor(events[-1]) if len(events) == limit else None
+            ),
+        }
+    )
@@ -1,86 +1,219 @@
 """Workout routes for the fitmate application."""
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from schemas import WorkoutPlanModel, UserRequest
 from crud import (
-    get_profile,
-    get_current_user,
-    create_workout_plan,
-    update_workout_plan,
-    get_workout_plan,
+    aget_current_user,
+    aget_preferences,
+    aget_profile,
+    aget_version,
+    aget_workout_plan,
+    aupdate_workout_plan,
+    aupsert_workout_plan,
+)
+from database import get_async_db, run_with_async_session
+from etags import anot_modified, etag_headers, make_etag
+from jobs import job_queue
+from llm import (
+    agenerate_workout,
+    aregenerate_workout_days,
+    astream_workout,
 )
 from models import WorkoutPlan
-from database import get_db  # Assuming you have a function to get DB session
-from llm import generate_workout
+from ratelimit import rate_limit
+from responses import FastJSONResponse
+from scheduler import INTERACTIVE, REGENERATION, llm_priority, prioritized
+from schemas import PlanDays, PlanDaysModel, UserRequest, WorkoutPlanModel
+from streaming import ndjson_stream
 
 router = APIRouter()
 
+# Routes that start a plan generation have their own, smaller budget
+LLM_RATE_LIMIT = Depends(rate_limit("llm"))
+
+
+# Generation runs in the background job queue, the handlers below are run by
+# its workers and DB work happens in short-lived sessions, so no connection
+# is held while waiting for the LLM. A user's first plan is generated ahead
+# of regenerations.
+@job_queue.handler("workout_plan")
+@prioritized(INTERACTIVE)
+async def generate_workout_job(user_email: str, preferences: dict):
+    profile = await run_with_async_session(aget_profile, user_email)
 
-@router.post("/workout-plan/")
-def create_workout(
+    generated_workout = await agenerate_workout(
+        WorkoutPlanModel(**preferences), profile
+    )
+
+    await run_with_async_session(
+        aupsert_workout_plan, user_email, preferences, generated_workout
+    )
+    return generated_workout
+
+
+@job_queue.handler("new_workout")
+@prioritized(REGENERATION)
+async def generate_new_workout_job(user_email: str, payload: dict):
+    profile = await run_with_async_session(aget_profile, user_email)
+    workout = await run_with_async_session(
+        aget_preferences, WorkoutPlan, user_email
+    )
+    # A new plan is asked for, so the cached one is not served again
+    new_workout = await agenerate_workout(
+        workout.preferences, profile, refresh=True
+    )
+    await run_with_async_session(
+        aupdate_workout_plan, user_email, workout.preferences, new_workout
+    )
+    return new_workout
+
+
+@job_queue.handler("workout_days")
+@prioritized(REGENERATION)
+async def regenerate_workout_days_job(user_email: str, payload: dict):
+    profile = await run_with_async_session(aget_profile, user_email)
+    workout = await run_with_async_session(aget_workout_plan, user_email)
+    new_workout = await aregenerate_workout_days(
+        workout, profile, payload["days"]
+    )
+    await run_with_async_session(
+        aupdate_workout_plan, user_email, workout.preferences, new_workout
+    )
+    return new_workout
+
+
+@router.post("/workout-plan/", status_code=202, dependencies=[LLM_RATE_LIMIT])
+async def create_workout(
     workout: WorkoutPlanModel,
-    db: Session = Depends(get_db),
-    user: UserRequest = Depends(get_current_user),
+    user: UserRequest = Depends(aget_current_user),
 ):
-    user_email = user.email
+    job = await job_queue.submit("workout_plan", user.email, workout.dict())
+    return {
+        "message": "Workout plan generation queued",
+        "job_id": job["id"],
+        "status": job["status"],
+    }
 
-    profile = get_profile(db, user_email)
 
-    generated_workout = generate_workout(workout, profile)
-    print(generated_workout)
-    workout_plan = WorkoutPlan(
-        user_email=user_email,
-        preferences=workout,
-        generated_plan=generated_workout,
-    )
+# Streams each day as NDJSON while it is generated, the last line carries the
+# assembled plan once it has been saved.
+@router.post(
+    "/workout-plan/stream/",
+    dependencies=[LLM_RATE_LIMIT, Depends(llm_priority(INTERACTIVE))],
+)
+async def stream_workout(
+    workout: WorkoutPlanModel,
+    user: UserRequest = Depends(aget_current_user),
+):
+    profile = await run_with_async_session(aget_profile, user.email)
 
-    check_workout_plan = get_workout_plan(db, user_email)
-    if check_workout_plan:
-        update_workout_plan(
-            db, user_email, workout_plan.preferences.dict(), generated_workout
+    async def save(generated_workout):
+        await run_with_async_session(
+            aupsert_workout_plan, user.email, workout.dict(), generated_workout
         )
-        return {
-            "message": "Workout plan updated successfully",
-            "workout_plan": workout_plan,
-        }
 
-    db_workout_plans = create_workout_plan(
-        db, user_email, workout_plan.preferences.dict(), generated_workout
+    return StreamingResponse(
+        ndjson_stream(astream_workout(workout, profile), save),
+        media_type="application/x-ndjson",
     )
 
+
+# Regenerates only the requested days of the stored plan
+@router.post(
+    "/workout-plan/days/", status_code=202, dependencies=[LLM_RATE_LIMIT]
+)
+async def regenerate_workout_days(
+    request: PlanDaysModel,
+    db: AsyncSession = Depends(get_async_db),
+    user: UserRequest = Depends(aget_current_user),
+):
+    if not await aget_version(db, WorkoutPlan, user.email):
+        raise HTTPException(status_code=404, detail="No workout plan found")
+
+    job = await job_queue.submit(
+        "workout_days", user.email, {"days": request.days}
+    )
     return {
-        "message": "Workout plan created successfully",
-        "workout_plan": db_workout_plans,
+        "message": "Workout days generation queued",
+        "job_id": job["id"],
+        "status": job["status"],
     }
 
 
 # Get Workout Plan
 @router.get("/workout-plan/")
-def get_workout(
-    db: Session = Depends(get_db), user: UserRequest = Depends(get_current_user)
+async def get_workout(
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db),
+    user: UserRequest = Depends(aget_current_user),
 ):
     user_email = user.email
-    workout_plan = get_workout_plan(db, user_email)
+    not_modified = await anot_modified(
+        db, WorkoutPlan, user_email, if_none_match, "workout"
+    )
+    if not_modified:
+        return not_modified
+
+    workout_plan = await aget_workout_plan(db, user_email)
     if not workout_plan:
         raise HTTPException(status_code=404, detail="No workout plan found")
 
-    return workout_plan.generated_plan
+    # The stored document is already JSON, so it skips FastAPI's encoder
+    return FastJSONResponse(
+        workout_plan.generated_plan,
+        headers=etag_headers(
+            make_etag("workout", workout_plan.id, workout_plan.version)
+        ),
+    )
 
 
-@router.get("/generate-new-workout/")
-def update_workout(
-    db: Session = Depends(get_db), user: UserRequest = Depends(get_current_user)
+@router.get(
+    "/generate-new-workout/", status_code=202, dependencies=[LLM_RATE_LIMIT]
+)
+async def update_workout(
+    days: Optional[PlanDays] = Query(None),
+    db: AsyncSession = Depends(get_async_db),
+    user: UserRequest = Depends(aget_current_user),
 ):
+    if not await aget_version(db, WorkoutPlan, user.email):
+        raise HTTPException(status_code=404, detail="No workout plan found")
+
+    if days:
+        # Only regenerate the given days, e.g. ?days=Monday&days=Friday
+        job = await job_queue.submit("workout_days", user.email, {"days": days})
+    else:
+        job = await job_queue.submit("new_workout", user.email, {})
+    return {
+        "message": "New workout generation queued",
+        "job_id": job["id"],
+        "status": job["status"],
+    }
+
+
+@router.get(
+    "/generate-new-workout/stream/",
+    dependencies=[LLM_RATE_LIMIT, Depends(llm_priority(REGENERATION))],
+)
+async def stream_new_workout(user: UserRequest = Depends(aget_current_user)):
+    profile = await run_with_async_session(aget_profile, user.email)
+    workout = await run_with_async_session(
+        aget_preferences, WorkoutPlan, user.email
+    )
+    if not workout:
+        raise HTTPException(status_code=404, detail="No workout plan found")
 
-    profile = get_profile(db, user.email)
-    workout = get_workout_plan(db, user.email)
-    new_workout = generate_workout(workout.preferences, profile)
-    workout_plan = WorkoutPlan(
-        user_email=user.email,
-        preferences=workout.preferences,
-        generated_plan=new_workout,
+    async def save(new_workout):
+        await run_with_async_session(
+            aupdate_workout_plan, user.email, workout.preferences, new_workout
+        )
+
+    return StreamingResponse(
+        ndjson_stream(
+            astream_workout(workout.preferences, profile, refresh=True), save
+        ),
+        media_type="application/x-ndjson",
     )
-    update_workout_plan(db, user.email, workout_plan.preferences, new_workout)
-    return new_workout
@@ -0,0 +1,71 @@
+"""Login throughput benchmark for sizing the password hashing pool.
+
+Verifies a burst of passwords through `PasswordHasher` with different pool
+sizes and reports logins per second and latency percentiles. The cost
+comes from `BCRYPT_ROUNDS`, e.g.:
+
+    cd server && BCRYPT_ROUNDS=12 python -m benchmarks.login_throughput
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from passwords import BCRYPT_ROUNDS, PasswordHasher, hash_password
+
+
+async def run_burst(hasher, hashed, logins):
+    """Verify `logins` passwords at once, return the latency of each one."""
+
+    async def login():
+        start = time.perf_counter()
+        valid, _ = await hasher.verify("password", hashed)
+        assert valid
+        return time.perf_counter() - start
+
+    return await asyncio.gather(*(login() for _ in range(logins)))
+
+
+async def benchmark(workers, hashed, logins):
+    hasher = PasswordHasher(workers=workers, max_pending=logins)
+    # Warm up, so process start up isn't measured
+    await run_burst(hasher, hashed, workers)
+    start = time.perf_counter()
+    latencies = sorted(await run_burst(hasher, hashed, logins))
+    elapsed = time.perf_counter() - start
+    hasher.shutdown()
+    return {
+        "workers": workers,
+        "logins_per_second": logins / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+def main():
+    cpus = os.cpu_count() or 2
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=100)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        nargs="+",
+        default=sorted({1, max(1, cpus // 2), cpus, cpus * 2}),
+    )
+    args = parser.parse_args()
+
+    hashed = hash_password("password")
+    print(f"bcrypt rounds={BCRYPT_ROUNDS}, {args.logins} concurrent logins")
+    for workers in args.workers:
+        result = asyncio.run(benchmark(workers, hashed, args.logins))
+        print(
+            f"workers={result['workers']:>3}  "
+            f"{result['logins_per_second']:8.1f} logins/s  "
+            f"p50={result['p50_ms']:7.1f}ms  p99={result['p99_ms']:7.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
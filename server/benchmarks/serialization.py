@@ -0,0 +1,128 @@
+"""Serialization and compression benchmark for the large JSON responses.
+
+Serializes the example plans and a year of progress history the way
+FastAPI's default `JSONResponse` does (`jsonable_encoder` then `json.dumps`)
+and the way `FastJSONResponse` does, and reports the time per response and
+the bytes on the wire uncompressed, gzipped and, if the `brotli` package is
+installed, brotli compressed. Run it from where the server runs, e.g.:
+
+    python -m benchmarks.serialization --output serialization.json
+"""
+
+import argparse
+import gzip
+import json
+import os
+import timeit
+from datetime import date, timedelta
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from repair import lenient_loads
+from responses import BROTLI_QUALITY, GZIP_LEVEL, FastJSONResponse, brotli
+
+EXAMPLES = (
+    "workout_response.json",
+    "diet_response.json",
+    "mock-workouts.json",
+    "mock-meals.json",
+)
+
+
+def progress_history(days=365):
+    """Return a progress response with a weight entry for each of `days`."""
+    start = date.today() - timedelta(days=days)
+    return {
+        "workouts_completed": days // 2,
+        "streak": 12,
+        "calories_burned": days * 150,
+        "last_workout_day": 20250101,
+        "personal_records": [
+            {"exercise": "Squat", "value": "120kg", "date": "2025-01-01"},
+            {"exercise": "Deadlift", "value": "140kg", "date": "2024-12-20"},
+        ],
+        "weight": [
+            {
+                "date": (start + timedelta(days=i)).isoformat(),
+                "value": round(80 - i * 0.02, 2),
+            }
+            for i in range(days)
+        ],
+    }
+
+
+def per_call_ms(fn):
+    """Return the mean time of one call of `fn` in milliseconds."""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=5, number=number)) / number * 1000
+
+
+def benchmark(name, payload):
+    def default_response():
+        return JSONResponse(jsonable_encoder(payload)).body
+
+    def fast_response():
+        return FastJSONResponse(payload).body
+
+    body = fast_response()
+    result = {
+        "payload": name,
+        "default_ms": per_call_ms(default_response),
+        "orjson_ms": per_call_ms(fast_response),
+        "bytes": len(default_response()),
+        "orjson_bytes": len(body),
+        "gzip_bytes": len(gzip.compress(body, compresslevel=GZIP_LEVEL)),
+        "gzip_ms": per_call_ms(
+            lambda: gzip.compress(body, compresslevel=GZIP_LEVEL)
+        ),
+    }
+    if brotli is not None:
+        result["brotli_bytes"] = len(
+            brotli.compress(body, quality=BROTLI_QUALITY)
+        )
+        result["brotli_ms"] = per_call_ms(
+            lambda: brotli.compress(body, quality=BROTLI_QUALITY)
+        )
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--examples", default="examples")
+    parser.add_argument("--output", help="Also save the results as JSON")
+    args = parser.parse_args()
+
+    payloads = []
+    for name in EXAMPLES:
+        path = os.path.join(args.examples, name)
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as file:
+                payloads.append((name, lenient_loads(file.read())))
+    payloads.append(("progress (365 days)", progress_history()))
+
+    results = [benchmark(name, payload) for name, payload in payloads]
+    for result in results:
+        line = (
+            f"{result['payload']:<24} "
+            f"default={result['default_ms']:7.3f}ms  "
+            f"orjson={result['orjson_ms']:7.3f}ms  "
+            f"({result['default_ms'] / result['orjson_ms']:4.1f}x)  "
+            f"bytes={result['bytes']:>7}  "
+            f"gzip={result['gzip_bytes']:>6} in {result['gzip_ms']:.3f}ms"
+        )
+        if "brotli_bytes" in result:
+            line += (
+                f"  br={result['brotli_bytes']:>6} "
+                f"in {result['brotli_ms']:.3f}ms"
+            )
+        print(line)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,335 @@
+"""Bulk plan generation for cohorts of users of the fitmate application.
+
+Users are processed in batches: their profiles and stored preferences are
+loaded with one query per table, users with identical prompt inputs share
+one generation, generations run with bounded parallelism and a rate limit
+at the batch priority of the model call scheduler, and each batch is
+written with one multi-row upsert per plan table. Users whose generation
+failed are never given a mock plan, they are reported as failed instead.
+
+Completed users are checkpointed to a JSON file after every batch, so an
+interrupted run picks up where it stopped when started with the same run
+id. Usage:
+
+    cd server && python -m bulk --emails-file cohort.txt --run-id gym-42
+"""
+
+import argparse
+import asyncio
+import functools
+import json
+import os
+import time
+import uuid
+
+from cache import plan_cache_key
+from crud import aload_plan_inputs, aupsert_meal_plans, aupsert_workout_plans
+from database import async_engine, run_with_async_session
+from llm import agenerate_meal_plan, agenerate_workout
+from scheduler import BATCH, prioritized
+from schemas import MealPlanModel, WorkoutPlanModel
+
+BULK_BATCH_SIZE = int(os.environ.get("BULK_BATCH_SIZE", "200"))
+BULK_CONCURRENCY = int(os.environ.get("BULK_CONCURRENCY", "8"))
+BULK_RATE_PER_SECOND = float(os.environ.get("BULK_RATE_PER_SECOND", "2"))
+BULK_CHECKPOINT_DIR = os.environ.get("BULK_CHECKPOINT_DIR", ".bulk-runs")
+
+PLAN_KINDS = ("workout", "meal")
+
+
+class RateLimiter:
+    """Spaces out calls to at most `rate` per second."""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate > 0 else 0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class BulkCheckpoint:
+    """The progress of a bulk run, persisted as JSON after every batch."""
+
+    def __init__(self, run_id, directory=BULK_CHECKPOINT_DIR):
+        self.run_id = run_id
+        self.path = os.path.join(directory, f"{run_id}.json")
+        self.total = 0
+        self.done = set()
+        self.failed = {}
+        self.skipped = {}
+        self.generations = 0
+        self.deduplicated = 0
+        self.finished = False
+
+    @classmethod
+    def load(cls, run_id, directory=BULK_CHECKPOINT_DIR):
+        """Return the checkpoint of `run_id`, or a new one."""
+        checkpoint = cls(run_id, directory)
+        if os.path.exists(checkpoint.path):
+            with open(checkpoint.path, encoding="utf-8") as file:
+                state = json.load(file)
+            checkpoint.total = state["total"]
+            checkpoint.done = set(state["done"])
+            checkpoint.failed = state["failed"]
+            checkpoint.skipped = state["skipped"]
+            checkpoint.generations = state["generations"]
+            checkpoint.deduplicated = state["deduplicated"]
+            checkpoint.finished = state["finished"]
+        return checkpoint
+
+    def to_dict(self):
+        return {
+            "run_id": self.run_id,
+            "total": self.total,
+            "done": sorted(self.done),
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "generations": self.generations,
+            "deduplicated": self.deduplicated,
+            "finished": self.finished,
+        }
+
+    def save(self):
+        # Written to a temporary file first so a crash never leaves half a file
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            json.dump(self.to_dict(), file)
+        os.replace(temporary, self.path)
+
+    def summary(self):
+        return (
+            f"[{self.run_id}] {len(self.done)}/{self.total} users done, "
+            f"{len(self.failed)} failed, {len(self.skipped)} skipped, "
+            f"{self.generations} generations, "
+            f"{self.deduplicated} deduplicated"
+        )
+
+
+class BulkGenerator:
+    """Generates the plans of many users, sharing identical generations."""
+
+    def __init__(
+        self,
+        checkpoint,
+        kinds=PLAN_KINDS,
+        workout_preferences=None,
+        concurrency=BULK_CONCURRENCY,
+        rate=BULK_RATE_PER_SECOND,
+        report=print,
+    ):
+        """
+        Args:
+            checkpoint (BulkCheckpoint): The run's progress.
+            kinds (tuple[str]): The plans to generate, "workout" and/or "meal".
+            workout_preferences (dict, optional): Preferences for users who
+                have no workout plan yet. Users without one are skipped.
+            concurrency (int): The maximum number of generations at once.
+            rate (float): The maximum number of generations started per second.
+            report (callable): Called with a progress line after every batch.
+        """
+        self.checkpoint = checkpoint
+        self.kinds = kinds
+        self.workout_preferences = workout_preferences
+        self.report = report
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._limiter = RateLimiter(rate)
+        # Results of the run by prompt input key, shared across batches
+        self._generated = {}
+
+    async def _generate(self, key, agenerate, *args):
+        if key not in self._generated:
+            self._generated[key] = asyncio.ensure_future(
+                self._limited(agenerate, *args)
+            )
+            self.checkpoint.generations += 1
+        else:
+            self.checkpoint.deduplicated += 1
+        return await self._generated[key]
+
+    async def _limited(self, agenerate, *args):
+        async with self._semaphore, prioritized(BATCH):
+            await self._limiter.acquire()
+            return await agenerate(*args)
+
+    async def _generate_all(self, requests):
+        """Run `{email: (key, agenerate, *args)}` and return results by email.
+
+        Users whose generation raised are recorded as failed and left out.
+        """
+        emails = list(requests)
+        results = await asyncio.gather(
+            *(self._generate(*requests[email]) for email in emails),
+            return_exceptions=True,
+        )
+        plans = {}
+        for email, result in zip(emails, results):
+            if isinstance(result, Exception):
+                self.checkpoint.failed[email] = (
+                    f"{type(result).__name__}: {result}"
+                )
+            else:
+                plans[email] = result
+        return plans
+
+    async def run_batch(self, emails):
+        """Generate and store the plans of one batch of users."""
+        profiles, workouts, meals = await run_with_async_session(
+            aload_plan_inputs, emails
+        )
+        for email in emails:
+            if email not in profiles:
+                self.checkpoint.skipped[email] = "No profile found"
+
+        workout_rows = {}
+        for email in profiles:
+            if email in workouts:
+                workout_rows[email] = {
+                    "preferences": workouts[email].preferences
+                }
+            elif self.workout_preferences is not None:
+                workout_rows[email] = {"preferences": self.workout_preferences}
+            else:
+                self.checkpoint.skipped[email] = "No workout preferences"
+
+        if "workout" in self.kinds:
+            plans = await self._generate_all(
+                {
+                    email: (
+                        plan_cache_key(
+                            "bulk_workout",
+                            preferences=row["preferences"],
+                            biometrics=profiles[email],
+                        ),
+                        functools.partial(agenerate_workout, fallback=False),
+                        WorkoutPlanModel(**row["preferences"]),
+                        profiles[email],
+                    )
+                    for email, row in workout_rows.items()
+                }
+            )
+            for email in list(workout_rows):
+                if email in plans:
+                    workout_rows[email]["generated_plan"] = plans[email]
+                else:
+                    del workout_rows[email]
+            await run_with_async_session(
+                aupsert_workout_plans,
+                [{"user_email": e, **row} for e, row in workout_rows.items()],
+            )
+
+        if "meal" in self.kinds:
+            requests = {}
+            for email, row in workout_rows.items():
+                if email not in meals:
+                    self.checkpoint.skipped[email] = "No meal preferences"
+                    continue
+                # Users with the same inputs share one generation of the run
+                requests[email] = (
+                    plan_cache_key(
+                        "bulk_meal",
+                        workout=row["preferences"],
+                        preferences=meals[email].preferences,
+                        biometrics=profiles[email],
+                    ),
+                    functools.partial(agenerate_meal_plan, fallback=False),
+                    row["preferences"],
+                    MealPlanModel(**meals[email].preferences),
+                    profiles[email],
+                )
+            plans = await self._generate_all(requests)
+            await run_with_async_session(
+                aupsert_meal_plans,
+                [
+                    {
+                        "user_email": email,
+                        "preferences": meals[email].preferences,
+                        "generated_plan": plan,
+                    }
+                    for email, plan in plans.items()
+                ],
+            )
+
+        self.checkpoint.done.update(
+            email for email in emails if email not in self.checkpoint.failed
+        )
+
+    async def run(self, emails, batch_size=BULK_BATCH_SIZE):
+        """Generate the plans of all users not done in an earlier attempt.
+
+        Returns:
+            BulkCheckpoint: The final progress of the run.
+        """
+        emails = list(dict.fromkeys(emails))
+        self.checkpoint.total = len(emails)
+        # Failed users are retried when a run is resumed
+        self.checkpoint.failed = {}
+        pending = [
+            email for email in emails if email not in self.checkpoint.done
+        ]
+        for start in range(0, len(pending), batch_size):
+            await self.run_batch(pending[start : start + batch_size])
+            self.checkpoint.save()
+            self.report(self.checkpoint.summary())
+        self.checkpoint.finished = True
+        self.checkpoint.save()
+        return self.checkpoint
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-generate plans in bulk.")
+    parser.add_argument(
+        "--emails-file",
+        required=True,
+        help="A file with one user email per line",
+    )
+    parser.add_argument("--run-id", help="Resumes the run if it exists")
+    parser.add_argument(
+        "--kinds", nargs="+", choices=PLAN_KINDS, default=PLAN_KINDS
+    )
+    parser.add_argument(
+        "--workout-preferences",
+        help="A JSON file of preferences for users without a workout plan",
+    )
+    parser.add_argument("--batch-size", type=int, default=BULK_BATCH_SIZE)
+    parser.add_argument("--concurrency", type=int, default=BULK_CONCURRENCY)
+    parser.add_argument("--rate", type=float, default=BULK_RATE_PER_SECOND)
+    args = parser.parse_args()
+
+    with open(args.emails_file, encoding="utf-8") as file:
+        emails = [line.strip() for line in file if line.strip()]
+    workout_preferences = None
+    if args.workout_preferences:
+        with open(args.workout_preferences, encoding="utf-8") as file:
+            workout_preferences = WorkoutPlanModel(**json.load(file)).dict()
+
+    run_id = args.run_id or uuid.uuid4().hex
+    print(f"Starting bulk run {run_id} for {len(emails)} users")
+
+    async def run():
+        generator = BulkGenerator(
+            BulkCheckpoint.load(run_id),
+            kinds=tuple(args.kinds),
+            workout_preferences=workout_preferences,
+            concurrency=args.concurrency,
+            rate=args.rate,
+        )
+        try:
+            checkpoint = await generator.run(emails, args.batch_size)
+        finally:
+            await async_engine.dispose()
+        for email, reason in checkpoint.failed.items():
+            print(f"Failed {email}: {reason}")
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
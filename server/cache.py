@@ -0,0 +1,277 @@
+"""Content-addressed cache of generated plans for the fitmate application.
+
+Plans are keyed by a hash of the normalized prompt inputs, so users with the
+same goal, biometrics and preferences share one LLM generation. Lookups go
+through an in-memory LRU tier and, optionally, a persistent database tier.
+"""
+
+import copy
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from threading import Lock
+
+from pydantic import BaseModel
+from sqlalchemy import delete, inspect, select
+from sqlalchemy.dialects.postgresql import insert
+
+from database import AsyncSessionLocal
+from models import PlanCacheEntry
+
+PLAN_CACHE_SIZE = int(os.environ.get("PLAN_CACHE_SIZE", "1024"))
+PLAN_CACHE_TTL = int(os.environ.get("PLAN_CACHE_TTL", str(24 * 60 * 60)))
+PLAN_CACHE_PERSISTENT = os.environ.get("PLAN_CACHE_PERSISTENT", "0") == "1"
+PLAN_CACHE_PERSISTENT_SIZE = int(
+    os.environ.get("PLAN_CACHE_PERSISTENT_SIZE", "100000")
+)
+# The persistent tier is trimmed to its size once every this many writes
+PLAN_CACHE_EVICT_EVERY = int(os.environ.get("PLAN_CACHE_EVICT_EVERY", "100"))
+
+# Columns that identify a user or a row version but do not influence the plan.
+IGNORED_FIELDS = {"id", "user_email", "name", "version"}
+
+
+def normalize_prompt_input(value):
+    """Reduce a prompt input to a canonical, JSON serializable form.
+
+    Pydantic models and ORM instances become dicts without identifying
+    fields, strings are case and whitespace folded and lists of strings
+    (e.g. equipment, allergies) are sorted.
+    """
+    if isinstance(value, BaseModel):
+        value = value.model_dump()
+    elif hasattr(value, "__table__"):
+        value = {
+            attr.key: getattr(value, attr.key)
+            for attr in inspect(value).mapper.column_attrs
+        }
+
+    if isinstance(value, dict):
+        return {
+            str(key): normalize_prompt_input(item)
+            for key, item in value.items()
+            if key not in IGNORED_FIELDS
+        }
+    if isinstance(value, (list, tuple, set)):
+        items = [normalize_prompt_input(item) for item in value]
+        if all(isinstance(item, str) for item in items):
+            items.sort()
+        return items
+    if isinstance(value, str):
+        return " ".join(value.split()).casefold()
+    return value
+
+
+def plan_cache_key(kind, **inputs):
+    """Return the cache key for a plan of `kind` generated from `inputs`."""
+    canonical = json.dumps(
+        {"kind": kind, "inputs": normalize_prompt_input(inputs)},
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class LRUCacheTier:
+    """An in-memory LRU tier with a per-entry TTL."""
+
+    def __init__(self, max_entries=PLAN_CACHE_SIZE, ttl=PLAN_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.evictions += 1
+                return None
+            self._entries.move_to_end(key)
+            return copy.deepcopy(value)
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (
+                time.monotonic() + self.ttl,
+                copy.deepcopy(value),
+            )
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class DatabaseCacheTier:
+    """A persistent tier in the `plan_cache` table, shared across processes."""
+
+    def __init__(
+        self,
+        max_entries=PLAN_CACHE_PERSISTENT_SIZE,
+        ttl=PLAN_CACHE_TTL,
+        evict_every=PLAN_CACHE_EVICT_EVERY,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.evict_every = evict_every
+        self.evictions = 0
+        self._writes = 0
+
+    async def aget(self, key):
+        async with AsyncSessionLocal() as db:
+            entry = await db.get(PlanCacheEntry, key)
+            if entry is None:
+                return None
+            if entry.expires_at <= datetime.utcnow():
+                await db.delete(entry)
+                await db.commit()
+                self.evictions += 1
+                return None
+            return entry.value
+
+    async def aset(self, key, value, kind=None):
+        now = datetime.utcnow()
+        values = {
+            "key": key,
+            "kind": kind,
+            "value": value,
+            "created_at": now,
+            "expires_at": now + timedelta(seconds=self.ttl),
+        }
+        async with AsyncSessionLocal() as db:
+            if db.bind.dialect.name == "postgresql":
+                statement = insert(PlanCacheEntry).values(**values)
+                await db.execute(
+                    statement.on_conflict_do_update(
+                        index_elements=[PlanCacheEntry.key],
+                        set_=dict(statement.excluded),
+                    )
+                )
+            else:
+                await db.merge(PlanCacheEntry(**values))
+            await db.commit()
+            self._writes += 1
+            if self._writes % self.evict_every == 0:
+                await self._aevict(db)
+
+    async def _aevict(self, db):
+        """Drop expired entries, then the oldest ones beyond `max_entries`.
+
+        Run every `evict_every` writes, so the table may briefly hold up to
+        that many entries more than `max_entries`.
+        """
+        expired = await db.execute(
+            delete(PlanCacheEntry).where(
+                PlanCacheEntry.expires_at <= datetime.utcnow()
+            )
+        )
+        newest = (
+            select(PlanCacheEntry.key)
+            .order_by(PlanCacheEntry.created_at.desc())
+            .limit(self.max_entries)
+        )
+        overflow = await db.execute(
+            delete(PlanCacheEntry).where(PlanCacheEntry.key.not_in(newest))
+        )
+        await db.commit()
+        self.evictions += expired.rowcount + overflow.rowcount
+
+    async def aclear(self):
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(PlanCacheEntry))
+            await db.commit()
+
+
+class PlanCache:
+    """A two-tier cache of validated LLM plan responses."""
+
+    def __init__(self, memory, persistent=None):
+        """
+        Args:
+            memory (LRUCacheTier): The in-memory tier, always consulted first.
+            persistent (DatabaseCacheTier, optional): The persistent tier.
+        """
+        self.memory = memory
+        self.persistent = persistent
+        self.hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self._lock = Lock()
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def get(self, key):
+        """Return the cached plan for `key` from the memory tier, or None.
+
+        The persistent tier is only consulted by `aget`.
+        """
+        value = self.memory.get(key)
+        self._count("misses" if value is None else "hits")
+        return value
+
+    def set(self, key, value, kind=None):
+        """Store a plan in the memory tier, see `aset` for every tier."""
+        self.memory.set(key, value)
+
+    async def aget(self, key):
+        """Return the cached plan for `key` from any tier, or None on a miss."""
+        value = self.memory.get(key)
+        if value is None and self.persistent is not None:
+            value = await self.persistent.aget(key)
+            if value is not None:
+                self.memory.set(key, value)
+                self._count("persistent_hits")
+        self._count("misses" if value is None else "hits")
+        return value
+
+    async def aset(self, key, value, kind=None):
+        """Store a plan in every tier."""
+        self.memory.set(key, value)
+        if self.persistent is not None:
+            await self.persistent.aset(key, value, kind)
+
+    def stats(self):
+        """dict: Hit/miss counters and tier sizes for monitoring."""
+        stats = {
+            "hits": self.hits,
+            "persistent_hits": self.persistent_hits,
+            "misses": self.misses,
+            "memory_entries": len(self.memory),
+            "memory_evictions": self.memory.evictions,
+        }
+        if self.persistent is not None:
+            stats["persistent_evictions"] = self.persistent.evictions
+        return stats
+
+    async def aclear(self):
+        self.memory.clear()
+        if self.persistent is not None:
+            await self.persistent.aclear()
+
+
+plan_cache = PlanCache(
+    LRUCacheTier(),
+    DatabaseCacheTier() if PLAN_CACHE_PERSISTENT else None,
+)
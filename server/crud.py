@@ -1,63 +1,197 @@
-from database import get_db
-from schemas import ProgressModel
-from sqlalchemy.orm import Session
-from passlib.context import CryptContext
-from models import User, Profile, WorkoutPlan, MealPlan, Progress
-from sqlalchemy.exc import IntegrityError
-from datetime import datetime, timedelta
+import os
+import time
+from datetime import date, datetime, timedelta
+
 import jwt
 from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import delete, func, select, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import undefer
 
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from cache import LRUCacheTier
+from database import get_async_db
+from metrics import timed
+from models import (
+    MealPlan,
+    Profile,
+    Progress,
+    ProgressEvent,
+    TokenRevocation,
+    User,
+    WorkoutPlan,
+)
+from passwords import password_hasher
+from progress_log import WEIGHT, apply_event, events_from_snapshot
+from schemas import AuthenticatedUser, ProgressModel
 
 SECRET_KEY = "your_secret_key"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/login/")
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-# CRUD Operations
-def create_user(db: Session, email: str, password: str):
-    hashed_password = hash_password(password)
+# Users allowed to use the admin endpoints, comma separated
+ADMIN_EMAILS = {
+    email.strip()
+    for email in os.environ.get("ADMIN_EMAILS", "").split(",")
+    if email.strip()
+}
+
+# INSERT ... ON CONFLICT DO UPDATE of the supported dialects
+UPSERT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+# The rows each section of the dashboard is built from
+DASHBOARD_SECTIONS = {
+    "profile": Profile,
+    "workout_plan": WorkoutPlan,
+    "meal_plan": MealPlan,
+    "progress": Progress,
+}
+
+# Authenticated users are cached by email, so most requests need no users
+# table lookup. Tokens may also be trusted for their lifetime without any
+# users lookup, revoked tokens are rejected either way.
+AUTH_CACHE_SIZE = int(os.environ.get("AUTH_CACHE_SIZE", "10000"))
+AUTH_CACHE_TTL = int(os.environ.get("AUTH_CACHE_TTL", "300"))
+AUTH_TRUST_TOKEN_CLAIMS = os.environ.get("AUTH_TRUST_TOKEN_CLAIMS", "0") == "1"
+# Revocations are stored in the `token_revocations` table and cached for this
+# many seconds, the delay before other workers reject revoked tokens.
+AUTH_REVOCATION_TTL = int(os.environ.get("AUTH_REVOCATION_TTL", "30"))
+
+principal_cache = LRUCacheTier(AUTH_CACHE_SIZE, AUTH_CACHE_TTL)
+# When each user's tokens were last revoked, 0 if they never were.
+revoked_tokens = LRUCacheTier(AUTH_CACHE_SIZE, AUTH_REVOCATION_TTL)
+
+
+def create_jwt_token(email: str):
+    # A float iat tells tokens issued right after a revocation from older ones
+    to_encode = {"sub": email, "iat": time.time()}
+    expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    to_encode.update({"exp": expire})
+    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    return encoded_jwt
+
+
+# Async CRUD Operations, used by the async route handlers and background jobs
+@timed("db.create_user")
+async def acreate_user(db: AsyncSession, email: str, password: str):
+    hashed_password = await password_hasher.hash(password)
     db_user = User(email=email, password=hashed_password)
     db.add(db_user)
     try:
-        db.commit()
-        db.refresh(db_user)
+        await db.commit()
+        await db.refresh(db_user)
     except IntegrityError:
-        db.rollback()
+        await db.rollback()
         raise ValueError("User already exists")
     return db_user
 
-def get_user_by_email(db: Session, email: str):
-    return db.query(User).filter(User.email == email).first()
 
-def hash_password(password: str):
-    return pwd_context.hash(password)
+@timed("db.get_user_by_email")
+async def aget_user_by_email(db: AsyncSession, email: str):
+    result = await db.execute(select(User).where(User.email == email).limit(1))
+    return result.scalars().first()
 
-def verify_password(plain_password: str, hashed_password: str):
-    return pwd_context.verify(plain_password, hashed_password)
 
-def create_jwt_token(email: str):
-    to_encode = {"sub": email}
-    expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
+@timed("auth.login")
+async def aauthenticate_user(db: AsyncSession, email: str, password: str):
+    """Return the user if the password matches, otherwise None.
+
+    Hashes made with outdated parameters (e.g. fewer bcrypt rounds) are
+    replaced on a successful login.
+    """
+    db_user = await aget_user_by_email(db, email)
+    if db_user is None:
+        return None
+    valid, new_hash = await password_hasher.verify(password, db_user.password)
+    if not valid:
+        return None
+    if new_hash is not None:
+        db_user.password = new_hash
+        await db.commit()
+    return db_user
+
+
+@timed("db.invalidate_user")
+async def ainvalidate_user(db: AsyncSession, email: str):
+    """Forget the cached user and reject every token issued to it so far.
+
+    Call this whenever a user is deleted or changes their password. The
+    revocation is committed together with the pending changes of `db`.
+    """
+    principal_cache.delete(email)
+    revoked_at = time.time()
+    now = datetime.utcnow()
+    insert = UPSERT_INSERTS[db.bind.dialect.name]
+    statement = insert(TokenRevocation).values(
+        user_email=email,
+        revoked_at=revoked_at,
+        expires_at=now + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES),
+    )
+    await db.execute(
+        statement.on_conflict_do_update(
+            index_elements=[TokenRevocation.user_email],
+            set_={
+                "revoked_at": statement.excluded.revoked_at,
+                "expires_at": statement.excluded.expires_at,
+            },
+        )
+    )
+    # Tokens of older revocations have expired by now
+    await db.execute(
+        delete(TokenRevocation).where(TokenRevocation.expires_at < now)
+    )
+    await db.commit()
+    revoked_tokens.set(email, revoked_at)
+
+
+async def _arevoked_at(db: AsyncSession, email: str):
+    """Return when the tokens of `email` were last revoked, 0 if never."""
+    revoked_at = revoked_tokens.get(email)
+    if revoked_at is None:
+        result = await db.execute(
+            select(TokenRevocation.revoked_at).where(
+                TokenRevocation.user_email == email
+            )
+        )
+        revoked_at = result.scalar() or 0
+        await db.commit()
+        revoked_tokens.set(email, revoked_at)
+    return revoked_at
 
-def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)):
+
+@timed("auth")
+async def aget_current_user(
+    db: AsyncSession = Depends(get_async_db),
+    token: str = Depends(oauth2_scheme),
+):
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email = payload.get("sub")
         if email is None:
             raise HTTPException(status_code=401, detail="Invalid token")
-        
-        user = get_user_by_email(db, email=email)  # ✅ Use db session here
+
+        # Tokens without an iat predate any revocation of their user
+        revoked_at = await _arevoked_at(db, email)
+        if revoked_at and payload.get("iat", 0) <= revoked_at:
+            raise HTTPException(status_code=401, detail="Token revoked")
+
+        if AUTH_TRUST_TOKEN_CLAIMS:
+            return AuthenticatedUser(email=email)
+
+        user = principal_cache.get(email)
         if user is None:
-            raise HTTPException(status_code=401, detail="User not found")
+            db_user = await aget_user_by_email(db, email=email)
+            if db_user is None:
+                raise HTTPException(status_code=401, detail="User not found")
+            # End the read transaction so the connection goes back to the
+            # pool while the handler runs.
+            await db.commit()
+            user = AuthenticatedUser(email=db_user.email)
+            principal_cache.set(email, user)
 
         return user
     except jwt.ExpiredSignatureError:
@@ -66,101 +200,434 @@ def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_
         raise HTTPException(status_code=401, detail="Invalid token")
 
 
-# Function to create a profile
-def create_profile(db: Session, email: str, profile: Profile):
-    db_profile = db.query(Profile).filter(Profile.user_email == email).first()
-    if db_profile:
+async def aget_admin_user(user: AuthenticatedUser = Depends(aget_current_user)):
+    if user.email not in ADMIN_EMAILS:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return user
+
+
+@timed("db.update_user_password")
+async def aupdate_user_password(db: AsyncSession, email: str, password: str):
+    db_user = await aget_user_by_email(db, email)
+    if db_user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    db_user.password = await password_hasher.hash(password)
+    await ainvalidate_user(db, email)
+    return db_user
+
+
+@timed("db.delete_user")
+async def adelete_user(db: AsyncSession, email: str):
+    db_user = await aget_user_by_email(db, email)
+    if db_user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    await db.delete(db_user)
+    await ainvalidate_user(db, email)
+
+
+@timed("db.create_profile")
+async def acreate_profile(db: AsyncSession, email: str, profile: Profile):
+    if await aget_profile(db, email):
         raise HTTPException(status_code=400, detail="Profile already exists")
-    
+
     db.add(profile)
-    db.commit()
-    db.refresh(profile)
+    await db.commit()
+    await db.refresh(profile)
     return profile
 
-# Function to get a profile
-def get_profile(db: Session, email: str):
-    return db.query(Profile).filter(Profile.user_email == email).first()
-
-# Create workout plan
-def create_workout_plan(db: Session, user_email: str, preferences: dict, generated_plan: dict):
-    db_workout = WorkoutPlan(user_email=user_email, preferences=preferences, generated_plan=generated_plan)
-    db.add(db_workout)
-    db.commit()
-    db.refresh(db_workout)
-    return db_workout
-
-# Get workout plan
-def get_workout_plan(db: Session, user_email: str):
-    db_workout = db.query(WorkoutPlan).filter(WorkoutPlan.user_email == user_email).first()
-    return db_workout
-
-# Update workout plan
-def update_workout_plan(db: Session, user_email: str, preferences: dict, generated_plan: dict):
-    db_workout = db.query(WorkoutPlan).filter(WorkoutPlan.user_email == user_email).first()
-    if db_workout:
-        db_workout.preferences = preferences
-        db_workout.generated_plan = generated_plan
-        db.commit()
-        db.refresh(db_workout)
-        return db_workout
-    else:
-        raise HTTPException(status_code=404, detail="Workout plan not found")
-
-
-def create_meal_plan(db: Session, user_email: str, preferences: dict, generated_plan: dict):
-    db_meal = MealPlan(user_email=user_email, preferences=preferences, generated_plan=generated_plan)
-    db.add(db_meal)
-    db.commit()
-    db.refresh(db_meal)
-    return db_meal
-
-def get_meal_plan(db: Session, user_email: str):
-    db_meal = db.query(MealPlan).filter(MealPlan.user_email == user_email).first()
-    return db_meal
-
-def update_meal_plan(db: Session, user_email: str, preferences: dict, generated_plan: dict):
-    db_meal = db.query(MealPlan).filter(MealPlan.user_email == user_email).first()
-    if db_meal:
-        db_meal.preferences = preferences
-        db_meal.generated_plan = generated_plan
-        db.commit()
-        db.refresh(db_meal)
-        return db_meal
-    else:
-        raise HTTPException(status_code=404, detail="Meal plan not found")
-
-
-def create_progress(db: Session, user_email: str, progress_data: ProgressModel):
-    db_progress = Progress(
-        user_email=user_email,
-        weight=progress_data.weight,
-        workouts_completed=progress_data.workouts_completed,
-        streak=progress_data.streak,
-        calories_burned=progress_data.calories_burned,
-        last_workout_day=progress_data.last_workout_day,
-        personal_records=progress_data.personal_records
-    )
-    db.add(db_progress)
-    db.commit()
-    db.refresh(db_progress)
-    return db_progress
 
-def get_progress(db: Session, user_email: str):
-    db_progress = db.query(Progress).filter(Progress.user_email == user_email).first()
+@timed("db.get_version")
+async def aget_version(db: AsyncSession, model, user_email: str):
+    """Return the `(id, version)` of a user's row of `model`, or None.
+
+    Only the two columns are read, so conditional requests can be answered
+    without loading the row's JSONB.
+    """
+    result = await db.execute(
+        select(model.id, model.version)
+        .where(model.user_email == user_email)
+        .limit(1)
+    )
+    return result.first()
+
+
+@timed("db.get_preferences")
+async def aget_preferences(db: AsyncSession, model, user_email: str):
+    """Return the `(id, version, preferences)` of a user's plan, or None.
+
+    For regenerating a plan, which needs its preferences but not the stored
+    plan document.
+    """
+    result = await db.execute(
+        select(model.id, model.version, model.preferences)
+        .where(model.user_email == user_email)
+        .limit(1)
+    )
+    return result.first()
+
+
+@timed("db.get_profile")
+async def aget_profile(db: AsyncSession, email: str):
+    result = await db.execute(
+        select(Profile).where(Profile.user_email == email).limit(1)
+    )
+    return result.scalars().first()
+
+
+@timed("db.get_workout_plan")
+async def aget_workout_plan(db: AsyncSession, user_email: str):
+    result = await db.execute(
+        select(WorkoutPlan)
+        .options(undefer(WorkoutPlan.generated_plan))
+        .where(WorkoutPlan.user_email == user_email)
+        .limit(1)
+    )
+    return result.scalars().first()
+
+
+@timed("db.upsert_workout_plan")
+async def aupsert_workout_plan(
+    db: AsyncSession, user_email: str, preferences: dict, generated_plan: dict
+):
+    """Create the user's workout plan, or replace it if one exists.
+
+    Done with a single INSERT ... ON CONFLICT DO UPDATE, so concurrent
+    writes for the same user cannot hit the unique `user_email` constraint.
+
+    Returns:
+        Row: The `id` and new `version` of the plan, the plan itself is not
+            read back.
+    """
+    return await _aupsert_plan(
+        db, WorkoutPlan, user_email, preferences, generated_plan
+    )
+
+
+@timed("db.update_workout_plan")
+async def aupdate_workout_plan(
+    db: AsyncSession, user_email: str, preferences: dict, generated_plan: dict
+):
+    return await _aupdate_plan(
+        db,
+        WorkoutPlan,
+        user_email,
+        preferences,
+        generated_plan,
+        "Workout plan not found",
+    )
+
+
+@timed("db.get_meal_plan")
+async def aget_meal_plan(db: AsyncSession, user_email: str):
+    result = await db.execute(
+        select(MealPlan)
+        .options(undefer(MealPlan.generated_plan))
+        .where(MealPlan.user_email == user_email)
+        .limit(1)
+    )
+    return result.scalars().first()
+
+
+@timed("db.upsert_meal_plan")
+async def aupsert_meal_plan(
+    db: AsyncSession, user_email: str, preferences: dict, generated_plan: dict
+):
+    """Create or replace the user's meal plan, see `aupsert_workout_plan`."""
+    return await _aupsert_plan(
+        db, MealPlan, user_email, preferences, generated_plan
+    )
+
+
+@timed("db.update_meal_plan")
+async def aupdate_meal_plan(
+    db: AsyncSession, user_email: str, preferences: dict, generated_plan: dict
+):
+    return await _aupdate_plan(
+        db,
+        MealPlan,
+        user_email,
+        preferences,
+        generated_plan,
+        "Meal plan not found",
+    )
+
+
+def _plans_upsert(db: AsyncSession, model, rows: list):
+    insert = UPSERT_INSERTS[db.bind.dialect.name]
+    statement = insert(model).values(rows)
+    return statement.on_conflict_do_update(
+        index_elements=[model.user_email],
+        set_={
+            "preferences": statement.excluded.preferences,
+            "generated_plan": statement.excluded.generated_plan,
+            "version": model.version + 1,
+        },
+    )
+
+
+async def _aupsert_plan(
+    db: AsyncSession,
+    model,
+    user_email: str,
+    preferences: dict,
+    generated_plan: dict,
+):
+    row = {
+        "user_email": user_email,
+        "preferences": preferences,
+        "generated_plan": generated_plan,
+    }
+    result = await db.execute(
+        _plans_upsert(db, model, [row]).returning(model.id, model.version)
+    )
+    db_plan = result.one()
+    await db.commit()
+    return db_plan
+
+
+async def _aupdate_plan(
+    db: AsyncSession,
+    model,
+    user_email: str,
+    preferences: dict,
+    generated_plan: dict,
+    not_found: str,
+):
+    result = await db.execute(
+        update(model)
+        .where(model.user_email == user_email)
+        .values(
+            preferences=preferences,
+            generated_plan=generated_plan,
+            version=model.version + 1,
+        )
+        .returning(model.id, model.version)
+    )
+    db_plan = result.first()
+    if db_plan is None:
+        await db.rollback()
+        raise HTTPException(status_code=404, detail=not_found)
+    await db.commit()
+    return db_plan
+
+
+@timed("db.load_plan_inputs")
+async def aload_plan_inputs(db: AsyncSession, emails: list):
+    """Load the prompt inputs of many users, one query per table.
+
+    Only the preferences of the plans are read, the deferred generated plans
+    are not needed to generate new ones.
+
+    Returns:
+        tuple[dict, dict, dict]: The `Profile` rows, and the `user_email` and
+            `preferences` of the `WorkoutPlan` and `MealPlan` rows, by email.
+    """
+    result = await db.execute(
+        select(Profile).where(Profile.user_email.in_(emails))
+    )
+    loaded = [{row.user_email: row for row in result.scalars()}]
+    for model in (WorkoutPlan, MealPlan):
+        result = await db.execute(
+            select(model.user_email, model.preferences).where(
+                model.user_email.in_(emails)
+            )
+        )
+        loaded.append({row.user_email: row for row in result})
+    return tuple(loaded)
+
+
+async def _aupsert_plans(db: AsyncSession, model, rows: list):
+    if not rows:
+        return
+    await db.execute(_plans_upsert(db, model, rows))
+    await db.commit()
+
+
+@timed("db.upsert_workout_plans")
+async def aupsert_workout_plans(db: AsyncSession, rows: list):
+    """Create or update many workout plans with one statement.
+
+    Args:
+        rows (list[dict]): The `user_email`, `preferences` and `generated_plan`
+            of each plan.
+    """
+    await _aupsert_plans(db, WorkoutPlan, rows)
+
+
+@timed("db.upsert_meal_plans")
+async def aupsert_meal_plans(db: AsyncSession, rows: list):
+    """Create or update many meal plans, see `aupsert_workout_plans`."""
+    await _aupsert_plans(db, MealPlan, rows)
+
+
+@timed("db.get_dashboard")
+async def aget_dashboard(db: AsyncSession, user_email: str, sections: list):
+    """Load the user's rows of the dashboard `sections` with one query.
+
+    The rows are outer joined to the user, so a missing row is returned as
+    None rather than dropping the others.
+
+    Returns:
+        dict: The row of each section, keyed by section name.
+    """
+    models = [DASHBOARD_SECTIONS[section] for section in sections]
+    query = select(*models).select_from(User)
+    for model in models:
+        query = query.outerjoin(model, model.user_email == User.email)
+        if model in (WorkoutPlan, MealPlan):
+            query = query.options(undefer(model.generated_plan))
+    result = await db.execute(query.where(User.email == user_email).limit(1))
+    row = result.first()
+    return dict(
+        zip(sections, row if row is not None else [None] * len(sections))
+    )
+
+
+@timed("db.get_progress")
+async def aget_progress(
+    db: AsyncSession, user_email: str, for_update: bool = False
+):
+    query = select(Progress).where(Progress.user_email == user_email).limit(1)
+    if for_update:
+        # Serializes concurrent appends to the same aggregates
+        query = query.with_for_update()
+    result = await db.execute(query)
+    return result.scalars().first()
+
+
+@timed("db.get_weight_history")
+async def aget_weight_history(
+    db: AsyncSession, user_email: str, since: date = None, until: date = None
+):
+    query = select(ProgressEvent.day, ProgressEvent.value).where(
+        ProgressEvent.user_email == user_email, ProgressEvent.kind == WEIGHT
+    )
+    if since is not None:
+        query = query.where(ProgressEvent.day >= since)
+    if until is not None:
+        query = query.where(ProgressEvent.day <= until)
+    result = await db.execute(
+        query.order_by(ProgressEvent.day, ProgressEvent.id)
+    )
+    return [{"date": day.isoformat(), "value": value} for day, value in result]
+
+
+@timed("db.get_progress_events")
+async def aget_progress_events(
+    db: AsyncSession,
+    user_email: str,
+    kind: str = None,
+    since: date = None,
+    until: date = None,
+    after: tuple = None,
+    limit: int = 50,
+):
+    """Return a page of progress events, newest first.
+
+    Args:
+        after (tuple[date, int], optional): The `(day, id)` of the last event
+            of the previous page. Pages are keyed on it, so they stay fast
+            however deep the history goes.
+    """
+    query = select(ProgressEvent).where(ProgressEvent.user_email == user_email)
+    if kind is not None:
+        query = query.where(ProgressEvent.kind == kind)
+    if since is not None:
+        query = query.where(ProgressEvent.day >= since)
+    if until is not None:
+        query = query.where(ProgressEvent.day <= until)
+    if after is not None:
+        query = query.where(tuple_(ProgressEvent.day, ProgressEvent.id) < after)
+    query = query.order_by(ProgressEvent.day.desc(), ProgressEvent.id.desc())
+    result = await db.execute(query.limit(limit))
+    return result.scalars().all()
+
+
+async def _alock_progress(
+    db: AsyncSession, user_email: str, baseline: ProgressModel = None
+):
+    """Return the user's progress row locked for update, creating it if needed.
+
+    A missing row is inserted with ON CONFLICT DO NOTHING, so concurrent
+    first writes cannot hit the unique `user_email` constraint.
+
+    Returns:
+        tuple[Progress, bool]: The row and whether it was created.
+    """
+    db_progress = await aget_progress(db, user_email, for_update=True)
+    if db_progress is not None:
+        return db_progress, False
+
+    insert = UPSERT_INSERTS[db.bind.dialect.name]
+    result = await db.execute(
+        insert(Progress)
+        .values(
+            user_email=user_email,
+            weight=[],
+            workouts_completed=baseline.workouts_completed if baseline else 0,
+            streak=baseline.streak if baseline else 0,
+            calories_burned=baseline.calories_burned if baseline else 0,
+            last_workout_day=baseline.last_workout_day if baseline else 0,
+            personal_records=[],
+        )
+        .on_conflict_do_nothing(index_elements=[Progress.user_email])
+        .returning(Progress),
+        execution_options={"populate_existing": True},
+    )
+    db_progress = result.scalars().first()
+    if db_progress is None:
+        # Created by a concurrent request in the meantime
+        return await aget_progress(db, user_email, for_update=True), False
+    return db_progress, True
+
+
+async def _aappend_progress_events(
+    db: AsyncSession, db_progress, user_email: str, events: list
+):
+    for fields in events:
+        event = ProgressEvent(user_email=user_email, **fields)
+        db.add(event)
+        apply_event(db_progress, event)
+    await db.commit()
     return db_progress
 
-def update_progress(db: Session, user_email: str, progress_data: dict):
-    db_progress = db.query(Progress).filter(Progress.user_email == user_email).first()
-    if db_progress:
-        db_progress.weight = progress_data.get("weight", db_progress.weight)
-        db_progress.workouts_completed = progress_data.get("workouts_completed", db_progress.workouts_completed)
-        db_progress.streak = progress_data.get("streak", db_progress.streak)
-        db_progress.calories_burned = progress_data.get("calories_burned", db_progress.calories_burned)
-        db_progress.last_workout_day = progress_data.get("last_workout_day", db_progress.last_workout_day)
-        db_progress.personal_records = progress_data.get("personal_records", db_progress.personal_records)
-        
-        db.commit()
-        db.refresh(db_progress)
-        return db_progress
-    else:
-        raise HTTPException(status_code=404, detail="Progress not found")
\ No newline at end of file
+
+@timed("db.append_progress_events")
+async def aappend_progress_events(
+    db: AsyncSession, user_email: str, events: list
+):
+    """Append progress events and update the user's aggregates with them.
+
+    Args:
+        events (list[dict]): Keyword arguments of the new `ProgressEvent`s.
+    """
+    db_progress, _ = await _alock_progress(db, user_email)
+    return await _aappend_progress_events(db, db_progress, user_email, events)
+
+
+@timed("db.record_progress_snapshot")
+async def arecord_progress_snapshot(
+    db: AsyncSession, user_email: str, progress_data: ProgressModel
+):
+    """Record a full progress snapshot as the events it adds.
+
+    Returns:
+        tuple[Progress, bool]: The updated aggregates and whether they were
+            created.
+    """
+    db_progress, created = await _alock_progress(
+        db, user_email, baseline=progress_data
+    )
+    result = await db.execute(
+        select(func.max(ProgressEvent.day)).where(
+            ProgressEvent.user_email == user_email, ProgressEvent.kind == WEIGHT
+        )
+    )
+    # The counters of a new row are the snapshot's, only its entries are new
+    events = events_from_snapshot(
+        None if created else db_progress, result.scalar(), progress_data
+    )
+    db_progress = await _aappend_progress_events(
+        db, db_progress, user_email, events
+    )
+    return db_progress, created
@@ -0,0 +1,67 @@
+"""Entity tags for the conditional GETs of the fitmate application.
+
+Plans and profiles carry a version that is bumped on every change. Their
+ETags are derived from the row id and that version, so a client's copy can
+be validated by reading two integer columns instead of the whole row.
+"""
+
+import hashlib
+
+from fastapi import Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from crud import aget_version
+
+# Responses are per user and must be revalidated before they are reused
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(kind, row_id, version, *variant):
+    """Return the strong ETag of a row's representation.
+
+    Args:
+        kind (str): The kind of resource, e.g. "workout".
+        variant (str): Query parameters the representation depends on.
+    """
+    tag = f"{kind}-{row_id}-{version}"
+    if variant:
+        digest = hashlib.sha1("|".join(variant).casefold().encode("utf-8"))
+        tag = f"{tag}-{digest.hexdigest()[:12]}"
+    return f'"{tag}"'
+
+
+def etag_matches(if_none_match, etag):
+    """Return whether an If-None-Match header matches `etag`.
+
+    Uses the weak comparison RFC 9110 prescribes for If-None-Match.
+    """
+    if if_none_match.strip() == "*":
+        return True
+    return any(
+        candidate.strip().removeprefix("W/") == etag
+        for candidate in if_none_match.split(",")
+    )
+
+
+def etag_headers(etag):
+    """Return the caching headers of a response tagged with `etag`."""
+    return {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+
+
+async def anot_modified(
+    db: AsyncSession, model, user_email: str, if_none_match, kind, *variant
+):
+    """Return a 304 response if the client's copy is current, else None.
+
+    Only the row's id and version are read, the caller loads the row when
+    None is returned.
+    """
+    if not if_none_match:
+        return None
+    row = await aget_version(db, model, user_email)
+    if row is None:
+        return None
+    etag = make_etag(kind, row.id, row.version, *variant)
+    if not etag_matches(if_none_match, etag):
+        return None
+    return Response(status_code=304, headers=etag_headers(etag))
@@ -0,0 +1,358 @@
+"""Background plan generation jobs for the fitmate application.
+
+Plan generation endpoints enqueue a job and return immediately; an
+in-process pool of asyncio workers claims jobs from a pluggable backend,
+runs the registered handler and stores the result for polling through
+`GET /api/jobs/{id}`. A worker holds a lease on the job it runs and keeps
+renewing it; jobs whose lease expired, because their worker process died,
+are claimed again, and jobs interrupted by a shutdown are queued again.
+"""
+
+import asyncio
+import logging
+import os
+import uuid
+from collections import deque
+from datetime import datetime, timedelta
+from threading import Lock
+
+from sqlalchemy import and_, or_, select, update
+
+from database import AsyncSessionLocal
+from models import GenerationJob
+
+logger = logging.getLogger(__name__)
+
+JOB_BACKEND = os.environ.get("JOB_BACKEND", "database")
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "4"))
+# Workers also poll the backend so jobs enqueued by other processes are seen.
+JOB_POLL_INTERVAL = float(os.environ.get("JOB_POLL_INTERVAL", "1.0"))
+# Running jobs whose lease is not renewed for this long are claimed again
+JOB_LEASE_SECONDS = float(os.environ.get("JOB_LEASE_SECONDS", "60"))
+# Jobs that were abandoned this many times are failed instead
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", "3"))
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+def _new_job(kind, user_email, payload):
+    now = datetime.utcnow()
+    return {
+        "id": uuid.uuid4().hex,
+        "kind": kind,
+        "user_email": user_email,
+        "status": QUEUED,
+        "payload": payload,
+        "result": None,
+        "error": None,
+        "created_at": now,
+        "updated_at": now,
+        "lease_expires_at": None,
+        "attempts": 0,
+    }
+
+
+class InMemoryJobBackend:
+    """Keeps jobs in process memory. Jobs are lost on restart."""
+
+    def __init__(self):
+        self._jobs = {}
+        self._queue = deque()
+        self._lock = Lock()
+
+    async def aenqueue(self, kind, user_email, payload):
+        job = _new_job(kind, user_email, payload)
+        with self._lock:
+            self._jobs[job["id"]] = job
+            self._queue.append(job["id"])
+        return dict(job)
+
+    async def aclaim(self):
+        with self._lock:
+            if not self._queue:
+                return None
+            job = self._jobs[self._queue.popleft()]
+            job["status"] = RUNNING
+            job["updated_at"] = datetime.utcnow()
+            job["attempts"] += 1
+            return dict(job)
+
+    async def aheartbeat(self, job_id):
+        # Jobs only outlive their worker if the process dies, with them
+        pass
+
+    async def arequeue(self, job_id):
+        with self._lock:
+            job = self._jobs[job_id]
+            job.update(status=QUEUED, attempts=job["attempts"] - 1)
+            self._queue.appendleft(job_id)
+
+    def _finish(self, job_id, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields, updated_at=datetime.utcnow())
+
+    async def acomplete(self, job_id, result):
+        self._finish(job_id, status=SUCCEEDED, result=result)
+
+    async def afail(self, job_id, error):
+        self._finish(job_id, status=FAILED, error=error)
+
+    async def aget(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+
+class DatabaseJobBackend:
+    """Stores jobs in the `generation_jobs` table of the application database.
+
+    Works with both Postgres and SQLite, jobs survive restarts and can be
+    shared by several web worker processes.
+    """
+
+    @staticmethod
+    def _to_dict(job):
+        return {
+            column.name: getattr(job, column.name)
+            for column in GenerationJob.__table__.columns
+        }
+
+    async def aenqueue(self, kind, user_email, payload):
+        job = _new_job(kind, user_email, payload)
+        async with AsyncSessionLocal() as db:
+            db.add(GenerationJob(**job))
+            await db.commit()
+        return job
+
+    @staticmethod
+    def _abandoned(now):
+        """The running jobs whose worker stopped renewing their lease."""
+        return and_(
+            GenerationJob.status == RUNNING,
+            or_(
+                GenerationJob.lease_expires_at < now,
+                GenerationJob.lease_expires_at.is_(None),
+            ),
+        )
+
+    async def aclaim(self):
+        async with AsyncSessionLocal() as db:
+            now = datetime.utcnow()
+            await db.execute(
+                update(GenerationJob)
+                .where(self._abandoned(now))
+                .where(GenerationJob.attempts >= JOB_MAX_ATTEMPTS)
+                .values(
+                    status=FAILED,
+                    error="The job was abandoned by its workers",
+                    updated_at=now,
+                )
+            )
+            await db.commit()
+            claimable = or_(
+                GenerationJob.status == QUEUED, self._abandoned(now)
+            )
+            while True:
+                job_id = await db.scalar(
+                    select(GenerationJob.id)
+                    .where(claimable)
+                    .order_by(GenerationJob.created_at)
+                    .limit(1)
+                )
+                if job_id is None:
+                    return None
+                # Only one worker wins the conditional update of a given job.
+                claimed = await db.execute(
+                    update(GenerationJob)
+                    .where(GenerationJob.id == job_id)
+                    .where(claimable)
+                    .values(
+                        status=RUNNING,
+                        updated_at=now,
+                        lease_expires_at=now
+                        + timedelta(seconds=JOB_LEASE_SECONDS),
+                        attempts=GenerationJob.attempts + 1,
+                    )
+                )
+                await db.commit()
+                if claimed.rowcount == 1:
+                    return self._to_dict(await db.get(GenerationJob, job_id))
+
+    async def aheartbeat(self, job_id):
+        """Renew the lease of a running job."""
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(GenerationJob)
+                .where(GenerationJob.id == job_id)
+                .where(GenerationJob.status == RUNNING)
+                .values(
+                    lease_expires_at=datetime.utcnow()
+                    + timedelta(seconds=JOB_LEASE_SECONDS)
+                )
+            )
+            await db.commit()
+
+    async def arequeue(self, job_id):
+        """Queue a running job again, without counting the attempt."""
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(GenerationJob)
+                .where(GenerationJob.id == job_id)
+                .where(GenerationJob.status == RUNNING)
+                .values(
+                    status=QUEUED,
+                    lease_expires_at=None,
+                    attempts=GenerationJob.attempts - 1,
+                    updated_at=datetime.utcnow(),
+                )
+            )
+            await db.commit()
+
+    async def _afinish(self, job_id, **fields):
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(GenerationJob)
+                .where(GenerationJob.id == job_id)
+                .values(updated_at=datetime.utcnow(), **fields)
+            )
+            await db.commit()
+
+    async def acomplete(self, job_id, result):
+        await self._afinish(job_id, status=SUCCEEDED, result=result)
+
+    async def afail(self, job_id, error):
+        await self._afinish(job_id, status=FAILED, error=error)
+
+    async def aget(self, job_id):
+        async with AsyncSessionLocal() as db:
+            job = await db.get(GenerationJob, job_id)
+            return self._to_dict(job) if job else None
+
+
+JOB_BACKENDS = {
+    "memory": InMemoryJobBackend,
+    "database": DatabaseJobBackend,
+}
+
+
+class JobQueue:
+    """A pool of asyncio workers running registered job handlers."""
+
+    def __init__(
+        self,
+        backend,
+        workers=JOB_WORKERS,
+        poll_interval=JOB_POLL_INTERVAL,
+        lease=JOB_LEASE_SECONDS,
+    ):
+        """
+        Args:
+            backend: The job storage backend, see `JOB_BACKENDS`.
+            workers (int, optional): The number of concurrent workers.
+            poll_interval (float, optional): Seconds an idle worker waits
+                before checking the backend again.
+            lease (float, optional): Seconds a claimed job is held without
+                renewing its lease.
+        """
+        self.backend = backend
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self.handlers = {}
+        self._tasks = []
+        self._signals = None
+
+    def handler(self, kind):
+        """Register `async fn(user_email, payload) -> result` for a job kind."""
+
+        def register(fn):
+            self.handlers[kind] = fn
+            return fn
+
+        return register
+
+    async def submit(self, kind, user_email, payload):
+        """Enqueue a job and wake up an idle worker.
+
+        Returns:
+            dict: The queued job.
+        """
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job = await self.backend.aenqueue(kind, user_email, payload)
+        if self._signals is not None:
+            self._signals.put_nowait(job["id"])
+        return job
+
+    async def get(self, job_id):
+        """Return the job with the given id, or None if it does not exist."""
+        return await self.backend.aget(job_id)
+
+    def start(self):
+        """Start the workers on the running event loop."""
+        self._signals = asyncio.Queue()
+        self._tasks = [
+            asyncio.create_task(self._worker()) for _ in range(self.workers)
+        ]
+
+    async def stop(self):
+        """Cancel the workers and wait for them to exit."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._signals = None
+
+    async def _wait_for_work(self):
+        try:
+            await asyncio.wait_for(self._signals.get(), self.poll_interval)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _worker(self):
+        while True:
+            try:
+                job = await self.backend.aclaim()
+            except Exception as e:
+                logger.error(f"Error claiming job: {str(e)}")
+                job = None
+            if job is None:
+                await self._wait_for_work()
+                continue
+            try:
+                await self._run(job)
+            except Exception as e:
+                logger.error(f"Error recording job {job['id']}: {str(e)}")
+
+    async def _heartbeat(self, job_id):
+        """Renew the lease of a running job until it is cancelled."""
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            try:
+                await self.backend.aheartbeat(job_id)
+            except Exception as e:
+                logger.error(f"Error renewing job {job_id}: {str(e)}")
+
+    async def _run(self, job):
+        heartbeat = asyncio.create_task(self._heartbeat(job["id"]))
+        try:
+            result = await self.handlers[job["kind"]](
+                job["user_email"], job["payload"]
+            )
+        except asyncio.CancelledError:
+            # The app is stopping, a worker picks the job up again later
+            await self.backend.arequeue(job["id"])
+            raise
+        except Exception as e:
+            logger.error(f"Job {job['id']} ({job['kind']}) failed: {str(e)}")
+            await self.backend.afail(job["id"], str(e))
+        else:
+            await self.backend.acomplete(job["id"], result)
+        finally:
+            heartbeat.cancel()
+
+
+job_queue = JobQueue(JOB_BACKENDS[JOB_BACKEND]())
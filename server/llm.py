@@ -1,13 +1,28 @@
-import json
+import copy
+import logging
 from datetime import datetime
+
+from pydantic import BaseModel
+
+from agent import CircuitOpenError, WorkoutTrainer
+from cache import plan_cache, plan_cache_key
+from plans import WEEKDAYS, merge_days, summarize_days
+from prompt_builder import PromptBudgetError
+from repair import lenient_loads
 from schemas import ProgressModel
-from agent import WorkoutTrainer
+
+logger = logging.getLogger(__name__)
+
+
+class PlanGenerationError(Exception):
+    """Raised instead of serving the mock plan when a plan failed."""
+
 
 with open("examples/mock-workouts.json", "r", encoding="utf-8") as file:
-    MOCK_WORKOUTS = json.load(file)
+    MOCK_WORKOUTS = lenient_loads(file.read())
 
 with open("examples/mock-meals.json", "r", encoding="utf-8") as file:
-    MOCK_MEALS = json.load(file)
+    MOCK_MEALS = lenient_loads(file.read())
 
 MOCK_PROGRESS = ProgressModel(
     weight=[
@@ -28,30 +43,261 @@ MOCK_PROGRESS = ProgressModel(
 )
 
 with open("mock-workouts.json", "r", encoding="utf-8") as file:
-    MOCK_NEW_WORKOUT = json.load(file)
+    MOCK_NEW_WORKOUT = lenient_loads(file.read())
 
 
-def generate_workout(workout, biometrics):
-    print(workout, biometrics)
-    llm_instance = WorkoutTrainer()
-    workout = MOCK_WORKOUTS
-    workout_plan = llm_instance.generate_workout_plan(workout, biometrics)
+def _check_generated(plan, kind, fallback):
+    """Raise if `plan` failed and the caller wants no mock plan instead."""
+    if not fallback and "error" in plan:
+        raise PlanGenerationError(f"No {kind} plan: {plan['error']}")
+
+
+def _merge_workout(workout_plan):
+    workout = dict(MOCK_WORKOUTS)
     if "workout" in workout_plan:
         workout["workouts"] = workout_plan["workout"]
     return workout
 
 
-def generate_meal_plan(workout, meal_plan, biometrics):
-    print(meal_plan, biometrics)
-    llm_instance = WorkoutTrainer()
-    meal_plan = MOCK_MEALS
-    diet_plan = llm_instance.generate_diet_plan(workout, biometrics, meal_plan)
-    print(diet_plan)
+def _merge_meal_plan(diet_plan):
+    meal_plan = dict(MOCK_MEALS)
     if "diet_plan" in diet_plan:
         meal_plan["meals"] = diet_plan["diet_plan"][0]["meals"]
+        # Keep every generated day so other days are served from storage.
+        meal_plan["diet_plan"] = diet_plan["diet_plan"]
     return meal_plan
 
 
+def _preferences(preferences, default):
+    """Return the preferences a user submitted, as a prompt input.
+
+    Prompts carry the user's own choices, never sample or stored plans.
+    """
+    if not preferences:
+        return default
+    if isinstance(preferences, BaseModel):
+        return preferences.model_dump()
+    return preferences
+
+
+def _cached_plan(kind, generate, refresh=False, **inputs):
+    """Serve the plan from the plan cache, generating it on a miss.
+
+    With `refresh`, e.g. when the user asks for a new plan, the cached plan
+    is skipped and replaced by a freshly generated one. While the LLM
+    circuit breaker is open, or if the prompt is over the token budget, an
+    error is returned, so callers fall back to the mock plans.
+    """
+    key = plan_cache_key(kind, **inputs)
+    plan = None if refresh else plan_cache.get(key)
+    if plan is None:
+        try:
+            plan = generate(**inputs)
+        except (CircuitOpenError, PromptBudgetError) as e:
+            logger.warning(f"{e}. Falling back to the mock {kind} plan")
+            return {"error": str(e)}
+        if "error" not in plan:
+            plan_cache.set(key, plan, kind)
+    return plan
+
+
+async def _acached_plan(kind, agenerate, refresh=False, **inputs):
+    """Async counterpart of `_cached_plan`."""
+    key = plan_cache_key(kind, **inputs)
+    plan = None if refresh else await plan_cache.aget(key)
+    if plan is None:
+        try:
+            plan = await agenerate(**inputs)
+        except (CircuitOpenError, PromptBudgetError) as e:
+            logger.warning(f"{e}. Falling back to the mock {kind} plan")
+            return {"error": str(e)}
+        if "error" not in plan:
+            await plan_cache.aset(key, plan, kind)
+    return plan
+
+
+def generate_workout(workout, biometrics, refresh=False):
+    logger.debug(f"Generating a workout plan for {workout}")
+    llm_instance = WorkoutTrainer()
+    workout_plan = _cached_plan(
+        "workout",
+        llm_instance.generate_workout_plan,
+        refresh=refresh,
+        goal=_preferences(workout, "general fitness"),
+        biometrics=biometrics,
+    )
+    return _merge_workout(workout_plan)
+
+
+async def agenerate_workout(workout, biometrics, refresh=False, fallback=True):
+    logger.debug(f"Generating a workout plan for {workout}")
+    llm_instance = WorkoutTrainer()
+    workout_plan = await _acached_plan(
+        "workout",
+        llm_instance.agenerate_workout_plan,
+        refresh=refresh,
+        goal=_preferences(workout, "general fitness"),
+        biometrics=biometrics,
+    )
+    _check_generated(workout_plan, "workout", fallback)
+    return _merge_workout(workout_plan)
+
+
+def generate_meal_plan(workout_preferences, meal_plan, biometrics):
+    logger.debug(f"Generating a meal plan for {meal_plan}")
+    llm_instance = WorkoutTrainer()
+    diet_plan = _cached_plan(
+        "diet",
+        llm_instance.generate_diet_plan,
+        goal=_preferences(workout_preferences, "general fitness"),
+        biometrics=biometrics,
+        dietary_preferences=_preferences(meal_plan, "balanced"),
+    )
+    return _merge_meal_plan(diet_plan)
+
+
+async def agenerate_meal_plan(
+    workout_preferences, meal_plan, biometrics, fallback=True
+):
+    logger.debug(f"Generating a meal plan for {meal_plan}")
+    llm_instance = WorkoutTrainer()
+    diet_plan = await _acached_plan(
+        "diet",
+        llm_instance.agenerate_diet_plan,
+        goal=_preferences(workout_preferences, "general fitness"),
+        biometrics=biometrics,
+        dietary_preferences=_preferences(meal_plan, "balanced"),
+    )
+    _check_generated(diet_plan, "diet", fallback)
+    return _merge_meal_plan(diet_plan)
+
+
+async def _astream_cached_plan(
+    kind, array_key, astream, agenerate, refresh=False, **inputs
+):
+    """Yield "day" events from the plan cache or the model as they arrive.
+
+    The last event is a "raw" event carrying the plan in the LLM response
+    format. Streamed plans are stored in the plan cache like regular ones,
+    with `refresh` the cached plan is skipped and replaced. If days were
+    dropped as invalid or the stream ended early, the plan is generated
+    again with `agenerate`, so a partial plan is never cached or saved.
+    """
+    key = plan_cache_key(kind, **inputs)
+    plan = None if refresh else await plan_cache.aget(key)
+    if plan is not None:
+        for day in plan[array_key]:
+            yield {"type": "day", "day": day}
+    else:
+        days = []
+        try:
+            async for day in astream(**inputs):
+                days.append(day)
+                yield {"type": "day", "day": day}
+        except (CircuitOpenError, PromptBudgetError) as e:
+            logger.warning(f"{e}. Falling back to the mock {kind} plan")
+            plan = {"error": str(e)}
+        else:
+            if len(days) >= len(WEEKDAYS):
+                plan = {array_key: days}
+                await plan_cache.aset(key, plan, kind)
+            else:
+                logger.warning(
+                    f"Streamed {len(days)} {kind} days, "
+                    "generating the full plan"
+                )
+                plan = await _acached_plan(
+                    kind, agenerate, refresh=True, **inputs
+                )
+    yield {"type": "raw", "plan": plan}
+
+
+async def astream_workout(workout, biometrics, refresh=False):
+    """Yield each workout day as it is generated, then the merged plan."""
+    logger.debug(f"Generating a workout plan for {workout}")
+    llm_instance = WorkoutTrainer()
+    async for event in _astream_cached_plan(
+        "workout",
+        "workout",
+        llm_instance.astream_workout_plan,
+        llm_instance.agenerate_workout_plan,
+        refresh=refresh,
+        goal=_preferences(workout, "general fitness"),
+        biometrics=biometrics,
+    ):
+        if event["type"] == "raw":
+            yield {"type": "plan", "plan": _merge_workout(event["plan"])}
+        else:
+            yield event
+
+
+async def astream_meal_plan(workout_preferences, meal_plan, biometrics):
+    """Yield each diet day as it is generated, then the merged meal plan."""
+    logger.debug(f"Generating a meal plan for {meal_plan}")
+    llm_instance = WorkoutTrainer()
+    async for event in _astream_cached_plan(
+        "diet",
+        "diet_plan",
+        llm_instance.astream_diet_plan,
+        llm_instance.agenerate_diet_plan,
+        goal=_preferences(workout_preferences, "general fitness"),
+        biometrics=biometrics,
+        dietary_preferences=_preferences(meal_plan, "balanced"),
+    ):
+        if event["type"] == "raw":
+            yield {"type": "plan", "plan": _merge_meal_plan(event["plan"])}
+        else:
+            yield event
+
+
+async def aregenerate_workout_days(workout_plan, biometrics, days):
+    """Regenerate only `days` of a stored workout plan.
+
+    Returns:
+        dict: The stored plan with the requested days replaced.
+    """
+    logger.debug(f"Regenerating plan days {days}")
+    plan = copy.deepcopy(workout_plan.generated_plan)
+    current_days = plan.get("workouts", [])
+    llm_instance = WorkoutTrainer()
+    response = await llm_instance.agenerate_workout_days(
+        days,
+        summarize_days(current_days, "exercises", days),
+        goal=_preferences(workout_plan.preferences, "general fitness"),
+        biometrics=biometrics,
+    )
+    if "workout" in response:
+        plan["workouts"] = merge_days(current_days, response["workout"], days)
+    return plan
+
+
+async def aregenerate_meal_days(
+    meal_plan, workout_preferences, biometrics, days
+):
+    """Regenerate only `days` of a stored meal plan.
+
+    Returns:
+        dict: The stored plan with the requested days replaced.
+    """
+    logger.debug(f"Regenerating plan days {days}")
+    plan = copy.deepcopy(meal_plan.generated_plan)
+    current_days = plan.get("diet_plan", [])
+    llm_instance = WorkoutTrainer()
+    response = await llm_instance.agenerate_diet_days(
+        days,
+        summarize_days(current_days, "meals", days),
+        goal=_preferences(workout_preferences, "general fitness"),
+        biometrics=biometrics,
+        dietary_preferences=_preferences(meal_plan.preferences, "balanced"),
+    )
+    if "diet_plan" in response:
+        plan["diet_plan"] = merge_days(
+            current_days, response["diet_plan"], days
+        )
+        plan["meals"] = plan["diet_plan"][0]["meals"]
+    return plan
+
+
 def generate_progress():
     return MOCK_PROGRESS
 
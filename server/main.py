@@ -1,8 +1,56 @@
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+
+from fastapi import Depends, FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from api import auth, profile, workout, meal, progress
+from fastapi.responses import JSONResponse
+
+from agent import WorkoutTrainer
+from api import (
+    admin,
+    auth,
+    dashboard,
+    health,
+    jobs,
+    meal,
+    metrics,
+    profile,
+    progress,
+    workout,
+)
+from database import async_engine
+from jobs import job_queue
+from metrics import METRICS_ENABLED, MetricsMiddleware
+from passwords import PasswordHasherBusy, password_hasher
+from ratelimit import rate_limit
+from responses import CompressionMiddleware, FastJSONResponse
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Set up the model provider now, so a misconfigured one fails at startup
+    WorkoutTrainer()
+    # Plan generation jobs are processed by in-process workers
+    job_queue.start()
+    yield
+    await job_queue.stop()
+    await async_engine.dispose()
+    password_hasher.shutdown()
+
+
+app = FastAPI(lifespan=lifespan, default_response_class=FastJSONResponse)
+
+
+@app.exception_handler(PasswordHasherBusy)
+async def password_hasher_busy_handler(
+    request: Request, exc: PasswordHasherBusy
+):
+    # Login bursts beyond the hashing pool's queue are shed, not queued
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Too many login attempts, please retry"},
+        headers={"Retry-After": "1"},
+    )
 
-app = FastAPI()
 
 # List of allowed origins (can also be "*" to allow all domains)
 origins = [
@@ -19,9 +67,25 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(CompressionMiddleware)
+
+# Times every request, added last so it also covers the other middleware
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 # Include the routers for different API endpoints
 app.include_router(auth.router, prefix="/api")
-app.include_router(profile.router, prefix="/api")
-app.include_router(workout.router, prefix="/api")
-app.include_router(meal.router, prefix="/api")
-app.include_router(progress.router, prefix="/api")
+# Authenticated routes count against the "api" rate limits, job polling
+# against its own "jobs" limits
+api_rate_limit = [Depends(rate_limit("api"))]
+app.include_router(profile.router, prefix="/api", dependencies=api_rate_limit)
+app.include_router(workout.router, prefix="/api", dependencies=api_rate_limit)
+app.include_router(meal.router, prefix="/api", dependencies=api_rate_limit)
+app.include_router(progress.router, prefix="/api", dependencies=api_rate_limit)
+app.include_router(dashboard.router, prefix="/api", dependencies=api_rate_limit)
+app.include_router(
+    jobs.router, prefix="/api", dependencies=[Depends(rate_limit("jobs"))]
+)
+app.include_router(health.router, prefix="/api")
+app.include_router(admin.router, prefix="/api")
+app.include_router(metrics.router)
@@ -0,0 +1,345 @@
+"""Request instrumentation for the fitmate application.
+
+Spans time the parts of a request: authentication, CRUD calls, model calls,
+parsing and validation of model output, and response serialization. Their
+durations feed Prometheus histograms served by `/metrics`, and are summed
+per request into one structured log line. With METRICS_ENABLED=0 spans and
+decorators are no-ops and the middleware is not installed.
+"""
+
+import functools
+import inspect
+import json
+import logging
+import os
+import time
+from contextvars import ContextVar
+from threading import Lock
+
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") == "1"
+
+# Upper bounds of the latency histograms in seconds, model calls take long
+LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    30,
+    60,
+)
+TOKEN_BUCKETS = (250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+
+logger = logging.getLogger("fitmate.requests")
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(
+        f'{name}="{str(value).replace(chr(34), chr(39))}"'
+        for name, value in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+class Counter:
+    """A Prometheus counter with optional labels."""
+
+    type = "counter"
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values = {}
+        self._lock = Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(labels[name] for name in self.labels), 0)
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(
+                    f"{self.name}{_format_labels(self.labels, key)} {value}"
+                )
+        return lines
+
+
+class Gauge(Counter):
+    """A Prometheus gauge with optional labels."""
+
+    type = "gauge"
+
+    def set(self, value, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram:
+    """A Prometheus histogram with optional labels."""
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = buckets
+        # Per label values: the count of each bucket, the sum and the count
+        self._values = {}
+        self._lock = Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def count(self, **labels):
+        state = self._values.get(tuple(labels[name] for name in self.labels))
+        return state[2] if state else 0
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            for key, (buckets, total, count) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, buckets):
+                    cumulative += bucket_count
+                    labels = _format_labels(
+                        self.labels + ("le",), key + (bound,)
+                    )
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.labels + ("le",), key + ("+Inf",))
+                lines.append(f"{self.name}_bucket{labels} {count}")
+                labels = _format_labels(self.labels, key)
+                lines.append(f"{self.name}_sum{labels} {total}")
+                lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    """The metrics exposed by `/metrics`."""
+
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, name, documentation, labels=()):
+        metric = Counter(name, documentation, labels)
+        self.metrics.append(metric)
+        return metric
+
+    def gauge(self, name, documentation, labels=()):
+        metric = Gauge(name, documentation, labels)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(
+        self, name, documentation, labels=(), buckets=LATENCY_BUCKETS
+    ):
+        metric = Histogram(name, documentation, labels, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Return all metrics in the Prometheus text format."""
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUEST_DURATION = registry.histogram(
+    "fitmate_http_request_duration_seconds",
+    "Duration of HTTP requests.",
+    ("method", "route", "status"),
+)
+SPAN_DURATION = registry.histogram(
+    "fitmate_span_duration_seconds",
+    "Duration of the instrumented parts of requests and jobs.",
+    ("span",),
+)
+LLM_CALLS = registry.counter(
+    "fitmate_llm_calls_total", "Model calls by outcome.", ("outcome",)
+)
+LLM_RETRIES = registry.counter(
+    "fitmate_llm_retries_total", "Model call retries by reason.", ("reason",)
+)
+LLM_TOKENS = registry.counter(
+    "fitmate_llm_tokens_total", "Tokens used by model calls.", ("type",)
+)
+RATE_LIMITED = registry.counter(
+    "fitmate_rate_limited_total",
+    "Requests rejected by rate limits.",
+    ("scope", "limit"),
+)
+LLM_QUEUE_DEPTH = registry.gauge(
+    "fitmate_llm_queue_depth",
+    "Model calls waiting for a concurrency slot, by priority.",
+    ("priority",),
+)
+LLM_QUEUE_WAIT = registry.histogram(
+    "fitmate_llm_queue_wait_seconds",
+    "Time model calls waited for a concurrency slot, by priority.",
+    ("priority",),
+)
+PROMPT_TOKENS = registry.histogram(
+    "fitmate_llm_prompt_tokens",
+    "Estimated size of the prompts sent to the model, in tokens.",
+    ("prompt",),
+    buckets=TOKEN_BUCKETS,
+)
+
+# The span durations of the current request, by span name
+_request_spans = ContextVar("request_spans", default=None)
+
+
+class span:
+    """Time a block of code, e.g. `with span("llm.invoke"): ...`."""
+
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if not METRICS_ENABLED:
+            return
+        duration = time.perf_counter() - self.start
+        SPAN_DURATION.observe(duration, span=self.name)
+        spans = _request_spans.get()
+        if spans is not None:
+            spans[self.name] = spans.get(self.name, 0.0) + duration
+
+
+def timed(name):
+    """Decorate a function or coroutine function to run in a `span`."""
+
+    def decorator(fn):
+        if not METRICS_ENABLED:
+            return fn
+        if inspect.iscoroutinefunction(fn):
+
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await fn(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def record_llm_usage(response):
+    """Count the tokens reported with a model response, if any."""
+    usage = getattr(response, "usage_metadata", None)
+    if not METRICS_ENABLED or not isinstance(usage, dict):
+        return
+    LLM_TOKENS.inc(usage.get("input_tokens", 0), type="input")
+    LLM_TOKENS.inc(usage.get("output_tokens", 0), type="output")
+
+
+def route_label(scope):
+    """Return the path template of the route that handled a request.
+
+    Unmatched paths are all labelled "unmatched", to bound the number of
+    label values.
+    """
+    route = scope.get("route")
+    if route is None:
+        return "unmatched"
+    # Routes of routers included with a prefix may report it or not,
+    # depending on the FastAPI version
+    static = route.path.split("{", 1)[0]
+    start = scope["path"].find(static)
+    return scope["path"][:start] + route.path if start > 0 else route.path
+
+
+class MetricsMiddleware:
+    """Records the duration of each request and logs its span breakdown."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        spans = {}
+        token = _request_spans.set(spans)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            duration = time.perf_counter() - start
+            _request_spans.reset(token)
+            path = route_label(scope)
+            REQUEST_DURATION.observe(
+                duration, method=scope["method"], route=path, status=status
+            )
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(
+                    json.dumps(
+                        {
+                            "method": scope["method"],
+                            "route": path,
+                            "status": status,
+                            "duration_ms": round(duration * 1000, 2),
+                            "spans_ms": {
+                                name: round(value * 1000, 2)
+                                for name, value in spans.items()
+                            },
+                        }
+                    )
+                )
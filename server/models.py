@@ -1,10 +1,12 @@
 """Definitions of Database and Pydantic models for fitmate."""
 
+from datetime import datetime
 from typing import List
 
 from pydantic import BaseModel
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Column, Date, DateTime, Float, Index, Integer, String
 from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import deferred
 
 from database import Base
 
@@ -35,6 +37,8 @@ class Profile(Base):
     weight = Column(Integer)
     fitness_level = Column(String)
     dietary_preference = Column(String, nullable=True)
+    # Bumped on every change, the ETag of the profile is derived from it
+    version = Column(Integer, nullable=False, default=1, server_default="1")
 
 
 class WorkoutPlan(Base):
@@ -45,7 +49,10 @@ class WorkoutPlan(Base):
     id = Column(Integer, primary_key=True, index=True)
     user_email = Column(String, unique=True, index=True)
     preferences = Column(JSONB)  # Store preferences as JSONB
-    generated_plan = Column(JSONB)
+    # Large, only loaded when read or when a query undefers it
+    generated_plan = deferred(Column(JSONB))
+    # Bumped on every change, the ETag of the plan is derived from it
+    version = Column(Integer, nullable=False, default=1, server_default="1")
 
 
 class MealPlan(Base):
@@ -56,7 +63,10 @@ class MealPlan(Base):
     id = Column(Integer, primary_key=True, index=True)
     user_email = Column(String, unique=True, index=True)
     preferences = Column(JSONB)  # Store preferences as JSONB
-    generated_plan = Column(JSONB)
+    # Large, only loaded when read or when a query undefers it
+    generated_plan = deferred(Column(JSONB))
+    # Bumped on every change, the ETag of the plan is derived from it
+    version = Column(Integer, nullable=False, default=1, server_default="1")
 
 
 class Progress(Base):
@@ -66,17 +76,97 @@ class Progress(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     user_email = Column(String, unique=True, index=True)
-    weight = Column(JSONB)
+    # Legacy weight history, superseded by progress_events
+    weight = deferred(Column(JSONB))
     workouts_completed = Column(Integer)
     streak = Column(Integer)
     calories_burned = Column(Integer)
     last_workout_day = Column(Integer)
     personal_records = Column(JSONB)
 
+
+class ProgressEvent(Base):
+    """A single entry of a user's append-only progress log."""
+
+    __tablename__ = "progress_events"
+    __table_args__ = (
+        Index("ix_progress_events_user_day", "user_email", "day"),
+        Index("ix_progress_events_user_kind_day", "user_email", "kind", "day"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_email = Column(String, nullable=False)
+    kind = Column(String, nullable=False)  # see progress_log.EVENT_KINDS
+    day = Column(Date, nullable=False)
+    value = Column(Float, nullable=True)  # kg of weight or kcal burned
+    exercise = Column(String, nullable=True)
+    record = Column(String, nullable=True)  # e.g. "80kg"
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class GenerationJob(Base):
+    """Background plan generation job for the database."""
+
+    __tablename__ = "generation_jobs"
+
+    id = Column(String, primary_key=True)
+    user_email = Column(String, index=True)
+    kind = Column(String)
+    status = Column(String, index=True)
+    payload = Column(JSONB)
+    result = Column(JSONB, nullable=True)
+    error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    # Renewed by the worker running the job, expired leases are claimed again
+    lease_expires_at = Column(DateTime, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+
+
+class PlanCacheEntry(Base):
+    """Cached LLM plan keyed by the hash of its prompt inputs."""
+
+    __tablename__ = "plan_cache"
+
+    key = Column(String, primary_key=True)
+    kind = Column(String, nullable=True)
+    value = Column(JSONB)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    expires_at = Column(DateTime, index=True)
+
+
+class RateLimitBucket(Base):
+    """A token bucket of the database rate limit backend."""
+
+    __tablename__ = "rate_limit_buckets"
+
+    key = Column(String, primary_key=True)  # e.g. "llm:user:<email>"
+    tokens = Column(Float, nullable=False)
+    updated_at = Column(Float, nullable=False)  # Unix time of the last check
+    last_request = Column(
+        String, nullable=True
+    )  # Id of the last allowed request
+
+
+class TokenRevocation(Base):
+    """When the tokens of a user were last revoked, shared by all workers."""
+
+    __tablename__ = "token_revocations"
+
+    user_email = Column(String, primary_key=True)
+    revoked_at = Column(
+        Float, nullable=False
+    )  # Tokens issued until then are rejected
+    expires_at = Column(
+        DateTime, index=True
+    )  # When the last of those tokens expires
+
+
 ########################
 ###### LLM MODELS ######
 ########################
 
+
 class Exercise(BaseModel):
     """A model representing an exercise."""
 
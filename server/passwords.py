@@ -0,0 +1,117 @@
+"""Password hashing off the event loop for the fitmate application.
+
+bcrypt is slow on purpose and holds the GIL for part of its work, so hashes
+are computed in a dedicated process pool. The number of pending hashes is
+bounded: once the pool is saturated, callers fail fast instead of queueing
+login bursts without limit.
+"""
+
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from threading import Lock
+
+from passlib.context import CryptContext
+
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(
+    os.environ.get("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 2))
+)
+# Hashes that may be running or queued before callers are turned away.
+PASSWORD_HASH_MAX_PENDING = int(
+    os.environ.get("PASSWORD_HASH_MAX_PENDING", str(PASSWORD_HASH_WORKERS * 8))
+)
+
+# Hashes with other rounds still verify, and are flagged for an update.
+pwd_context = CryptContext(
+    schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS
+)
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when too many password hashes are already pending."""
+
+
+def hash_password(password: str):
+    return pwd_context.hash(password)
+
+
+def verify_password(plain_password: str, hashed_password: str):
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+def verify_and_update(plain_password: str, hashed_password: str):
+    """Verify a password and rehash it if the hash parameters changed.
+
+    Returns:
+        tuple[bool, str | None]: Whether the password matches, and the new
+            hash to store if the old one is outdated.
+    """
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+class PasswordHasher:
+    """Runs password hashing in a bounded process pool."""
+
+    def __init__(
+        self,
+        workers=PASSWORD_HASH_WORKERS,
+        max_pending=PASSWORD_HASH_MAX_PENDING,
+    ):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.rejected = 0
+        self._pending = 0
+        self._pool = None
+        self._lock = Lock()
+
+    @property
+    def pending(self):
+        """int: The number of hashes running or queued."""
+        return self._pending
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(self.workers)
+            return self._pool
+
+    async def _run(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise PasswordHasherBusy("Too many pending password hashes")
+            self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_pool(), fn, *args)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    async def hash(self, password):
+        """Hash a password in the pool.
+
+        Raises:
+            PasswordHasherBusy: If the pool is saturated.
+        """
+        return await self._run(hash_password, password)
+
+    async def verify(self, plain_password, hashed_password):
+        """Verify a password in the pool, see `verify_and_update`.
+
+        Raises:
+            PasswordHasherBusy: If the pool is saturated.
+        """
+        return await self._run(
+            verify_and_update, plain_password, hashed_password
+        )
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(cancel_futures=True)
+                self._pool = None
+
+
+password_hasher = PasswordHasher()
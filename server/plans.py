@@ -0,0 +1,52 @@
+"""Helpers for the days of generated workout and diet plans."""
+
+WEEKDAYS = [
+    "Monday",
+    "Tuesday",
+    "Wednesday",
+    "Thursday",
+    "Friday",
+    "Saturday",
+    "Sunday",
+]
+
+
+def find_day(plan_days, day):
+    """Return the entry of `day` in a list of plan days, or None."""
+    for plan_day in plan_days:
+        if plan_day.get("day", "").casefold() == day.casefold():
+            return plan_day
+    return None
+
+
+def merge_days(current_days, new_days, days):
+    """Replace the requested `days` of `current_days` with the generated ones.
+
+    Generated days that were not requested are ignored, requested days that
+    are new to the plan are added and the days are kept in weekday order.
+    """
+    requested = {day.casefold() for day in days}
+    generated = {
+        day["day"].casefold(): day
+        for day in new_days
+        if day["day"].casefold() in requested
+    }
+    merged = [generated.pop(day["day"].casefold(), day) for day in current_days]
+    if generated:
+        order = {name.casefold(): i for i, name in enumerate(WEEKDAYS)}
+        merged.extend(generated.values())
+        merged.sort(
+            key=lambda day: order.get(day["day"].casefold(), len(order))
+        )
+    return merged
+
+
+def summarize_days(plan_days, items_key, days):
+    """Summarize the days that are kept, as context for a scoped prompt."""
+    requested = {day.casefold() for day in days}
+    summary = [
+        f"{day['day']}: " + ", ".join(item["name"] for item in day[items_key])
+        for day in plan_days
+        if day["day"].casefold() not in requested
+    ]
+    return "\n".join(summary) or "none"
@@ -0,0 +1,185 @@
+"""The append-only progress event log of the fitmate application.
+
+Progress is recorded as events (weight entries, workouts, burned calories
+and personal records). The aggregates shown on the dashboard live in the
+user's `progress` row and are updated incrementally from each new event,
+so neither writes nor reads have to touch the whole history.
+"""
+
+import base64
+import binascii
+from datetime import date, timedelta
+
+WEIGHT = "weight"
+WORKOUT = "workout"
+CALORIES = "calories"
+PERSONAL_RECORD = "personal_record"
+EVENT_KINDS = (WEIGHT, WORKOUT, CALORIES, PERSONAL_RECORD)
+
+
+def day_to_int(day):
+    """Return a date as the YYYYMMDD integer used by `last_workout_day`."""
+    return day.year * 10000 + day.month * 100 + day.day
+
+
+def day_from_int(value):
+    """Return the date of a YYYYMMDD integer, or None if there is none."""
+    if not value:
+        return None
+    return date(value // 10000, value // 100 % 100, value % 100)
+
+
+def apply_event(progress, event):
+    """Update the aggregates of a `progress` row with one new event.
+
+    Args:
+        progress: The user's `Progress` row.
+        event: The new `ProgressEvent`.
+    """
+    if event.kind == WORKOUT:
+        progress.workouts_completed = (progress.workouts_completed or 0) + 1
+        progress.calories_burned = (progress.calories_burned or 0) + int(
+            event.value or 0
+        )
+        last_day = day_from_int(progress.last_workout_day)
+        if last_day is None or event.day > last_day + timedelta(days=1):
+            progress.streak = 1
+        elif event.day == last_day + timedelta(days=1):
+            progress.streak = (progress.streak or 0) + 1
+        # Workouts on the same day or logged for the past keep the streak
+        if last_day is None or event.day > last_day:
+            progress.last_workout_day = day_to_int(event.day)
+    elif event.kind == CALORIES:
+        progress.calories_burned = (progress.calories_burned or 0) + int(
+            event.value or 0
+        )
+    elif event.kind == PERSONAL_RECORD:
+        progress.personal_records = latest_records(
+            progress.personal_records or [], event
+        )
+
+
+def latest_records(records, event):
+    """Return the personal records with the one of `event` applied.
+
+    Only the latest record of each exercise is kept.
+    """
+    record = {
+        "exercise": event.exercise,
+        "value": event.record,
+        "date": event.day.isoformat(),
+    }
+    current = next(
+        (r for r in records if r["exercise"] == event.exercise), None
+    )
+    if current is not None and current["date"] > record["date"]:
+        return records
+    return [r for r in records if r is not current] + [record]
+
+
+def events_from_snapshot(progress, latest_weight_day, snapshot):
+    """Translate a full progress snapshot into the events it adds.
+
+    Clients used to post their whole progress after every change. This
+    keeps them working by only recording what changed.
+
+    Args:
+        progress: The user's `Progress` row, or None for a new user.
+        latest_weight_day (date | None): The day of the latest weight event.
+        snapshot (ProgressModel): The posted progress.
+
+    Returns:
+        list[dict]: The new events, as keyword arguments of `ProgressEvent`.
+    """
+    events = []
+    for entry in snapshot.weight:
+        day = date.fromisoformat(entry["date"])
+        if latest_weight_day is None or day > latest_weight_day:
+            events.append({"kind": WEIGHT, "day": day, "value": entry["value"]})
+
+    current_records = {
+        (r["exercise"], r["value"], r["date"])
+        for r in (progress.personal_records or [] if progress else [])
+    }
+    for entry in snapshot.personal_records:
+        if (
+            entry["exercise"],
+            entry["value"],
+            entry["date"],
+        ) in current_records:
+            continue
+        events.append(
+            {
+                "kind": PERSONAL_RECORD,
+                "day": date.fromisoformat(entry["date"]),
+                "exercise": entry["exercise"],
+                "record": entry["value"],
+            }
+        )
+
+    if progress is None:
+        # Counters of a new user are taken over as they are
+        return events
+
+    workouts = snapshot.workouts_completed - (progress.workouts_completed or 0)
+    calories = snapshot.calories_burned - (progress.calories_burned or 0)
+    workout_day = day_from_int(snapshot.last_workout_day) or date.today()
+    for i in range(max(workouts, 0)):
+        # All calories are booked on the first of the new workouts
+        events.append(
+            {
+                "kind": WORKOUT,
+                "day": workout_day,
+                "value": max(calories, 0) if i == 0 else 0,
+            }
+        )
+    if workouts <= 0 and calories > 0:
+        events.append({"kind": CALORIES, "day": workout_day, "value": calories})
+    return events
+
+
+def bucket_start(day, resolution):
+    """Return the first day of the "day", "week" or "month" holding `day`."""
+    if resolution == "week":
+        return day - timedelta(days=day.weekday())
+    if resolution == "month":
+        return day.replace(day=1)
+    return day
+
+
+def downsample(entries, resolution):
+    """Average `{"date", "value"}` entries per day, week or month.
+
+    Each average is dated at the start of its bucket. The entries must be
+    sorted by date.
+    """
+    buckets = {}
+    for entry in entries:
+        start = bucket_start(date.fromisoformat(entry["date"]), resolution)
+        buckets.setdefault(start, []).append(entry["value"])
+    return [
+        {
+            "date": start.isoformat(),
+            "value": round(sum(values) / len(values), 2),
+        }
+        for start, values in buckets.items()
+    ]
+
+
+def encode_cursor(event):
+    """Return the opaque pagination cursor pointing after `event`."""
+    raw = f"{event.day.isoformat()}|{event.id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor):
+    """Return the `(day, id)` of a cursor.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    try:
+        day, event_id = base64.urlsafe_b64decode(cursor).decode().split("|")
+        return date.fromisoformat(day), int(event_id)
+    except (TypeError, UnicodeDecodeError, binascii.Error) as e:
+        raise ValueError("Invalid cursor") from e
@@ -0,0 +1,140 @@
+"""Prompt construction for the fitmate application.
+
+Prompt inputs such as profiles, preferences and stored plans are serialized
+to compact canonical JSON, so the model sees their values rather than object
+reprs, and equal inputs always give the same prompt. The user's data is
+appended to the static instructions of each prompt, which every request
+shares as a prefix. Prompt sizes are estimated in tokens, recorded and kept
+within PROMPT_TOKEN_BUDGET.
+"""
+
+import json
+import math
+import os
+
+from cache import normalize_prompt_input
+from metrics import PROMPT_TOKENS
+from prompts import (
+    DIET_DAYS_INPUTS,
+    DIET_DAYS_INSTRUCTIONS,
+    DIET_PLAN_INPUTS,
+    DIET_PLAN_INSTRUCTIONS,
+    WORKOUT_DAYS_INPUTS,
+    WORKOUT_DAYS_INSTRUCTIONS,
+    WORKOUT_PLAN_INPUTS,
+    WORKOUT_PLAN_INSTRUCTIONS,
+)
+
+PROMPT_TOKEN_BUDGET = int(os.environ.get("PROMPT_TOKEN_BUDGET", "6000"))
+# A rough average for English text and JSON, there is no local tokenizer
+CHARS_PER_TOKEN = 4
+
+# Replaces optional inputs that are dropped to fit the budget
+OMITTED = "not provided"
+
+
+class PromptBudgetError(ValueError):
+    """Raised when a prompt does not fit the token budget."""
+
+
+def estimate_tokens(text):
+    """Return an estimate of the number of tokens in `text`."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _drop_empty(value):
+    if isinstance(value, dict):
+        return {
+            key: _drop_empty(item)
+            for key, item in value.items()
+            if item is not None and item != [] and item != {}
+        }
+    if isinstance(value, list):
+        return [_drop_empty(item) for item in value]
+    return value
+
+
+def serialize_input(value):
+    """Return the compact canonical text of a prompt input.
+
+    Strings are used as they are. Other values, such as pydantic models,
+    ORM instances and dicts, are normalized like plan cache keys, stripped
+    of empty fields and dumped as JSON with sorted keys and no whitespace.
+    """
+    if isinstance(value, str):
+        return value.strip()
+    return json.dumps(
+        _drop_empty(normalize_prompt_input(value)),
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+        default=str,
+    )
+
+
+class PromptTemplate:
+    """A prompt made of static instructions followed by the user's inputs.
+
+    Args:
+        name (str): The name of the prompt in metrics.
+        instructions (str): The static part of the prompt, used verbatim.
+        inputs (str): A format string of the inputs section.
+        optional (tuple[str], optional): The inputs that may be dropped, in
+            order, when the prompt is over budget.
+    """
+
+    def __init__(self, name, instructions, inputs, optional=()):
+        self.name = name
+        self.prefix = instructions + "\n"
+        self.prefix_tokens = estimate_tokens(self.prefix)
+        self.inputs = inputs
+        self.optional = optional
+
+    def render(self, budget=None, **inputs):
+        """Return the prompt for `inputs`.
+
+        Args:
+            budget (int, optional): The maximum number of tokens. Defaults to
+                PROMPT_TOKEN_BUDGET.
+
+        Raises:
+            PromptBudgetError: If the prompt is over budget even without its
+                optional inputs.
+        """
+        budget = PROMPT_TOKEN_BUDGET if budget is None else budget
+        values = {key: serialize_input(value) for key, value in inputs.items()}
+        prompt = self.prefix + self.inputs.format(**values)
+        tokens = estimate_tokens(prompt)
+        for key in self.optional:
+            if tokens <= budget:
+                break
+            values[key] = OMITTED
+            prompt = self.prefix + self.inputs.format(**values)
+            tokens = estimate_tokens(prompt)
+        if tokens > budget:
+            raise PromptBudgetError(
+                f"The {self.name} prompt needs ~{tokens} tokens, "
+                f"over the budget of {budget}"
+            )
+        PROMPT_TOKENS.observe(tokens, prompt=self.name)
+        return prompt
+
+
+WORKOUT_PLAN_PROMPT = PromptTemplate(
+    "workout", WORKOUT_PLAN_INSTRUCTIONS, WORKOUT_PLAN_INPUTS
+)
+DIET_PLAN_PROMPT = PromptTemplate(
+    "diet", DIET_PLAN_INSTRUCTIONS, DIET_PLAN_INPUTS
+)
+WORKOUT_DAYS_PROMPT = PromptTemplate(
+    "workout_days",
+    WORKOUT_DAYS_INSTRUCTIONS,
+    WORKOUT_DAYS_INPUTS,
+    optional=("other_days",),
+)
+DIET_DAYS_PROMPT = PromptTemplate(
+    "diet_days",
+    DIET_DAYS_INSTRUCTIONS,
+    DIET_DAYS_INPUTS,
+    optional=("other_days",),
+)
@@ -1,61 +1,110 @@
-"""The prompts for the fitmate LLM interactions."""
+"""The prompts for the fitmate LLM interactions.
 
-WORKOUT_PLAN_PROMPT = """\
-You are a fitness trainer designed to assist users in achieving their fitness goals. 
+Each prompt is split into static instructions, identical for every user, and
+an inputs section with the user's data. The instructions come first so that
+requests share a long common prefix, which providers can cache.
+"""
+
+WORKOUT_PLAN_INSTRUCTIONS = """\
+You are a fitness trainer designed to assist users in achieving their fitness goals.
 Your primary function is to provide personalized workout plans based on the user's
 specific needs and preferences.
 
-This is the user's goal:
-
-{goal}
-
-User's biometric data:
-
-{biometrics}
-
-Give a 7 day detailed workout plan based on the user's goal and biometric data.
+Give a 7 day detailed workout plan based on the user's goal and biometric data,
+which are given after these instructions.
 Information on the workout should include exercises and number of sets, reps, and rest periods (in seconds).
-The workout should be tailored to the user's fitness level, age, gender, 
+The workout should be tailored to the user's fitness level, age, gender,
 and any specific health conditions they may have.
 
 Return the output as a JSON object.
 
 Use this JSON format:
 
-Exercise = {{'name': str, 'sets': int, 'reps': int, 'rest': int}}
-Workout = {{'day': str, 'exercises': list[Exercise]}}
+Exercise = {'name': str, 'sets': int, 'reps': int, 'rest': int}
+Workout = {'day': str, 'exercises': list[Exercise]}
 
 Example:
 
-{{
+{
   "workout": [
-    {{
+    {
       "day": "Monday",
       "exercises": [
-        {{
+        {
           "name": "Push-ups",
           "sets": 3,
           "reps": 15,
           "rest": 60
-        }}
+        }
       ]
-    }},
-    {{
+    },
+    {
       "day": "Tuesday",
       ...
-    }}
+    }
   ]
-}}
+}
 
 Return list[Workout]
 """
 
+WORKOUT_PLAN_INPUTS = """\
+This is the user's goal:
 
-DIET_PLAN_PROMPT = """\
+{goal}
+
+User's biometric data:
+
+{biometrics}
+"""
+
+
+DIET_PLAN_INSTRUCTIONS = """\
 You are a fitness trainer designed to assist users in achieving their health and fitness goals.
-Your primary function is to provide personalized diet plans based on the user's specific 
+Your primary function is to provide personalized diet plans based on the user's specific
 needs, preferences, and dietary restrictions.
 
+Give a 7-day detailed diet plan based on the user's goal, biometric data, and preferences,
+which are given after these instructions.
+Each day should include breakfast, lunch, dinner, and two snacks. Provide meal suggestions
+with approximate calorie counts and macronutrient breakdowns (carbs, protein, fat). Adjust
+the plan to suit the user's lifestyle, fitness goals, and dietary restrictions.
+
+Return the output as a JSON object.
+
+Use this JSON format:
+
+Meal = {'type': str, 'name': str, 'calories': int, 'carbs': int, 'protein': int, 'fat': int}
+DayPlan = {'day': str, 'meals': list[Meal]}
+DietPlan = {'diet_plan': list[DayPlan]}
+
+Example:
+{
+  "diet_plan": [
+    {
+      "day": "Monday",
+      "meals": [
+        {
+          "type": "Breakfast",
+          "name": "Oatmeal with blueberries and almonds",
+          "calories": 350,
+          "carbs": 40,
+          "protein": 10,
+          "fat": 12
+        },
+        {
+          "type": "Lunch",
+          ...
+        }
+      ]
+    }
+  ]
+}
+
+Return list[DietPlan]
+"""
+
+DIET_PLAN_INPUTS = """\
 This is the user's goal:
 
 {goal}
@@ -67,42 +116,123 @@ User's biometric data:
 User's dietary preferences and restrictions:
 
 {dietary_preferences}
+"""
 
-Give a 7-day detailed diet plan based on the user's goal, biometric data, and preferences.
-Each day should include breakfast, lunch, dinner, and two snacks. Provide meal suggestions 
-with approximate calorie counts and macronutrient breakdowns (carbs, protein, fat). Adjust 
-the plan to suit the user's lifestyle, fitness goals, and dietary restrictions.
+WORKOUT_DAYS_INSTRUCTIONS = """\
+You are a fitness trainer designed to assist users in achieving their fitness goals.
+Your primary function is to provide personalized workout plans based on the user's
+specific needs and preferences.
+
+The user already has a weekly workout plan. Give a detailed workout plan for the
+requested days only. The user's goal, biometric data, the exercises on the other
+days and the requested days are given after these instructions.
+Information on the workout should include exercises and number of sets, reps, and rest periods (in seconds).
+Balance the new days with the rest of the week and tailor them to the user's fitness level,
+age, gender, and any specific health conditions they may have.
+
+Return the output as a JSON object.
+
+Use this JSON format:
+
+Exercise = {'name': str, 'sets': int, 'reps': int, 'rest': int}
+Workout = {'day': str, 'exercises': list[Exercise]}
+
+Example:
+
+{
+  "workout": [
+    {
+      "day": "Monday",
+      "exercises": [
+        {
+          "name": "Push-ups",
+          "sets": 3,
+          "reps": 15,
+          "rest": 60
+        }
+      ]
+    }
+  ]
+}
+
+Return list[Workout] with exactly one Workout per requested day.
+"""
+
+WORKOUT_DAYS_INPUTS = """\
+This is the user's goal:
+
+{goal}
+
+User's biometric data:
+
+{biometrics}
+
+These are the exercises on the other days:
+
+{other_days}
+
+The requested days: {days}
+"""
+
+
+DIET_DAYS_INSTRUCTIONS = """\
+You are a fitness trainer designed to assist users in achieving their health and fitness goals.
+Your primary function is to provide personalized diet plans based on the user's specific
+needs, preferences, and dietary restrictions.
+
+The user already has a weekly diet plan. Give a detailed diet plan for the requested
+days only. The user's goal, biometric data, dietary preferences, the meals on the
+other days and the requested days are given after these instructions.
+Each day should include breakfast, lunch, dinner, and two snacks. Provide meal suggestions
+with approximate calorie counts and macronutrient breakdowns (carbs, protein, fat). Vary the
+meals from the other days and respect the user's dietary restrictions.
 
 Return the output as a JSON object.
 
 Use this JSON format:
 
-Meal = {{'type': str, 'name': str, 'calories': int, 'carbs': int, 'protein': int, 'fat': int}}
-DayPlan = {{'day': str, 'meals': list[Meal]}}
-DietPlan = {{'diet_plan': list[DayPlan]}}
+Meal = {'type': str, 'name': str, 'calories': int, 'carbs': int, 'protein': int, 'fat': int}
+DayPlan = {'day': str, 'meals': list[Meal]}
+DietPlan = {'diet_plan': list[DayPlan]}
 
 Example:
-{{
+{
   "diet_plan": [
-    {{
+    {
       "day": "Monday",
       "meals": [
-        {{
+        {
           "type": "Breakfast",
           "name": "Oatmeal with blueberries and almonds",
           "calories": 350,
           "carbs": 40,
           "protein": 10,
           "fat": 12
-        }},
-        {{
-          "type": "Lunch",
-          ...
-        }}
+        }
       ]
-    }}
+    }
   ]
-}}
+}
 
-Return list[DietPlan]
-"""
\ No newline at end of file
+Return list[DietPlan] with exactly one DayPlan per requested day.
+"""
+
+DIET_DAYS_INPUTS = """\
+This is the user's goal:
+
+{goal}
+
+User's biometric data:
+
+{biometrics}
+
+User's dietary preferences and restrictions:
+
+{dietary_preferences}
+
+These are the meals on the other days:
+
+{other_days}
+
+The requested days: {days}
+"""
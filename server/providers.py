@@ -0,0 +1,395 @@
+"""Model providers for the fitmate application.
+
+The trainer sends its prompts to the provider named by LLM_PROVIDER:
+"gemini" calls Google's Gemini models, "local" answers from the example
+responses without a network or an API key, for offline development and load
+tests, and "replay" serves responses recorded earlier with LLM_RECORD_PATH.
+Providers are used like LangChain chat models, and each call names its
+request type ("workout", "diet", "workout_days" or "diet_days"), which
+selects the model it runs on.
+"""
+
+import abc
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import time
+from collections import defaultdict
+from threading import Lock
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_google_genai import ChatGoogleGenerativeAI
+
+from prompt_builder import estimate_tokens
+
+
+def parse_mapping(value):
+    """Parse "workout=a,diet=b" into `{"workout": "a", "diet": "b"}`."""
+    mapping = {}
+    for item in value.split(","):
+        name, _, setting = item.partition("=")
+        if name.strip():
+            mapping[name.strip()] = setting.strip()
+    return mapping
+
+
+LLM_PROVIDER = os.environ.get("LLM_PROVIDER", "gemini")
+GEMINI_MODEL = "gemini-2.0-flash-lite"
+LLM_MODEL = os.environ.get("LLM_MODEL", GEMINI_MODEL)
+# The model of each request type, LLM_MODEL for those not listed
+LLM_MODELS = parse_mapping(os.environ.get("LLM_MODELS", ""))
+# The call timeout of each provider in seconds, LLM_CALL_TIMEOUT if not listed
+LLM_PROVIDER_TIMEOUTS = {
+    name: float(timeout)
+    for name, timeout in parse_mapping(
+        os.environ.get("LLM_PROVIDER_TIMEOUTS", "local=5,replay=5")
+    ).items()
+}
+# Appends every response to this JSON lines file, for the replay provider
+LLM_RECORD_PATH = os.environ.get("LLM_RECORD_PATH", "")
+LLM_REPLAY_PATH = os.environ.get("LLM_REPLAY_PATH", "llm-recording.jsonl")
+
+# Simulated latency and failures of the local provider, in seconds
+LLM_LOCAL_LATENCY = float(os.environ.get("LLM_LOCAL_LATENCY", "0"))
+LLM_LOCAL_JITTER = float(os.environ.get("LLM_LOCAL_JITTER", "0"))
+LLM_LOCAL_FAILURE_RATE = float(os.environ.get("LLM_LOCAL_FAILURE_RATE", "0"))
+
+EXAMPLE_RESPONSES = {
+    "workout": ("examples/workout_response.json", "workout"),
+    "diet": ("examples/diet_response.json", "diet_plan"),
+}
+
+
+def prompt_key(prompt):
+    """Return the key of a recorded response to `prompt`."""
+    return hashlib.sha256(str(prompt).encode("utf-8")).hexdigest()
+
+
+def _plan_kind(prompt, request_type):
+    """Return "workout" or "diet", guessed from the prompt if the request
+    type is not given."""
+    if request_type is None:
+        return "diet" if "diet_plan" in str(prompt) else "workout"
+    return request_type.split("_", 1)[0]
+
+
+class ModelProvider(abc.ABC):
+    """The interface of model providers.
+
+    Subclasses must implement `invoke`, `ainvoke` and `astream`.
+
+    Args:
+        timeout (float): The timeout of a single model call, in seconds.
+        models (dict[str, str], optional): The model of each request type.
+        default_model (str, optional): The model of other request types.
+    """
+
+    name = None
+
+    def __init__(self, timeout, models=None, default_model=LLM_MODEL):
+        self.timeout = timeout
+        self.models = LLM_MODELS if models is None else models
+        self.default_model = default_model
+
+    def model(self, request_type=None):
+        """Return the name of the model that serves `request_type`."""
+        return self.models.get(request_type, self.default_model)
+
+    @abc.abstractmethod
+    def invoke(self, prompt, request_type=None):
+        """Return the `AIMessage` answering `prompt`."""
+
+    @abc.abstractmethod
+    async def ainvoke(self, prompt, request_type=None):
+        """Async counterpart of `invoke`."""
+
+    @abc.abstractmethod
+    def astream(self, prompt, request_type=None):
+        """Return an async iterator of the `AIMessageChunk`s of the answer."""
+
+
+class GeminiProvider(ModelProvider):
+    """Calls Google's Gemini models, with one client per model."""
+
+    name = "gemini"
+
+    def __init__(self, timeout, models=None, default_model=LLM_MODEL):
+        super().__init__(timeout, models, default_model)
+        self.api_key = os.environ.get("GOOGLE_API_KEY")
+        if not self.api_key:
+            raise RuntimeError(
+                "GOOGLE_API_KEY not set. Please set it in your environment "
+                "variables, or set LLM_PROVIDER=local to run without it."
+            )
+        self._clients = {}
+        self._lock = Lock()
+
+    def client(self, request_type=None):
+        """Return the chat model client of `request_type`."""
+        model = self.model(request_type)
+        with self._lock:
+            if model not in self._clients:
+                # Retries are handled by the trainer, not by the client.
+                self._clients[model] = ChatGoogleGenerativeAI(
+                    model=model,
+                    api_key=self.api_key,
+                    timeout=self.timeout,
+                    max_retries=0,
+                )
+            return self._clients[model]
+
+    def invoke(self, prompt, request_type=None):
+        return self.client(request_type).invoke(prompt)
+
+    async def ainvoke(self, prompt, request_type=None):
+        return await self.client(request_type).ainvoke(prompt)
+
+    async def astream(self, prompt, request_type=None):
+        async for chunk in self.client(request_type).astream(prompt):
+            yield chunk
+
+
+class LocalProvider(ModelProvider):
+    """Answers every prompt with the example responses, without a network.
+
+    Responses depend only on the request type and, for day requests, on
+    the requested days, so they are the same on every run. Latencies are
+    drawn from a normal distribution and a share of the calls raise a
+    `TimeoutError`, which the trainer retries; draws are seeded, so runs
+    with the same settings are comparable.
+
+    Args:
+        latency (float, optional): The mean latency of a call, in seconds.
+        jitter (float, optional): The standard deviation of the latency.
+        failure_rate (float, optional): The share of calls that time out.
+        seed (int, optional): The seed of the latency and failure draws.
+    """
+
+    name = "local"
+    # Characters per streamed chunk
+    CHUNK_SIZE = 200
+
+    def __init__(
+        self,
+        timeout,
+        models=None,
+        default_model=LLM_MODEL,
+        latency=LLM_LOCAL_LATENCY,
+        jitter=LLM_LOCAL_JITTER,
+        failure_rate=LLM_LOCAL_FAILURE_RATE,
+        seed=0,
+    ):
+        super().__init__(timeout, models, default_model)
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.calls = 0
+        self.failures = 0
+        self._random = random.Random(seed)
+        self._lock = Lock()
+        self._examples = {}
+        for kind, (path, array_key) in EXAMPLE_RESPONSES.items():
+            with open(path, encoding="utf-8") as file:
+                self._examples[kind] = (array_key, json.load(file)[array_key])
+
+    def respond(self, prompt, request_type=None):
+        """Return the text of the answer to `prompt`."""
+        kind = _plan_kind(prompt, request_type)
+        array_key, days = self._examples[kind]
+        requested = re.search(
+            r"^The requested days: (.+)$", str(prompt), re.MULTILINE
+        )
+        if requested:
+            # Fill each requested day from the example day in its position
+            names = [name.strip() for name in requested.group(1).split(",")]
+            days = [
+                {**days[i % len(days)], "day": name}
+                for i, name in enumerate(names)
+            ]
+        return json.dumps({array_key: days})
+
+    def _draw(self, prompt, request_type):
+        with self._lock:
+            self.calls += 1
+            delay = max(0.0, self._random.gauss(self.latency, self.jitter))
+            failed = self._random.random() < self.failure_rate
+            if failed:
+                self.failures += 1
+        return delay, failed, self.respond(prompt, request_type)
+
+    def _message(self, prompt, content, request_type):
+        return AIMessage(
+            content=content,
+            response_metadata={"model_name": self.model(request_type)},
+            usage_metadata={
+                "input_tokens": estimate_tokens(str(prompt)),
+                "output_tokens": estimate_tokens(content),
+                "total_tokens": estimate_tokens(str(prompt))
+                + estimate_tokens(content),
+            },
+        )
+
+    def invoke(self, prompt, request_type=None):
+        delay, failed, content = self._draw(prompt, request_type)
+        time.sleep(delay)
+        if failed:
+            raise TimeoutError("Simulated model timeout")
+        return self._message(prompt, content, request_type)
+
+    async def ainvoke(self, prompt, request_type=None):
+        delay, failed, content = self._draw(prompt, request_type)
+        await asyncio.sleep(delay)
+        if failed:
+            raise TimeoutError("Simulated model timeout")
+        return self._message(prompt, content, request_type)
+
+    async def astream(self, prompt, request_type=None):
+        delay, failed, content = self._draw(prompt, request_type)
+        starts = range(0, len(content), self.CHUNK_SIZE)
+        for start in starts:
+            await asyncio.sleep(delay / len(starts))
+            if failed:
+                raise TimeoutError("Simulated model timeout")
+            yield AIMessageChunk(
+                content=content[start : start + self.CHUNK_SIZE]
+            )
+
+
+class ReplayMissError(LookupError):
+    """Raised when no recorded response can answer a prompt."""
+
+
+class ReplayProvider(ModelProvider):
+    """Serves the responses recorded in a JSON lines file.
+
+    A prompt gets the response recorded for the same prompt. Prompts that
+    were not recorded, such as those of other users, get the recorded
+    responses of their request type in turn.
+
+    Args:
+        path (str, optional): The recording, see `RecordingProvider`.
+    """
+
+    name = "replay"
+
+    def __init__(
+        self,
+        timeout,
+        models=None,
+        default_model=LLM_MODEL,
+        path=LLM_REPLAY_PATH,
+    ):
+        super().__init__(timeout, models, default_model)
+        self._by_prompt = {}
+        self._by_type = defaultdict(list)
+        self._turns = defaultdict(int)
+        self._lock = Lock()
+        with open(path, encoding="utf-8") as file:
+            for line in file:
+                if line.strip():
+                    record = json.loads(line)
+                    self._by_prompt[record["key"]] = record["content"]
+                    self._by_type[record["request_type"]].append(
+                        record["content"]
+                    )
+
+    def respond(self, prompt, request_type=None):
+        """Return the text of the recorded answer to `prompt`.
+
+        Raises:
+            ReplayMissError: If nothing was recorded for the request type.
+        """
+        content = self._by_prompt.get(prompt_key(prompt))
+        if content is not None:
+            return content
+        recorded = self._by_type.get(request_type)
+        if not recorded:
+            raise ReplayMissError(f"No recorded {request_type} responses")
+        with self._lock:
+            turn = self._turns[request_type]
+            self._turns[request_type] += 1
+        return recorded[turn % len(recorded)]
+
+    def invoke(self, prompt, request_type=None):
+        return AIMessage(content=self.respond(prompt, request_type))
+
+    async def ainvoke(self, prompt, request_type=None):
+        return self.invoke(prompt, request_type)
+
+    async def astream(self, prompt, request_type=None):
+        yield AIMessageChunk(content=self.respond(prompt, request_type))
+
+
+class RecordingProvider(ModelProvider):
+    """Records the responses of another provider for `ReplayProvider`.
+
+    Each response is appended to a JSON lines file with the key of its
+    prompt and its request type.
+
+    Args:
+        provider (ModelProvider): The provider whose responses are recorded.
+        path (str): The file the responses are appended to.
+    """
+
+    def __init__(self, provider, path):
+        super().__init__(
+            provider.timeout, provider.models, provider.default_model
+        )
+        self.name = provider.name
+        self.provider = provider
+        self.path = path
+        self._lock = Lock()
+
+    def record(self, prompt, request_type, content):
+        line = json.dumps(
+            {
+                "key": prompt_key(prompt),
+                "request_type": request_type,
+                "content": content,
+            }
+        )
+        with self._lock, open(self.path, "a", encoding="utf-8") as file:
+            file.write(line + "\n")
+
+    def invoke(self, prompt, request_type=None):
+        response = self.provider.invoke(prompt, request_type)
+        self.record(prompt, request_type, response.content)
+        return response
+
+    async def ainvoke(self, prompt, request_type=None):
+        response = await self.provider.ainvoke(prompt, request_type)
+        self.record(prompt, request_type, response.content)
+        return response
+
+    async def astream(self, prompt, request_type=None):
+        content = []
+        async for chunk in self.provider.astream(prompt, request_type):
+            content.append(chunk.content)
+            yield chunk
+        self.record(prompt, request_type, "".join(content))
+
+
+LLM_PROVIDERS = {
+    "gemini": GeminiProvider,
+    "local": LocalProvider,
+    "replay": ReplayProvider,
+}
+
+
+def create_provider(name=LLM_PROVIDER, default_timeout=30.0):
+    """Create the configured provider, recording it if LLM_RECORD_PATH is set.
+
+    Args:
+        name (str, optional): The provider, see `LLM_PROVIDERS`.
+        default_timeout (float, optional): The call timeout of providers not
+            listed in LLM_PROVIDER_TIMEOUTS, in seconds.
+    """
+    provider = LLM_PROVIDERS[name](
+        LLM_PROVIDER_TIMEOUTS.get(name, default_timeout)
+    )
+    if LLM_RECORD_PATH:
+        provider = RecordingProvider(provider, LLM_RECORD_PATH)
+    return provider
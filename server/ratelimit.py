@@ -0,0 +1,219 @@
+"""Rate limiting of API requests for the fitmate application.
+
+Requests are metered with token buckets, one per user and one shared by all
+users, for each scope: "llm" for routes that trigger a plan generation,
+"jobs" for polling the status of background jobs and "api" for every other
+authenticated route. Buckets live in process memory, or in the
+`rate_limit_buckets` table when several workers must share them. Rejected
+requests get a 429 with a Retry-After header.
+"""
+
+import math
+import os
+import time
+import uuid
+from collections import OrderedDict
+from threading import Lock
+from typing import NamedTuple
+
+from fastapi import Depends, HTTPException
+from sqlalchemy import case
+
+from crud import UPSERT_INSERTS, aget_current_user
+from database import AsyncSessionLocal
+from metrics import RATE_LIMITED
+from models import RateLimitBucket
+from schemas import UserRequest
+
+RATE_LIMIT_ENABLED = os.environ.get("RATE_LIMIT_ENABLED", "1") == "1"
+RATE_LIMIT_BACKEND = os.environ.get("RATE_LIMIT_BACKEND", "memory")
+# Buckets of the memory backend, the least recently used are dropped
+RATE_LIMIT_MAX_KEYS = int(os.environ.get("RATE_LIMIT_MAX_KEYS", "100000"))
+
+
+class Rate(NamedTuple):
+    """A bucket of `capacity` requests, refilled in full every `period`
+    seconds."""
+
+    capacity: float
+    period: float
+
+    @property
+    def per_second(self):
+        return self.capacity / self.period
+
+
+def parse_rate(value):
+    """Parse a rate like "5/60", or return None for "" and "0" (no limit)."""
+    if not value or value == "0":
+        return None
+    capacity, _, period = value.partition("/")
+    return Rate(float(capacity), float(period or 1))
+
+
+# "<requests>/<seconds>" per scope, for each user and for all users
+RATE_LIMITS = {
+    "llm": {
+        "user": parse_rate(os.environ.get("RATE_LIMIT_USER_LLM", "5/60")),
+        "global": parse_rate(os.environ.get("RATE_LIMIT_GLOBAL_LLM", "60/60")),
+    },
+    "api": {
+        "user": parse_rate(os.environ.get("RATE_LIMIT_USER_API", "120/60")),
+        "global": parse_rate(os.environ.get("RATE_LIMIT_GLOBAL_API", "")),
+    },
+    # Clients poll their jobs until they finish, apart from their requests
+    "jobs": {
+        "user": parse_rate(os.environ.get("RATE_LIMIT_USER_JOBS", "600/60")),
+        "global": parse_rate(os.environ.get("RATE_LIMIT_GLOBAL_JOBS", "")),
+    },
+}
+
+
+def refill(tokens, elapsed, rate):
+    """Return the tokens of a bucket `elapsed` seconds after it had `tokens`."""
+    return min(rate.capacity, tokens + max(elapsed, 0) * rate.per_second)
+
+
+def retry_after(tokens, rate, cost=1):
+    """Return the seconds until a bucket with `tokens` can afford `cost`."""
+    return max(cost - tokens, 0) / rate.per_second
+
+
+class InMemoryRateLimitBackend:
+    """Keeps buckets in process memory, each worker limits on its own."""
+
+    def __init__(self, max_keys=RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        # (tokens, updated_at) by key
+        self._buckets = OrderedDict()
+        self._lock = Lock()
+
+    def take(self, key, rate, cost=1, now=None):
+        """Take `cost` tokens from the bucket of `key` if it has them.
+
+        Returns:
+            tuple[bool, float]: Whether the request is allowed and, if not,
+                the seconds to wait before retrying.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (rate.capacity, now))
+            tokens = refill(tokens, now - updated_at, rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                # A dropped bucket is as good as full, which errs on allowing
+                self._buckets.popitem(last=False)
+        return allowed, 0.0 if allowed else retry_after(tokens, rate, cost)
+
+    async def atake(self, key, rate, cost=1):
+        return self.take(key, rate, cost)
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class DatabaseRateLimitBackend:
+    """Keeps buckets in the `rate_limit_buckets` table, shared by all workers.
+
+    Each check is a single INSERT ... ON CONFLICT DO UPDATE, which refills
+    the bucket and takes the tokens atomically. The request is allowed if
+    its random id was stored as the bucket's `last_request`.
+    """
+
+    async def atake(self, key, rate, cost=1):
+        now = time.time()
+        request_id = uuid.uuid4().hex
+        async with AsyncSessionLocal() as db:
+            insert = UPSERT_INSERTS[db.bind.dialect.name]
+            statement = insert(RateLimitBucket).values(
+                key=key,
+                tokens=rate.capacity - cost,
+                updated_at=now,
+                last_request=request_id,
+            )
+            elapsed = statement.excluded.updated_at - RateLimitBucket.updated_at
+            refilled = RateLimitBucket.tokens + elapsed * rate.per_second
+            tokens = case(
+                (refilled > rate.capacity, rate.capacity),
+                (elapsed < 0, RateLimitBucket.tokens),
+                else_=refilled,
+            )
+            allowed = tokens >= cost
+            result = await db.execute(
+                statement.on_conflict_do_update(
+                    index_elements=[RateLimitBucket.key],
+                    set_={
+                        "tokens": case((allowed, tokens - cost), else_=tokens),
+                        "updated_at": statement.excluded.updated_at,
+                        "last_request": case(
+                            (allowed, statement.excluded.last_request),
+                            else_=RateLimitBucket.last_request,
+                        ),
+                    },
+                ).returning(
+                    RateLimitBucket.tokens, RateLimitBucket.last_request
+                )
+            )
+            bucket = result.one()
+            await db.commit()
+        if bucket.last_request == request_id:
+            return True, 0.0
+        return False, retry_after(bucket.tokens, rate, cost)
+
+
+RATE_LIMIT_BACKENDS = {
+    "memory": InMemoryRateLimitBackend,
+    "database": DatabaseRateLimitBackend,
+}
+
+
+class RateLimiter:
+    """Checks requests against the per user and global budgets of a scope."""
+
+    def __init__(self, backend, limits=RATE_LIMITS):
+        self.backend = backend
+        self.limits = limits
+
+    async def acheck(self, scope, user_email, cost=1):
+        """Take `cost` from the user's and the global budget of `scope`.
+
+        A request rejected by the global budget still counts against the
+        user's.
+
+        Raises:
+            HTTPException: 429, with a Retry-After header, if a budget is
+                exhausted.
+        """
+        buckets = (
+            ("user", f"{scope}:user:{user_email}"),
+            ("global", f"{scope}:global"),
+        )
+        for limit, key in buckets:
+            rate = self.limits[scope][limit]
+            if rate is None:
+                continue
+            allowed, wait = await self.backend.atake(key, rate, cost)
+            if not allowed:
+                RATE_LIMITED.inc(scope=scope, limit=limit)
+                raise HTTPException(
+                    status_code=429,
+                    detail="Too many requests, please retry later",
+                    headers={"Retry-After": str(max(math.ceil(wait), 1))},
+                )
+
+
+rate_limiter = RateLimiter(RATE_LIMIT_BACKENDS[RATE_LIMIT_BACKEND]())
+
+
+def rate_limit(scope):
+    """Return a dependency that applies the rate limits of `scope`."""
+
+    async def check_rate_limit(user: UserRequest = Depends(aget_current_user)):
+        if RATE_LIMIT_ENABLED:
+            await rate_limiter.acheck(scope, user.email)
+
+    return check_rate_limit
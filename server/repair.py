@@ -0,0 +1,202 @@
+"""Local repair of malformed LLM plan responses for the fitmate application.
+
+Most malformed responses only need a small fix: stripping a code fence,
+dropping a trailing comma or turning "12 reps" into 12. Repairing them
+locally is much cheaper than asking the model for the whole plan again.
+"""
+
+import json
+import re
+from collections import Counter
+from threading import Lock
+
+from pydantic import ValidationError
+
+from models import (
+    DayDietPlan,
+    Exercise,
+    Meal,
+    ServerDietResponse,
+    ServerWorkoutResponse,
+    Workout,
+)
+from plans import WEEKDAYS
+
+# The day array, day model, item list and item model of each plan response.
+PLAN_SHAPES = {
+    ServerWorkoutResponse: ("workout", Workout, "exercises", Exercise),
+    ServerDietResponse: ("diet_plan", DayDietPlan, "meals", Meal),
+}
+
+_FENCE = re.compile(r"```(?:json)?", re.IGNORECASE)
+_NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+
+_counters = Counter()
+_counters_lock = Lock()
+
+
+def count(path, amount=1):
+    """Count how often a repair path fires."""
+    with _counters_lock:
+        _counters[path] += amount
+
+
+def repair_stats():
+    """dict: How often each repair path fired."""
+    with _counters_lock:
+        return dict(_counters)
+
+
+def _strip_outside_strings(text):
+    """Drop trailing commas and // comments that are not inside strings."""
+    result = []
+    in_string = False
+    escape = False
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == "/" and text.startswith("//", i):
+            i = text.find("\n", i)
+            if i == -1:
+                break
+            continue
+        elif char == ",":
+            following = text[i + 1 :].lstrip()
+            if following[:1] in ("}", "]"):
+                i += 1
+                continue
+        result.append(char)
+        i += 1
+    return "".join(result)
+
+
+def lenient_loads(text):
+    """Parse JSON the way a model tends to get it almost right.
+
+    Code fences, text around the outermost object, trailing commas and
+    line comments are tolerated.
+
+    Raises:
+        ValueError: If the text still isn't valid JSON.
+    """
+    text = _FENCE.sub("", text)
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end < start:
+        raise ValueError("No JSON object found")
+    return json.loads(_strip_outside_strings(text[start : end + 1]))
+
+
+def coerce_int(value):
+    """Coerce "12", "12 reps", "8-10" or 12.0 into an int.
+
+    Raises:
+        ValueError: If no number can be found in the value.
+    """
+    if isinstance(value, bool):
+        raise ValueError(f"Not a number: {value!r}")
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float):
+        return round(value)
+    match = _NUMBER.search(str(value))
+    if match is None:
+        raise ValueError(f"Not a number: {value!r}")
+    return round(float(match.group()))
+
+
+def _int_fields(model):
+    return [
+        name
+        for name, field in model.model_fields.items()
+        if field.annotation is int
+    ]
+
+
+def _coerce_item(item, item_model):
+    """Coerce the int fields of a meal or exercise, in place."""
+    coerced = 0
+    for name in _int_fields(item_model):
+        if name in item and not isinstance(item[name], int):
+            try:
+                item[name] = coerce_int(item[name])
+                coerced += 1
+            except ValueError:
+                pass
+    return coerced
+
+
+def repair_day(day, response_model):
+    """Return a valid copy of a plan day, or None if it can't be repaired."""
+    _, day_model, items_key, item_model = PLAN_SHAPES[response_model]
+    if not isinstance(day, dict):
+        return None
+    try:
+        day_model(**day)
+        return day
+    except ValidationError:
+        pass
+
+    day = dict(day)
+    items = day.get(items_key)
+    if isinstance(items, list):
+        day[items_key] = [
+            dict(item) if isinstance(item, dict) else item for item in items
+        ]
+        coerced = sum(
+            _coerce_item(item, item_model)
+            for item in day[items_key]
+            if isinstance(item, dict)
+        )
+        if coerced:
+            count("coerced_fields", coerced)
+    try:
+        day_model(**day)
+        return day
+    except ValidationError:
+        return None
+
+
+def _day_name(day, index):
+    if isinstance(day, dict) and isinstance(day.get("day"), str):
+        return day["day"]
+    return WEEKDAYS[index % len(WEEKDAYS)]
+
+
+def repair_response(content, response_model):
+    """Repair a malformed plan response as far as possible locally.
+
+    Returns:
+        tuple[dict, list[str]]: The response with every repairable day, and
+            the names of the days that could not be repaired.
+
+    Raises:
+        ValueError: If the response can't be parsed into a plan at all.
+    """
+    array_key = PLAN_SHAPES[response_model][0]
+    try:
+        output = json.loads(content)
+    except json.JSONDecodeError:
+        output = lenient_loads(content)
+        count("lenient_parse")
+
+    days = output.get(array_key) if isinstance(output, dict) else None
+    if not isinstance(days, list):
+        raise ValueError(f"Response has no {array_key} list")
+
+    repaired, broken = [], []
+    for index, day in enumerate(days):
+        fixed = repair_day(day, response_model)
+        if fixed is None:
+            broken.append(_day_name(day, index))
+        else:
+            repaired.append(fixed)
+    return {array_key: repaired}, broken
@@ -0,0 +1,143 @@
+"""JSON serialization and response compression for the fitmate application.
+
+Plans and progress histories are large nested documents. They are
+serialized with orjson, and routes that return stored JSONB documents hand
+them to `FastJSONResponse` directly, which also skips FastAPI's
+`jsonable_encoder` walk over every value. Responses above a size threshold
+are compressed with brotli when the client accepts it and the optional
+`brotli` package is installed, and with gzip otherwise.
+"""
+
+import gzip
+import os
+
+import orjson
+from fastapi.responses import JSONResponse
+
+from metrics import span
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+# Smaller bodies are not worth the CPU time of compressing them
+COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.environ.get("GZIP_LEVEL", "6"))
+# Low qualities compress about as well as gzip, at a fraction of the cost
+BROTLI_QUALITY = int(os.environ.get("BROTLI_QUALITY", "4"))
+
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+
+
+class FastJSONResponse(JSONResponse):
+    """A JSON response serialized with orjson."""
+
+    def render(self, content):
+        with span("serialize"):
+            return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def accepted_encodings(accept_encoding):
+    """Return the content codings an Accept-Encoding header allows."""
+    encodings = set()
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = params.strip().removeprefix("q=")
+        try:
+            if params and float(quality) == 0:
+                continue
+        except ValueError:
+            continue
+        encodings.add(name.strip().lower())
+    return encodings
+
+
+def choose_encoding(accept_encoding):
+    """Return the coding to compress with, or None."""
+    encodings = accepted_encodings(accept_encoding)
+    if brotli is not None and "br" in encodings:
+        return "br"
+    if "gzip" in encodings or "*" in encodings:
+        return "gzip"
+    return None
+
+
+def compress(body, encoding):
+    with span("compress"):
+        if encoding == "br":
+            return brotli.compress(body, quality=BROTLI_QUALITY)
+        return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+class CompressionMiddleware:
+    """Compresses complete responses above `minimum_size` bytes.
+
+    Streamed responses, such as the NDJSON plan streams, are passed through
+    untouched so their lines reach the client as they are generated.
+    """
+
+    def __init__(self, app, minimum_size=COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        encoding = choose_encoding(
+            headers.get(b"accept-encoding", b"").decode("latin-1")
+        )
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+
+        async def send_compressed(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                # Held back until the body shows whether to compress
+                start = message
+                return
+            if start is None:
+                await send(message)
+                return
+            pending, start = start, None
+            body = message.get("body", b"")
+            if message.get("more_body") or not self._compressible(
+                pending, body
+            ):
+                await send(pending)
+                await send(message)
+                return
+            body = compress(body, encoding)
+            response_headers = []
+            for name, value in pending["headers"]:
+                if name == b"content-length":
+                    continue
+                if name == b"etag" and not value.startswith(b"W/"):
+                    # The compressed bytes differ, so the tag can only be weak
+                    value = b"W/" + value
+                response_headers.append((name, value))
+            response_headers += [
+                (b"content-encoding", encoding.encode("latin-1")),
+                (b"content-length", str(len(body)).encode("latin-1")),
+                (b"vary", b"Accept-Encoding"),
+            ]
+            await send({**pending, "headers": response_headers})
+            await send({**message, "body": body})
+
+        await self.app(scope, receive, send_compressed)
+
+    def _compressible(self, start, body):
+        if len(body) < self.minimum_size:
+            return False
+        content_type = b""
+        for name, value in start["headers"]:
+            if name == b"content-encoding":
+                return False
+            if name == b"content-type":
+                content_type = value
+        return content_type.decode("latin-1").startswith(COMPRESSIBLE_TYPES)
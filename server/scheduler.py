@@ -0,0 +1,267 @@
+"""Priority scheduling of model calls for the fitmate application.
+
+Model calls wait for one of a fixed number of concurrency slots. Every call
+has a priority class, taken from the context it runs in: a user's first
+plans ("interactive"), regenerations a user asked for ("regeneration") and
+background work such as bulk runs ("batch"). A freed slot goes to the
+waiting class that has had the least service relative to its weight, so
+classes progress in proportion to their weights and none starves. A class
+can also be held to a share of the slots, so batch work never takes them
+all.
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from threading import Event, Lock
+
+from metrics import LLM_QUEUE_DEPTH, LLM_QUEUE_WAIT
+
+INTERACTIVE = "interactive"
+REGENERATION = "regeneration"
+BATCH = "batch"
+# The classes the application tags its model calls with
+PRIORITY_CLASSES = (INTERACTIVE, REGENERATION, BATCH)
+
+
+def parse_classes(value):
+    """Parse "interactive=8,batch=1" into `{"interactive": 8.0, ...}`."""
+    classes = {}
+    for item in value.split(","):
+        name, _, number = item.partition("=")
+        if name.strip():
+            classes[name.strip()] = float(number)
+    return classes
+
+
+# Relative share of the slots each class gets while all of them are waiting
+LLM_PRIORITY_WEIGHTS = parse_classes(
+    os.environ.get(
+        "LLM_PRIORITY_WEIGHTS", "interactive=8,regeneration=3,batch=1"
+    )
+)
+# Largest fraction of the slots a class may hold at once, 1 if not given
+LLM_PRIORITY_SHARES = parse_classes(
+    os.environ.get("LLM_PRIORITY_SHARES", "batch=0.5")
+)
+
+# The priority of the model calls made in the current context
+current_priority = ContextVar("llm_priority", default=REGENERATION)
+
+
+@asynccontextmanager
+async def prioritized(priority):
+    """Run the model calls of an `async with` block or a decorated coroutine
+    function at `priority`.
+    """
+    token = current_priority.set(priority)
+    try:
+        yield
+    finally:
+        current_priority.reset(token)
+
+
+def llm_priority(priority):
+    """Return a route dependency that sets the priority of a request.
+
+    The priority applies to the rest of the request, including the model
+    calls of a streamed response.
+    """
+
+    async def set_priority():
+        current_priority.set(priority)
+
+    return set_priority
+
+
+def _wake(future):
+    """Resolve a waiter's future unless it was cancelled in the meantime."""
+    if not future.done():
+        future.set_result(None)
+
+
+class _Waiter:
+    __slots__ = ("priority", "enqueued_at", "loop", "future", "event")
+
+    def __init__(self, priority, loop=None):
+        self.priority = priority
+        self.enqueued_at = time.monotonic()
+        self.loop = loop
+        if loop is None:
+            self.event = Event()
+        else:
+            self.future = loop.create_future()
+
+    def wake(self):
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(_wake, self.future)
+
+
+class PriorityScheduler:
+    """A counting limiter that hands free slots out by weighted fair queuing.
+
+    Usable from both threads and asyncio tasks: sync callers block on an
+    event, async callers park on a future of their own event loop. The
+    priority of a call is read from `current_priority` when it asks for a
+    slot, and the slot is released under that same priority.
+    """
+
+    def __init__(
+        self, limit, weights=LLM_PRIORITY_WEIGHTS, shares=LLM_PRIORITY_SHARES
+    ):
+        """
+        Args:
+            limit (int): The maximum number of concurrent holders.
+            weights (dict[str, float]): The weight of each priority class.
+            shares (dict[str, float]): The largest fraction of the slots
+                each class may hold, classes not listed may hold them all.
+
+        Raises:
+            ValueError: If a class of `PRIORITY_CLASSES` has no positive
+                weight. Calls of unknown classes run as regeneration calls.
+        """
+        missing = [p for p in PRIORITY_CLASSES if weights.get(p, 0) <= 0]
+        if missing:
+            raise ValueError(
+                f"LLM priority weights need a positive weight for {missing}"
+            )
+        self.limit = limit
+        self.weights = weights
+        self.caps = {
+            priority: max(1, int(limit * shares.get(priority, 1)))
+            for priority in weights
+        }
+        self._active = dict.fromkeys(weights, 0)
+        self._queues = {priority: deque() for priority in weights}
+        # Service received by each class, in units of 1 / weight per slot
+        self._passes = dict.fromkeys(weights, 0.0)
+        self._clock = 0.0
+        self._lock = Lock()
+
+    @property
+    def active(self):
+        """int: The number of slots currently held."""
+        return sum(self._active.values())
+
+    def snapshot(self):
+        """dict: The held slots and waiting calls of each class."""
+        with self._lock:
+            return {
+                "active": dict(self._active),
+                "queued": {p: len(queue) for p, queue in self._queues.items()},
+            }
+
+    def _priority(self):
+        priority = current_priority.get()
+        return priority if priority in self.weights else REGENERATION
+
+    def _can_start(self, priority):
+        return (
+            self.active < self.limit
+            and self._active[priority] < self.caps[priority]
+        )
+
+    def _start(self, priority, enqueued_at):
+        # A class that was idle starts at the current clock, it cannot
+        # catch up on the service it did not ask for
+        start = max(self._passes[priority], self._clock)
+        self._clock = start
+        self._passes[priority] = start + 1 / self.weights[priority]
+        self._active[priority] += 1
+        LLM_QUEUE_WAIT.observe(
+            time.monotonic() - enqueued_at, priority=priority
+        )
+
+    def _dispatch(self):
+        """Hand free slots to waiters, least served class first."""
+        while self.active < self.limit:
+            ready = [
+                priority
+                for priority, queue in self._queues.items()
+                if queue and self._active[priority] < self.caps[priority]
+            ]
+            if not ready:
+                return
+            priority = min(ready, key=self._passes.__getitem__)
+            waiter = self._queues[priority].popleft()
+            LLM_QUEUE_DEPTH.set(len(self._queues[priority]), priority=priority)
+            self._start(priority, waiter.enqueued_at)
+            waiter.wake()
+
+    def _enqueue(self, priority, loop=None):
+        """Take a slot if one is free, else return a queued `_Waiter`."""
+        if not self._queues[priority] and self._can_start(priority):
+            self._start(priority, time.monotonic())
+            return None
+        waiter = _Waiter(priority, loop)
+        self._queues[priority].append(waiter)
+        LLM_QUEUE_DEPTH.set(len(self._queues[priority]), priority=priority)
+        return waiter
+
+    def acquire(self):
+        """Block the calling thread until a slot is available.
+
+        Returns:
+            str: The priority the slot is held under, for `release`.
+        """
+        priority = self._priority()
+        with self._lock:
+            waiter = self._enqueue(priority)
+        if waiter is not None:
+            waiter.event.wait()
+        return priority
+
+    async def acquire_async(self):
+        """Wait without blocking the event loop until a slot is available.
+
+        Returns:
+            str: The priority the slot is held under, for `release`.
+        """
+        priority = self._priority()
+        with self._lock:
+            waiter = self._enqueue(priority, asyncio.get_running_loop())
+        if waiter is None:
+            return priority
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            with self._lock:
+                queue = self._queues[waiter.priority]
+                if waiter in queue:
+                    queue.remove(waiter)
+                    LLM_QUEUE_DEPTH.set(len(queue), priority=waiter.priority)
+                else:
+                    # The slot was handed to us already, hand it on
+                    self._active[waiter.priority] -= 1
+                    self._dispatch()
+            raise
+        return priority
+
+    def release(self, priority):
+        """Release a slot held under `priority` and hand it on."""
+        with self._lock:
+            self._active[priority] -= 1
+            self._dispatch()
+
+    @contextmanager
+    def hold(self):
+        """Hold a slot for the duration of a `with` block."""
+        priority = self.acquire()
+        try:
+            yield priority
+        finally:
+            self.release(priority)
+
+    @asynccontextmanager
+    async def ahold(self):
+        """Hold a slot for the duration of an `async with` block."""
+        priority = await self.acquire_async()
+        try:
+            yield priority
+        finally:
+            self.release(priority)
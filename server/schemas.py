@@ -1,8 +1,11 @@
 """Definitions of Pydantic models for fitmate."""
 
-from typing import List, Optional
+from datetime import date, datetime
+from typing import Annotated, Any, List, Literal, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import AfterValidator, BaseModel, Field, model_validator
+
+from plans import WEEKDAYS
 
 
 class UserRequest(BaseModel):
@@ -13,6 +16,12 @@ class UserRequest(BaseModel):
         from_attributes = True
 
 
+class AuthenticatedUser(BaseModel):
+    """The user a request was authenticated as."""
+
+    email: str
+
+
 class TokenResponse(BaseModel):
     token: str
 
@@ -50,6 +59,44 @@ class MealPlanModel(BaseModel):
         from_attributes = True
 
 
+def weekdays(days):
+    """Normalize day names, e.g. " monday" to "Monday", without duplicates."""
+    normalized = []
+    for day in days:
+        name = day.strip().title()
+        if name not in WEEKDAYS:
+            raise ValueError(f"Unknown day {day!r}, expected one of {WEEKDAYS}")
+        if name not in normalized:
+            normalized.append(name)
+    return normalized
+
+
+# Days of a plan, rejected with a 422 unless they are weekdays
+PlanDays = Annotated[List[str], AfterValidator(weekdays)]
+
+
+class PlanDaysModel(BaseModel):
+    days: PlanDays = Field(
+        ...,
+        min_length=1,
+        max_length=7,
+        description="Days of the plan to regenerate, e.g. Monday",
+    )
+
+
+class BulkPlansModel(BaseModel):
+    emails: List[str] = Field(..., min_length=1, max_length=10000)
+    kinds: List[Literal["workout", "meal"]] = ["workout", "meal"]
+    workout_preferences: Optional[WorkoutPlanModel] = Field(
+        None, description="Used for users who have no workout plan yet"
+    )
+    run_id: Optional[str] = Field(
+        None,
+        pattern="^[A-Za-z0-9_-]+$",
+        description="Resumes the run if it exists",
+    )
+
+
 class ProgressModel(BaseModel):
     weight: List[dict]
     workouts_completed: int
@@ -60,3 +107,50 @@ class ProgressModel(BaseModel):
 
     class config:
         from_attributes = True
+
+
+class ProgressEventModel(BaseModel):
+    kind: Literal["weight", "workout", "calories", "personal_record"]
+    date: date
+    value: Optional[float] = Field(
+        None, description="Weight in kg, or calories burned"
+    )
+    exercise: Optional[str] = None
+    record: Optional[str] = Field(None, description="e.g. 80kg")
+
+    @model_validator(mode="after")
+    def check_fields(self):
+        if self.kind in ("weight", "calories") and self.value is None:
+            raise ValueError(f"{self.kind} events need a value")
+        if self.kind == "personal_record" and not (
+            self.exercise and self.record
+        ):
+            raise ValueError(
+                "personal_record events need an exercise and record"
+            )
+        return self
+
+
+class ProgressEventsModel(BaseModel):
+    events: List[ProgressEventModel] = Field(..., min_length=1, max_length=100)
+
+
+class ProgressSummaryModel(BaseModel):
+    workouts_completed: int
+    streak: int
+    calories_burned: int
+    last_workout_day: int
+    personal_records: List[dict]
+
+    class Config:
+        from_attributes = True
+
+
+class JobResponse(BaseModel):
+    id: str
+    kind: str
+    status: str
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
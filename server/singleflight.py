@@ -0,0 +1,85 @@
+"""Request coalescing for duplicate in-flight calls in the fitmate application.
+
+Concurrent calls with the same key share a single execution: the first
+caller runs the function and every other caller waits for, and receives,
+its result or exception. Threads and asyncio tasks share the same flights.
+"""
+
+import asyncio
+import copy
+from concurrent.futures import Future
+from threading import Lock
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key into one execution."""
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = Lock()
+        self.leaders = 0
+        self.followers = 0
+
+    @property
+    def in_flight(self):
+        """int: The number of keys currently being computed."""
+        return len(self._flights)
+
+    def _join(self, key):
+        """Return `(future, is_leader)` for the flight of `key`."""
+        with self._lock:
+            future = self._flights.get(key)
+            if future is not None:
+                self.followers += 1
+                return future, False
+            future = Future()
+            self._flights[key] = future
+            self.leaders += 1
+            return future, True
+
+    def _land(self, key, future, result=None, error=None):
+        with self._lock:
+            del self._flights[key]
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key, fn, *args, **kwargs):
+        """Call `fn(*args, **kwargs)` unless a call for `key` is in flight.
+
+        Followers receive a copy of the leader's result so callers never
+        share mutable state.
+        """
+        future, is_leader = self._join(key)
+        if not is_leader:
+            return copy.deepcopy(future.result())
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            self._land(key, future, error=e)
+            raise
+        self._land(key, future, result=result)
+        return result
+
+    async def ado(self, key, fn, *args, **kwargs):
+        """Await `fn(*args, **kwargs)` unless a call for `key` is in flight.
+
+        The leader's call runs in its own task, so cancelling the leader
+        does not cancel the call the followers are waiting on.
+        """
+        future, is_leader = self._join(key)
+        if not is_leader:
+            return copy.deepcopy(await asyncio.wrap_future(future))
+
+        def land(task):
+            if task.cancelled():
+                self._land(key, future, error=asyncio.CancelledError())
+            elif task.exception() is not None:
+                self._land(key, future, error=task.exception())
+            else:
+                self._land(key, future, result=task.result())
+
+        task = asyncio.ensure_future(fn(*args, **kwargs))
+        task.add_done_callback(land)
+        return await asyncio.shield(task)
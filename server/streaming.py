@@ -0,0 +1,110 @@
+"""Streaming helpers for plan generation in the fitmate application."""
+
+import json
+import logging
+import re
+
+from repair import count, lenient_loads
+
+logger = logging.getLogger(__name__)
+
+
+class IncrementalArrayParser:
+    """Extracts complete elements of a JSON array while the document streams in.
+
+    The parser looks for `"<key>": [` in the streamed text and returns every
+    element of that array as soon as its closing bracket arrives, so e.g.
+    the first day of a 7-day plan can be used before the rest is generated.
+    Surrounding text such as markdown code fences is ignored.
+    """
+
+    def __init__(self, key):
+        """
+        Args:
+            key (str): The key of the array to extract, e.g. "workout".
+        """
+        self._opening = re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+        self._buffer = ""
+        self._pos = None
+        self._start = None
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self.done = False
+
+    def _repair(self, element):
+        """Return the leniently parsed element, or nothing if it is broken."""
+        try:
+            item = lenient_loads(element)
+        except ValueError as e:
+            logger.warning(f"Skipping malformed element: {e}")
+            return []
+        count("lenient_parse")
+        return [item]
+
+    def feed(self, text):
+        """Consume a chunk of text.
+
+        Returns:
+            list: The array elements completed by this chunk.
+        """
+        self._buffer += text
+        if self._pos is None:
+            match = self._opening.search(self._buffer)
+            if match is None:
+                return []
+            self._pos = match.end()
+
+        items = []
+        while self._pos < len(self._buffer) and not self.done:
+            char = self._buffer[self._pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                if self._depth == 0:
+                    self._start = self._pos
+                self._depth += 1
+            elif char in "}]":
+                if self._depth == 0:
+                    # The array itself is closed
+                    self.done = True
+                else:
+                    self._depth -= 1
+                    if self._depth == 0:
+                        element = self._buffer[self._start : self._pos + 1]
+                        try:
+                            items.append(json.loads(element))
+                        except json.JSONDecodeError:
+                            items.extend(self._repair(element))
+            self._pos += 1
+        return items
+
+
+async def ndjson_stream(events, on_plan=None):
+    """Serialize generation events as newline delimited JSON.
+
+    If generating or saving the plan fails, the stream ends with an
+    `{"type": "error"}` event instead of being cut off.
+
+    Args:
+        events: An async iterable of event dicts with a "type" key.
+        on_plan (callable, optional): Awaited with the assembled plan when
+            the "plan" event arrives, before that event is sent.
+    """
+    try:
+        async for event in events:
+            if event["type"] == "plan" and on_plan is not None:
+                await on_plan(event["plan"])
+            yield json.dumps(event) + "\n"
+    except Exception as e:
+        logger.error(f"Plan stream failed: {str(e)}")
+        yield json.dumps(
+            {"type": "error", "detail": "Plan generation failed"}
+        ) + "\n"
@@ -1,13 +1,99 @@
 """Creation of tables in the database for the fitmate application."""
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import asyncio
+from datetime import date
 
-from models import Base  # Make sure you import Base from models
-from database import DATABASE_URL
+from sqlalchemy import and_, exists, or_, text
+from sqlalchemy.orm import undefer
 
-# Create the engine for the PostgreSQL database
-engine = create_engine(DATABASE_URL)
+from database import AsyncSessionLocal, async_engine
+from models import (  # Make sure you import Base from models
+    Base,
+    Progress,
+    ProgressEvent,
+)
+from progress_log import PERSONAL_RECORD, WEIGHT
 
-# Create all the tables in the database
-Base.metadata.create_all(bind=engine)
+
+def backfill_progress_events(db):
+    """Move the weight history kept in `progress` rows into `progress_events`.
+
+    The personal records of those rows are copied as events too and stay on
+    the row, where only the latest record per exercise is kept from now on.
+    Rows with records but no weight history are moved too, and the records
+    of a user are only copied once.
+    """
+    has_records = exists().where(
+        ProgressEvent.user_email == Progress.user_email,
+        ProgressEvent.kind == PERSONAL_RECORD,
+    )
+    query = db.query(Progress, has_records.label("has_records")).options(
+        undefer(Progress.weight)
+    )
+    query = query.filter(
+        or_(
+            Progress.weight != [],
+            and_(Progress.personal_records != [], ~has_records),
+        )
+    )
+    for progress, records_copied in query.all():
+        for entry in progress.weight or []:
+            db.add(
+                ProgressEvent(
+                    user_email=progress.user_email,
+                    kind=WEIGHT,
+                    day=date.fromisoformat(entry["date"]),
+                    value=entry["value"],
+                )
+            )
+        records = [] if records_copied else progress.personal_records or []
+        for entry in records:
+            db.add(
+                ProgressEvent(
+                    user_email=progress.user_email,
+                    kind=PERSONAL_RECORD,
+                    day=date.fromisoformat(entry["date"]),
+                    exercise=entry["exercise"],
+                    record=entry["value"],
+                )
+            )
+        progress.weight = []
+    db.commit()
+
+
+def add_version_columns(connection):
+    """Add the `version` column to tables created before it existed."""
+    for table in ("user_profiles", "workout_plans", "meal_plans"):
+        connection.execute(
+            text(
+                f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS "
+                "version INTEGER NOT NULL DEFAULT 1"
+            )
+        )
+
+
+def add_job_lease_columns(connection):
+    """Add the lease columns to `generation_jobs` tables created before."""
+    for column in (
+        "lease_expires_at TIMESTAMP",
+        "attempts INTEGER NOT NULL DEFAULT 0",
+    ):
+        connection.execute(
+            text(
+                f"ALTER TABLE generation_jobs ADD COLUMN IF NOT EXISTS {column}"
+            )
+        )
+
+
+async def create_tables():
+    """Create all the tables in the database and migrate existing ones."""
+    async with async_engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+        await connection.run_sync(add_version_columns)
+        await connection.run_sync(add_job_lease_columns)
+    async with AsyncSessionLocal() as db:
+        await db.run_sync(backfill_progress_events)
+    await async_engine.dispose()
+
+
+asyncio.run(create_tables())
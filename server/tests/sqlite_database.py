@@ -0,0 +1,29 @@
+"""An in-memory SQLite database with the application's tables, for tests."""
+
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.pool import StaticPool
+
+from models import Base
+
+
+@compiles(JSONB, "sqlite")
+def _compile_jsonb(type_, compiler, **kwargs):
+    # SQLite stores the JSONB columns as JSON
+    return "JSON"
+
+
+async def acreate_database():
+    """Create the tables in a new in-memory database.
+
+    Returns:
+        tuple: The async engine and a sessionmaker configured like
+            `database.AsyncSessionLocal`.
+    """
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    return engine, async_sessionmaker(
+        engine, autoflush=False, expire_on_commit=False
+    )
@@ -0,0 +1,93 @@
+"""Tests for the cached authentication of requests."""
+
+import asyncio
+import time
+import unittest
+from unittest import mock
+
+import jwt
+from fastapi import HTTPException
+
+import crud
+from crud import aget_current_user, ainvalidate_user, create_jwt_token
+
+
+class TestAuthCache(unittest.TestCase):
+    """Tests for the principal cache and token revocation."""
+
+    def setUp(self):
+        crud.principal_cache.clear()
+        crud.revoked_tokens.clear()
+        self.db = mock.AsyncMock()
+        self.db.bind.dialect.name = "postgresql"
+        # No revocations are stored in the table
+        self.db.execute.return_value = mock.Mock(
+            scalar=mock.Mock(return_value=None)
+        )
+        patcher = mock.patch.object(
+            crud,
+            "aget_user_by_email",
+            mock.AsyncMock(return_value=mock.Mock(email="a@b.c")),
+        )
+        self.lookup = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def authenticate(self, token):
+        return asyncio.run(aget_current_user(self.db, token))
+
+    def test_user_is_looked_up_once(self):
+        """Test that repeated requests are served from the cache."""
+        token = create_jwt_token("a@b.c")
+        for _ in range(3):
+            self.assertEqual(self.authenticate(token).email, "a@b.c")
+        self.assertEqual(self.lookup.await_count, 1)
+
+    def test_invalidation_revokes_older_tokens(self):
+        """Test that tokens issued before an invalidation are rejected."""
+        token = create_jwt_token("a@b.c")
+        self.authenticate(token)
+        asyncio.run(ainvalidate_user(self.db, "a@b.c"))
+
+        with self.assertRaises(HTTPException) as context:
+            self.authenticate(token)
+        self.assertEqual(context.exception.status_code, 401)
+
+        self.authenticate(create_jwt_token("a@b.c"))
+        self.assertEqual(self.lookup.await_count, 2)
+
+    def test_revocations_of_other_workers_are_seen(self):
+        """Test that revocations stored in the table reject older tokens."""
+        token = create_jwt_token("a@b.c")
+        self.authenticate(token)
+
+        # Another worker revoked the tokens, and the cached state expired
+        self.db.execute.return_value.scalar.return_value = crud.time.time()
+        crud.revoked_tokens.clear()
+        with self.assertRaises(HTTPException) as context:
+            self.authenticate(token)
+        self.assertEqual(context.exception.detail, "Token revoked")
+
+    def test_tokens_without_iat(self):
+        """Test that tokens without iat only fail once the user is revoked."""
+        token = jwt.encode(
+            {"sub": "a@b.c", "exp": time.time() + 60},
+            crud.SECRET_KEY,
+            algorithm=crud.ALGORITHM,
+        )
+        self.assertEqual(self.authenticate(token).email, "a@b.c")
+
+        asyncio.run(ainvalidate_user(self.db, "a@b.c"))
+        with self.assertRaises(HTTPException) as context:
+            self.authenticate(token)
+        self.assertEqual(context.exception.detail, "Token revoked")
+
+    def test_trusted_claims_skip_the_lookup(self):
+        """Test that trusted tokens need no users table lookup at all."""
+        with mock.patch.object(crud, "AUTH_TRUST_TOKEN_CLAIMS", True):
+            user = self.authenticate(create_jwt_token("a@b.c"))
+        self.assertEqual(user.email, "a@b.c")
+        self.lookup.assert_not_awaited()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,142 @@
+"""Tests for resuming bulk plan generation runs."""
+
+import sys
+import tempfile
+import types
+import unittest
+from unittest import mock
+
+from sqlalchemy import select
+
+import database
+from models import Profile, WorkoutPlan
+from sqlite_database import acreate_database
+
+
+class PlanGenerationError(Exception):
+    pass
+
+
+# The llm module reads the mock plans from the working directory on import,
+# the generators are replaced in the tests anyway.
+with mock.patch.dict(
+    sys.modules,
+    llm=types.SimpleNamespace(
+        agenerate_meal_plan=mock.AsyncMock(),
+        agenerate_workout=mock.AsyncMock(),
+    ),
+):
+    import bulk
+    from bulk import BulkCheckpoint, BulkGenerator
+
+EMAILS = ["a@b.c", "b@b.c", "c@b.c"]
+WORKOUT_PREFERENCES = {"workout_type": "strength", "equipment_access": []}
+
+
+def generated(workout, biometrics, fallback=True):
+    return {"plan_for": biometrics.user_email}
+
+
+class TestBulkCheckpoint(unittest.TestCase):
+    """Tests for persisting the progress of a run."""
+
+    def test_checkpoints_are_loaded_as_saved(self):
+        """Test that a saved checkpoint is loaded back by its run id."""
+        with tempfile.TemporaryDirectory() as directory:
+            checkpoint = BulkCheckpoint("run", directory)
+            checkpoint.total = 3
+            checkpoint.done = {"a@b.c", "b@b.c"}
+            checkpoint.failed = {"c@b.c": "PlanGenerationError: failed"}
+            checkpoint.generations = 2
+            checkpoint.save()
+
+            loaded = BulkCheckpoint.load("run", directory)
+            self.assertEqual(loaded.to_dict(), checkpoint.to_dict())
+            self.assertEqual(
+                BulkCheckpoint.load("other", directory).done, set()
+            )
+
+
+class TestBulkGenerator(unittest.IsolatedAsyncioTestCase):
+    """Tests for running and resuming bulk generation."""
+
+    async def asyncSetUp(self):
+        self.engine, self.sessions = await acreate_database()
+        async with self.sessions() as db:
+            db.add_all(
+                Profile(user_email=email, name=email, age=20 + i)
+                for i, email in enumerate(EMAILS)
+            )
+            await db.commit()
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.generate = mock.AsyncMock(side_effect=generated)
+        for patcher in (
+            mock.patch.object(database, "AsyncSessionLocal", self.sessions),
+            mock.patch.object(bulk, "agenerate_workout", self.generate),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def asyncTearDown(self):
+        await self.engine.dispose()
+
+    async def run_bulk(self):
+        generator = BulkGenerator(
+            BulkCheckpoint.load("run", self.directory.name),
+            kinds=("workout",),
+            workout_preferences=WORKOUT_PREFERENCES,
+            rate=0,
+            report=mock.Mock(),
+        )
+        return await generator.run(EMAILS, batch_size=2)
+
+    async def stored_plans(self):
+        async with self.sessions() as db:
+            result = await db.execute(
+                select(WorkoutPlan.user_email, WorkoutPlan.generated_plan)
+            )
+            return dict(result.all())
+
+    async def test_resumed_runs_skip_done_users(self):
+        """Test that users done before an interruption are not generated."""
+        checkpoint = BulkCheckpoint("run", self.directory.name)
+        checkpoint.done = {"a@b.c"}
+        checkpoint.save()
+
+        checkpoint = await self.run_bulk()
+        self.assertEqual(self.generate.await_count, 2)
+        self.assertEqual(checkpoint.done, set(EMAILS))
+        self.assertTrue(
+            BulkCheckpoint.load("run", self.directory.name).finished
+        )
+        self.assertEqual(
+            await self.stored_plans(),
+            {email: {"plan_for": email} for email in EMAILS[1:]},
+        )
+
+    async def test_failed_users_are_retried_on_resume(self):
+        """Test that failed users are left out of done and retried."""
+        self.generate.side_effect = [
+            {"plan_for": "a@b.c"},
+            {"plan_for": "b@b.c"},
+            PlanGenerationError("The workout plan was invalid"),
+        ]
+        checkpoint = await self.run_bulk()
+        self.assertEqual(list(checkpoint.failed), ["c@b.c"])
+        self.assertEqual(checkpoint.done, {"a@b.c", "b@b.c"})
+        self.assertNotIn("c@b.c", await self.stored_plans())
+
+        self.generate.reset_mock(side_effect=True)
+        self.generate.side_effect = generated
+        checkpoint = await self.run_bulk()
+        self.assertEqual(self.generate.await_count, 1)
+        self.assertEqual(checkpoint.failed, {})
+        self.assertEqual(checkpoint.done, set(EMAILS))
+        self.assertEqual(
+            (await self.stored_plans())["c@b.c"], {"plan_for": "c@b.c"}
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+"""Tests for the plan cache."""
+
+import unittest
+from unittest import mock
+
+from cache import LRUCacheTier, PlanCache, plan_cache_key
+from models import Profile
+from schemas import WorkoutPlanModel
+
+
+class TestPlanCacheKey(unittest.TestCase):
+    """Tests for the normalization of prompt inputs."""
+
+    def test_equivalent_inputs_share_a_key(self):
+        """Test that case, whitespace and list order do not change the key."""
+        first = WorkoutPlanModel(
+            workout_type="Strength  Training",
+            equipment_access=["Dumbbells", "Bench"],
+        )
+        second = {
+            "equipment_access": ["bench", "dumbbells"],
+            "workout_type": "strength training",
+        }
+        self.assertEqual(
+            plan_cache_key("workout", goal=first),
+            plan_cache_key("workout", goal=second),
+        )
+
+    def test_identifying_profile_fields_are_ignored(self):
+        """Test that two users with the same biometrics share a key."""
+        profiles = [
+            Profile(
+                id=i,
+                user_email=f"{i}@example.com",
+                name=f"User {i}",
+                age=30,
+                sex="male",
+                height=175,
+                weight=70,
+                fitness_level="intermediate",
+            )
+            for i in range(2)
+        ]
+        keys = {plan_cache_key("workout", biometrics=p) for p in profiles}
+        self.assertEqual(len(keys), 1)
+
+    def test_kind_and_values_change_the_key(self):
+        """Test that different plans or biometrics do not collide."""
+        self.assertNotEqual(
+            plan_cache_key("workout", goal="fat loss"),
+            plan_cache_key("diet", goal="fat loss"),
+        )
+        self.assertNotEqual(
+            plan_cache_key("workout", biometrics={"age": 30}),
+            plan_cache_key("workout", biometrics={"age": 31}),
+        )
+
+
+class TestPlanCache(unittest.TestCase):
+    """Tests for the in-memory tier and counters."""
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted first."""
+        tier = LRUCacheTier(max_entries=2, ttl=60)
+        tier.set("a", {"plan": "a"})
+        tier.set("b", {"plan": "b"})
+        tier.get("a")
+        tier.set("c", {"plan": "c"})
+        self.assertIsNone(tier.get("b"))
+        self.assertEqual(tier.get("a"), {"plan": "a"})
+        self.assertEqual(tier.evictions, 1)
+
+    def test_ttl_expiry(self):
+        """Test that entries expire after their TTL."""
+        tier = LRUCacheTier(max_entries=2, ttl=10)
+        with mock.patch("cache.time.monotonic", return_value=100):
+            tier.set("a", {"plan": "a"})
+        with mock.patch("cache.time.monotonic", return_value=109):
+            self.assertIsNotNone(tier.get("a"))
+        with mock.patch("cache.time.monotonic", return_value=111):
+            self.assertIsNone(tier.get("a"))
+
+    def test_hit_miss_counters(self):
+        """Test that hits and misses are counted and values are copied."""
+        cache = PlanCache(LRUCacheTier(max_entries=2, ttl=60))
+        self.assertIsNone(cache.get("a"))
+        cache.set("a", {"workout": []})
+        cache.get("a")["workout"].append("mutated")
+        self.assertEqual(cache.get("a"), {"workout": []})
+        stats = cache.stats()
+        self.assertEqual(stats["hits"], 2)
+        self.assertEqual(stats["misses"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
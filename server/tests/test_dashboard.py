@@ -0,0 +1,107 @@
+"""Tests for the field selection of the dashboard endpoint."""
+
+import json
+import sys
+import types
+import unittest
+from unittest import mock
+
+from fastapi import HTTPException
+from sqlalchemy import event
+
+from models import MealPlan, Profile, User, WorkoutPlan
+from sqlite_database import acreate_database
+
+MOCK_PROGRESS = {"workouts_completed": 0}
+
+# The llm module reads the mock plans from the working directory on import
+with mock.patch.dict(
+    sys.modules,
+    llm=types.SimpleNamespace(
+        MOCK_PROGRESS=mock.Mock(
+            model_dump=mock.Mock(return_value=MOCK_PROGRESS)
+        )
+    ),
+):
+    from api.dashboard import get_dashboard
+
+
+class TestDashboard(unittest.IsolatedAsyncioTestCase):
+    """Tests for loading only the requested dashboard sections."""
+
+    async def asyncSetUp(self):
+        self.engine, sessions = await acreate_database()
+        async with sessions() as db:
+            db.add_all(
+                [
+                    User(email="a@b.c", password="hash"),
+                    Profile(user_email="a@b.c", name="A", age=30),
+                    WorkoutPlan(
+                        user_email="a@b.c",
+                        preferences={},
+                        generated_plan={"monday": "squats"},
+                    ),
+                    MealPlan(
+                        user_email="a@b.c",
+                        preferences={},
+                        generated_plan={"monday": "oats"},
+                    ),
+                ]
+            )
+            await db.commit()
+        self.db = sessions()
+        self.user = mock.Mock(email="a@b.c")
+        self.statements = []
+        event.listen(
+            self.engine.sync_engine, "before_cursor_execute", self.record
+        )
+
+    async def asyncTearDown(self):
+        await self.db.close()
+        await self.engine.dispose()
+
+    def record(self, connection, cursor, statement, *args):
+        self.statements.append(statement)
+
+    async def dashboard(self, fields=None):
+        response = await get_dashboard(fields, self.db, self.user)
+        return json.loads(response.body)
+
+    async def test_all_sections_by_default(self):
+        """Test that the dashboard returns every section without fields."""
+        dashboard = await self.dashboard()
+        self.assertEqual(dashboard["profile"]["name"], "A")
+        self.assertEqual(dashboard["workout_plan"], {"monday": "squats"})
+        self.assertEqual(dashboard["meal_plan"], {"monday": "oats"})
+        self.assertEqual(dashboard["progress"], MOCK_PROGRESS)
+
+    async def test_only_requested_sections_are_loaded(self):
+        """Test that unrequested sections are neither queried nor returned."""
+        dashboard = await self.dashboard(" meal_plan,profile,meal_plan")
+        self.assertEqual(set(dashboard), {"meal_plan", "profile"})
+        self.assertEqual(dashboard["meal_plan"], {"monday": "oats"})
+
+        self.assertEqual(len(self.statements), 1)
+        self.assertIn("meal_plans", self.statements[0])
+        self.assertNotIn("workout_plans", self.statements[0])
+        self.assertNotIn("progress", self.statements[0])
+
+    async def test_missing_rows_are_null(self):
+        """Test that a requested section the user has no row for is null."""
+        self.user.email = "new@b.c"
+        self.assertEqual(
+            await self.dashboard("profile,workout_plan"),
+            {"profile": None, "workout_plan": None},
+        )
+
+    async def test_invalid_fields_are_rejected(self):
+        """Test that unknown or empty field lists are bad requests."""
+        for fields in ("profile,friends", " , "):
+            with self.assertRaises(HTTPException) as context:
+                await self.dashboard(fields)
+            self.assertEqual(context.exception.status_code, 400)
+        self.assertEqual(self.statements, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+"""Tests for the lookups that leave the plan documents unloaded."""
+
+import unittest
+
+from sqlalchemy import event, inspect, select
+
+from crud import aget_preferences, aget_version, aget_workout_plan
+from models import MealPlan, WorkoutPlan
+from sqlite_database import acreate_database
+
+
+class TestDeferredColumns(unittest.IsolatedAsyncioTestCase):
+    """Tests for reading plans without their `generated_plan` JSONB."""
+
+    async def asyncSetUp(self):
+        self.engine, sessions = await acreate_database()
+        async with sessions() as db:
+            for model in (WorkoutPlan, MealPlan):
+                db.add(
+                    model(
+                        user_email="a@b.c",
+                        preferences={"calories": "low"},
+                        generated_plan={"monday": "rest"},
+                        version=3,
+                    )
+                )
+            await db.commit()
+        self.db = sessions()
+        self.statements = []
+        event.listen(
+            self.engine.sync_engine, "before_cursor_execute", self.record
+        )
+
+    async def asyncTearDown(self):
+        await self.db.close()
+        await self.engine.dispose()
+
+    def record(self, connection, cursor, statement, *args):
+        self.statements.append(statement)
+
+    async def test_version_lookups_read_two_columns(self):
+        """Test that the version lookup reads neither plan nor preferences."""
+        for model in (WorkoutPlan, MealPlan):
+            row = await aget_version(self.db, model, "a@b.c")
+            self.assertEqual(row._fields, ("id", "version"))
+            self.assertEqual(row.version, 3)
+        for statement in self.statements:
+            self.assertNotIn("generated_plan", statement)
+            self.assertNotIn("preferences", statement)
+        self.assertIsNone(await aget_version(self.db, WorkoutPlan, "x@b.c"))
+
+    async def test_preference_lookups_skip_the_plan(self):
+        """Test that the preferences lookup does not read the stored plan."""
+        for model in (WorkoutPlan, MealPlan):
+            row = await aget_preferences(self.db, model, "a@b.c")
+            self.assertEqual(row._fields, ("id", "version", "preferences"))
+            self.assertEqual(row.preferences, {"calories": "low"})
+        for statement in self.statements:
+            self.assertNotIn("generated_plan", statement)
+
+    async def test_plans_are_deferred_unless_requested(self):
+        """Test that only the plan lookup undefers `generated_plan`."""
+        result = await self.db.execute(select(WorkoutPlan))
+        self.assertIn("generated_plan", inspect(result.scalar_one()).unloaded)
+        self.db.expunge_all()
+
+        plan = await aget_workout_plan(self.db, "a@b.c")
+        self.assertNotIn("generated_plan", inspect(plan).unloaded)
+        self.assertEqual(plan.generated_plan, {"monday": "rest"})
+
+
+if __name__ == "__main__":
+    unittest.main()
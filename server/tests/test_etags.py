@@ -0,0 +1,33 @@
+"""Tests for the ETags of conditional GETs."""
+
+import unittest
+
+from etags import etag_matches, make_etag
+
+
+class ETagTest(unittest.TestCase):
+    def test_version_changes_the_etag(self):
+        self.assertEqual(make_etag("workout", 3, 1), '"workout-3-1"')
+        self.assertNotEqual(
+            make_etag("workout", 3, 1), make_etag("workout", 3, 2)
+        )
+
+    def test_variants_are_case_insensitive(self):
+        self.assertEqual(
+            make_etag("meal", 1, 1, "Monday"), make_etag("meal", 1, 1, "monday")
+        )
+        self.assertNotEqual(
+            make_etag("meal", 1, 1, "Monday"),
+            make_etag("meal", 1, 1, "Tuesday"),
+        )
+
+    def test_if_none_match(self):
+        etag = make_etag("profile", 1, 4)
+        self.assertTrue(etag_matches(etag, etag))
+        self.assertTrue(etag_matches(f'"other", W/{etag}', etag))
+        self.assertTrue(etag_matches("*", etag))
+        self.assertFalse(etag_matches(make_etag("profile", 1, 3), etag))
+
+
+if __name__ == "__main__":
+    unittest.main()
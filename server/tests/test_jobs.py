@@ -0,0 +1,117 @@
+"""Tests for the leases of background generation jobs."""
+
+import asyncio
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+from sqlalchemy import update
+
+import jobs
+from jobs import FAILED, QUEUED, RUNNING, DatabaseJobBackend, JobQueue
+from models import GenerationJob
+from sqlite_database import acreate_database
+
+
+class TestDatabaseJobBackend(unittest.IsolatedAsyncioTestCase):
+    """Tests for claiming, requeueing and abandoning jobs in the database."""
+
+    async def asyncSetUp(self):
+        self.engine, self.sessions = await acreate_database()
+        patcher = mock.patch.object(jobs, "AsyncSessionLocal", self.sessions)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.backend = DatabaseJobBackend()
+
+    async def asyncTearDown(self):
+        await self.engine.dispose()
+
+    async def expire_lease(self, job_id, **fields):
+        async with self.sessions() as db:
+            await db.execute(
+                update(GenerationJob)
+                .where(GenerationJob.id == job_id)
+                .values(
+                    lease_expires_at=datetime.utcnow() - timedelta(seconds=1),
+                    **fields,
+                )
+            )
+            await db.commit()
+
+    async def test_claimed_jobs_are_leased(self):
+        """Test that a claimed job is not claimed again while leased."""
+        job = await self.backend.aenqueue("workout", "a@b.c", {})
+
+        claimed = await self.backend.aclaim()
+        self.assertEqual(claimed["id"], job["id"])
+        self.assertEqual(claimed["status"], RUNNING)
+        self.assertEqual(claimed["attempts"], 1)
+        self.assertGreater(claimed["lease_expires_at"], datetime.utcnow())
+        self.assertIsNone(await self.backend.aclaim())
+
+    async def test_expired_leases_are_claimed_again(self):
+        """Test that jobs whose worker stopped renewing the lease are retried."""
+        job = await self.backend.aenqueue("workout", "a@b.c", {})
+        await self.backend.aclaim()
+        await self.expire_lease(job["id"])
+
+        claimed = await self.backend.aclaim()
+        self.assertEqual(claimed["id"], job["id"])
+        self.assertEqual(claimed["attempts"], 2)
+
+    async def test_heartbeats_renew_the_lease(self):
+        """Test that a renewed lease keeps the job from being claimed."""
+        job = await self.backend.aenqueue("workout", "a@b.c", {})
+        await self.backend.aclaim()
+        await self.expire_lease(job["id"])
+
+        await self.backend.aheartbeat(job["id"])
+        self.assertIsNone(await self.backend.aclaim())
+
+    async def test_requeued_jobs_keep_their_attempts(self):
+        """Test that requeueing a job does not count the interrupted attempt."""
+        job = await self.backend.aenqueue("workout", "a@b.c", {})
+        await self.backend.aclaim()
+
+        await self.backend.arequeue(job["id"])
+        requeued = await self.backend.aget(job["id"])
+        self.assertEqual(requeued["status"], QUEUED)
+        self.assertEqual(requeued["attempts"], 0)
+        self.assertIsNone(requeued["lease_expires_at"])
+        self.assertEqual((await self.backend.aclaim())["attempts"], 1)
+
+    async def test_jobs_abandoned_too_often_fail(self):
+        """Test that jobs out of attempts are failed instead of claimed."""
+        job = await self.backend.aenqueue("workout", "a@b.c", {})
+        await self.backend.aclaim()
+        await self.expire_lease(job["id"], attempts=jobs.JOB_MAX_ATTEMPTS)
+
+        self.assertIsNone(await self.backend.aclaim())
+        failed = await self.backend.aget(job["id"])
+        self.assertEqual(failed["status"], FAILED)
+        self.assertEqual(
+            failed["error"], "The job was abandoned by its workers"
+        )
+
+    async def test_stopping_the_queue_requeues_running_jobs(self):
+        """Test that jobs interrupted by a shutdown are queued again."""
+        queue = JobQueue(self.backend, workers=1, poll_interval=0.01)
+        started = asyncio.Event()
+
+        @queue.handler("workout")
+        async def generate(user_email, payload):
+            started.set()
+            await asyncio.sleep(10)
+
+        queue.start()
+        job = await queue.submit("workout", "a@b.c", {})
+        await asyncio.wait_for(started.wait(), 1)
+        await queue.stop()
+
+        stopped = await self.backend.aget(job["id"])
+        self.assertEqual(stopped["status"], QUEUED)
+        self.assertEqual(stopped["attempts"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
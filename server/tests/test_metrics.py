@@ -0,0 +1,66 @@
+"""Tests for the request instrumentation."""
+
+import asyncio
+import inspect
+import unittest
+
+from metrics import Counter, Histogram, _request_spans, route_label, span, timed
+
+
+class HistogramTest(unittest.TestCase):
+    def test_render_cumulative_buckets(self):
+        histogram = Histogram(
+            "latency", "Latency.", ("route",), buckets=(0.1, 1)
+        )
+        histogram.observe(0.05, route="/a")
+        histogram.observe(0.5, route="/a")
+        histogram.observe(5, route="/a")
+
+        lines = histogram.render()
+        self.assertIn('latency_bucket{route="/a",le="0.1"} 1', lines)
+        self.assertIn('latency_bucket{route="/a",le="1"} 2', lines)
+        self.assertIn('latency_bucket{route="/a",le="+Inf"} 3', lines)
+        self.assertIn('latency_count{route="/a"} 3', lines)
+
+    def test_counter_labels(self):
+        counter = Counter("calls", "Calls.", ("outcome",))
+        counter.inc(outcome="success")
+        counter.inc(2, outcome="success")
+        self.assertEqual(counter.value(outcome="success"), 3)
+        self.assertEqual(counter.value(outcome="error"), 0)
+
+
+class SpanTest(unittest.TestCase):
+    def test_spans_are_summed_per_request(self):
+        spans = {}
+        token = _request_spans.set(spans)
+        try:
+            with span("db"):
+                pass
+            with span("db"):
+                pass
+        finally:
+            _request_spans.reset(token)
+        self.assertEqual(list(spans), ["db"])
+
+    def test_timed_keeps_signature(self):
+        @timed("test")
+        async def dependency(db: str = "session"):
+            return db
+
+        self.assertEqual(list(inspect.signature(dependency).parameters), ["db"])
+        self.assertEqual(asyncio.run(dependency()), "session")
+
+
+class RouteLabelTest(unittest.TestCase):
+    def test_prefix_is_kept(self):
+        class Route:
+            path = "/jobs/{job_id}"
+
+        scope = {"route": Route(), "path": "/api/jobs/123"}
+        self.assertEqual(route_label(scope), "/api/jobs/{job_id}")
+        self.assertEqual(route_label({"path": "/nope"}), "unmatched")
+
+
+if __name__ == "__main__":
+    unittest.main()
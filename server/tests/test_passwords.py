@@ -0,0 +1,38 @@
+"""Tests for the password hashing pool."""
+
+import asyncio
+import unittest
+
+from passlib.context import CryptContext
+
+from passwords import (
+    BCRYPT_ROUNDS,
+    PasswordHasher,
+    PasswordHasherBusy,
+    verify_and_update,
+)
+
+
+class TestPasswords(unittest.TestCase):
+    """Tests for rehashing and backpressure."""
+
+    def test_outdated_hashes_are_updated(self):
+        """Test that hashes with other bcrypt rounds are rehashed on login."""
+        cheap = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4)
+        valid, new_hash = verify_and_update("secret", cheap.hash("secret"))
+        self.assertTrue(valid)
+        self.assertIn(f"${BCRYPT_ROUNDS:02d}$", new_hash)
+
+        self.assertEqual(verify_and_update("secret", new_hash), (True, None))
+        self.assertEqual(verify_and_update("wrong", new_hash), (False, None))
+
+    def test_saturated_pool_rejects(self):
+        """Test that hashes beyond the pending limit are rejected."""
+        hasher = PasswordHasher(workers=1, max_pending=0)
+        with self.assertRaises(PasswordHasherBusy):
+            asyncio.run(hasher.hash("secret"))
+        self.assertEqual(hasher.rejected, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
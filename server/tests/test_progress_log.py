@@ -0,0 +1,130 @@
+"""Tests for the incremental progress aggregates."""
+
+import unittest
+from datetime import date
+from types import SimpleNamespace
+
+from progress_log import (
+    apply_event,
+    decode_cursor,
+    downsample,
+    encode_cursor,
+    events_from_snapshot,
+)
+from schemas import ProgressModel
+
+
+def new_progress(**fields):
+    defaults = {
+        "workouts_completed": 0,
+        "streak": 0,
+        "calories_burned": 0,
+        "last_workout_day": 0,
+        "personal_records": [],
+    }
+    return SimpleNamespace(**{**defaults, **fields})
+
+
+def event(kind, day, **fields):
+    defaults = {"value": None, "exercise": None, "record": None}
+    return SimpleNamespace(kind=kind, day=day, **{**defaults, **fields})
+
+
+class TestApplyEvent(unittest.TestCase):
+    """Tests for updating the aggregates with single events."""
+
+    def test_workout_streak(self):
+        """Test that consecutive days extend the streak and gaps reset it."""
+        progress = new_progress()
+        for day, streak in [(1, 1), (2, 2), (2, 2), (3, 3), (5, 1)]:
+            apply_event(
+                progress, event("workout", date(2025, 1, day), value=100)
+            )
+            self.assertEqual(progress.streak, streak)
+        self.assertEqual(progress.workouts_completed, 5)
+        self.assertEqual(progress.calories_burned, 500)
+        self.assertEqual(progress.last_workout_day, 20250105)
+
+    def test_latest_record_per_exercise(self):
+        """Test that only the latest personal record of an exercise is kept."""
+        progress = new_progress()
+        for day, record in [(5, "80kg"), (1, "70kg"), (9, "85kg")]:
+            apply_event(
+                progress,
+                event(
+                    "personal_record",
+                    date(2025, 1, day),
+                    exercise="Squat",
+                    record=record,
+                ),
+            )
+        self.assertEqual(
+            progress.personal_records,
+            [{"exercise": "Squat", "value": "85kg", "date": "2025-01-09"}],
+        )
+
+
+class TestEventsFromSnapshot(unittest.TestCase):
+    """Tests for translating full snapshots of older clients."""
+
+    def test_only_changes_become_events(self):
+        """Test that a snapshot only adds what changed since the last one."""
+        progress = new_progress(
+            workouts_completed=3,
+            calories_burned=900,
+            personal_records=[
+                {"exercise": "Squat", "value": "80kg", "date": "2025-01-05"}
+            ],
+        )
+        snapshot = ProgressModel(
+            weight=[
+                {"date": "2025-01-01", "value": 80},
+                {"date": "2025-01-08", "value": 79},
+            ],
+            workouts_completed=4,
+            streak=2,
+            calories_burned=1300,
+            last_workout_day=20250108,
+            personal_records=[
+                {"exercise": "Squat", "value": "80kg", "date": "2025-01-05"}
+            ],
+        )
+        events = events_from_snapshot(progress, date(2025, 1, 1), snapshot)
+        self.assertEqual(
+            events,
+            [
+                {"kind": "weight", "day": date(2025, 1, 8), "value": 79},
+                {"kind": "workout", "day": date(2025, 1, 8), "value": 400},
+            ],
+        )
+
+
+class TestHistoryQueries(unittest.TestCase):
+    """Tests for downsampling and pagination cursors."""
+
+    def test_weekly_averages(self):
+        """Test that weights are averaged per week, dated on its Monday."""
+        entries = [
+            {"date": "2025-01-06", "value": 80},
+            {"date": "2025-01-08", "value": 79},
+            {"date": "2025-01-13", "value": 78.5},
+        ]
+        self.assertEqual(
+            downsample(entries, "week"),
+            [
+                {"date": "2025-01-06", "value": 79.5},
+                {"date": "2025-01-13", "value": 78.5},
+            ],
+        )
+        self.assertEqual(downsample(entries, "day"), entries)
+
+    def test_cursor_round_trip(self):
+        """Test that cursors decode to the event they were made from."""
+        cursor = encode_cursor(SimpleNamespace(day=date(2025, 1, 6), id=42))
+        self.assertEqual(decode_cursor(cursor), (date(2025, 1, 6), 42))
+        with self.assertRaises(ValueError):
+            decode_cursor("not a cursor")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+"""Tests for the construction of prompts."""
+
+import unittest
+
+from models import Profile
+from prompt_builder import (
+    DIET_DAYS_PROMPT,
+    DIET_PLAN_PROMPT,
+    WORKOUT_PLAN_PROMPT,
+    PromptBudgetError,
+    estimate_tokens,
+    serialize_input,
+)
+from repair import lenient_loads
+from schemas import MealPlanModel, WorkoutPlanModel
+
+
+def load_example(name):
+    with open(f"examples/{name}", encoding="utf-8") as file:
+        return lenient_loads(file.read())
+
+
+def make_profile(i=1, **fields):
+    return Profile(
+        id=i,
+        user_email=f"{i}@example.com",
+        name=f"User {i}",
+        version=i,
+        age=30,
+        sex="male",
+        height=180,
+        weight=80,
+        fitness_level="intermediate",
+        **fields,
+    )
+
+
+class TestSerializeInput(unittest.TestCase):
+    def test_profiles_are_compact_json(self):
+        self.assertEqual(
+            serialize_input(make_profile(dietary_preference=None)),
+            '{"age":30,"fitness_level":"intermediate","height":180,'
+            '"sex":"male","weight":80}',
+        )
+
+    def test_strings_are_kept(self):
+        self.assertEqual(serialize_input(" Monday: Squat\n"), "Monday: Squat")
+
+
+class TestPromptTemplate(unittest.TestCase):
+    def setUp(self):
+        self.meals = load_example("mock-meals.json")
+
+    def test_prompts_carry_the_user_preferences(self):
+        """Test the size and inputs of the prompts of typical preferences."""
+        workout_preferences = WorkoutPlanModel(
+            workout_type="Strength", equipment_access=["Dumbbells"]
+        ).model_dump()
+        meal_preferences = MealPlanModel(
+            calories="medium", allergies=["Peanuts"]
+        ).model_dump()
+        workout = WORKOUT_PLAN_PROMPT.render(
+            goal=workout_preferences, biometrics=make_profile()
+        )
+        diet = DIET_PLAN_PROMPT.render(
+            goal=workout_preferences,
+            biometrics=make_profile(),
+            dietary_preferences=meal_preferences,
+        )
+        self.assertLess(estimate_tokens(workout), 350)
+        self.assertLess(estimate_tokens(diet), 450)
+        self.assertIn('"workout_type":"strength"', workout)
+        self.assertIn('"allergies":["peanuts"]', diet)
+        self.assertNotIn("object at 0x", workout + diet)
+
+    def test_users_share_the_instructions_prefix(self):
+        first = WORKOUT_PLAN_PROMPT.render(
+            goal="lose weight", biometrics=make_profile(1)
+        )
+        second = WORKOUT_PLAN_PROMPT.render(
+            goal="get strong", biometrics=make_profile(2)
+        )
+        self.assertTrue(first.startswith(WORKOUT_PLAN_PROMPT.prefix))
+        self.assertTrue(second.startswith(WORKOUT_PLAN_PROMPT.prefix))
+        self.assertNotIn("{goal}", WORKOUT_PLAN_PROMPT.prefix)
+
+    def test_budget(self):
+        inputs = {
+            "days": "Monday",
+            "other_days": "Tuesday: Squat\n" * 500,
+            "goal": "lose weight",
+            "biometrics": make_profile(),
+            "dietary_preferences": self.meals,
+        }
+        prompt = DIET_DAYS_PROMPT.render(budget=1000, **inputs)
+        self.assertNotIn("Tuesday: Squat", prompt)
+        self.assertLessEqual(estimate_tokens(prompt), 1000)
+        with self.assertRaises(PromptBudgetError):
+            DIET_DAYS_PROMPT.render(budget=100, **inputs)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+"""Tests for the model providers."""
+
+import asyncio
+import os
+import tempfile
+import unittest
+
+from models import ServerDietResponse, ServerWorkoutResponse
+from prompt_builder import DIET_DAYS_PROMPT, WORKOUT_PLAN_PROMPT
+from providers import (
+    LocalProvider,
+    ModelProvider,
+    RecordingProvider,
+    ReplayMissError,
+    ReplayProvider,
+    parse_mapping,
+)
+from repair import lenient_loads
+
+
+class TestLocalProvider(unittest.TestCase):
+    def setUp(self):
+        self.provider = LocalProvider(
+            5, models={"workout_days": "small"}, default_model="large"
+        )
+
+    def test_responses_are_valid_plans(self):
+        prompt = WORKOUT_PLAN_PROMPT.render(
+            goal="get strong", biometrics="none"
+        )
+        response = self.provider.invoke(prompt, request_type="workout")
+        ServerWorkoutResponse(**lenient_loads(response.content))
+        self.assertEqual(
+            response.content, self.provider.invoke(prompt, "workout").content
+        )
+        self.assertGreater(response.usage_metadata["input_tokens"], 0)
+
+    def test_days_requests_get_the_requested_days(self):
+        prompt = DIET_DAYS_PROMPT.render(
+            days="Tuesday, Friday",
+            other_days="none",
+            goal="lose weight",
+            biometrics="none",
+            dietary_preferences="vegan",
+        )
+        response = asyncio.run(
+            self.provider.ainvoke(prompt, request_type="diet_days")
+        )
+        output = lenient_loads(response.content)
+        ServerDietResponse(**output)
+        self.assertEqual(
+            [day["day"] for day in output["diet_plan"]], ["Tuesday", "Friday"]
+        )
+
+    def test_models_by_request_type(self):
+        self.assertEqual(self.provider.model("workout_days"), "small")
+        self.assertEqual(self.provider.model("diet"), "large")
+        self.assertEqual(
+            parse_mapping("diet= a , workout=b,"), {"diet": "a", "workout": "b"}
+        )
+
+    def test_failures(self):
+        provider = LocalProvider(5, failure_rate=1)
+        with self.assertRaises(TimeoutError):
+            provider.invoke("prompt", request_type="workout")
+        self.assertEqual((provider.calls, provider.failures), (1, 1))
+
+
+class TestModelProvider(unittest.TestCase):
+    def test_incomplete_providers_cannot_be_created(self):
+        class InvokeOnly(ModelProvider):
+            def invoke(self, prompt, request_type=None):
+                return None
+
+        with self.assertRaises(TypeError):
+            InvokeOnly(5)
+
+
+class TestReplayProvider(unittest.TestCase):
+    def setUp(self):
+        descriptor, self.path = tempfile.mkstemp(suffix=".jsonl")
+        os.close(descriptor)
+        self.addCleanup(os.remove, self.path)
+
+    def test_replays_recorded_responses(self):
+        recorder = RecordingProvider(LocalProvider(5), self.path)
+        recorded = recorder.invoke(
+            "first prompt", request_type="workout"
+        ).content
+
+        async def stream():
+            chunks = recorder.astream("diet prompt", request_type="diet")
+            return "".join([chunk.content async for chunk in chunks])
+
+        streamed = asyncio.run(stream())
+
+        replay = ReplayProvider(5, path=self.path)
+        self.assertEqual(
+            replay.invoke("first prompt", "workout").content, recorded
+        )
+        self.assertEqual(replay.invoke("diet prompt", "diet").content, streamed)
+        # Other prompts get the recorded responses of their request type
+        self.assertEqual(
+            replay.invoke("other prompt", "diet").content, streamed
+        )
+        with self.assertRaises(ReplayMissError):
+            replay.invoke("other prompt", "workout_days")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+"""Tests for the rate limits."""
+
+import asyncio
+import unittest
+
+from fastapi import HTTPException
+
+from ratelimit import InMemoryRateLimitBackend, Rate, RateLimiter, parse_rate
+
+
+class TestInMemoryBackend(unittest.TestCase):
+    def test_token_bucket(self):
+        backend = InMemoryRateLimitBackend()
+        rate = Rate(3, 60)
+        results = [backend.take("user", rate, now=0) for _ in range(4)]
+        self.assertEqual(
+            [allowed for allowed, _ in results], [True, True, True, False]
+        )
+        # One token comes back every 20 seconds
+        self.assertAlmostEqual(results[-1][1], 20)
+        self.assertEqual(backend.take("user", rate, now=10), (False, 10))
+        self.assertEqual(backend.take("user", rate, now=20), (True, 0))
+        self.assertTrue(backend.take("other", rate, now=20)[0])
+
+    def test_least_recently_used_buckets_are_dropped(self):
+        backend = InMemoryRateLimitBackend(max_keys=2)
+        rate = Rate(1, 60)
+        for key in ("a", "b", "c"):
+            backend.take(key, rate, now=0)
+        self.assertTrue(backend.take("a", rate, now=0)[0])
+        self.assertFalse(backend.take("c", rate, now=0)[0])
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate("5/60"), Rate(5, 60))
+        self.assertEqual(parse_rate("10"), Rate(10, 1))
+        self.assertIsNone(parse_rate(""))
+        self.assertIsNone(parse_rate("0"))
+
+    def test_global_budget_is_shared(self):
+        limiter = RateLimiter(
+            InMemoryRateLimitBackend(),
+            {"llm": {"user": Rate(5, 60), "global": Rate(2, 60)}},
+        )
+        asyncio.run(limiter.acheck("llm", "a@example.com"))
+        asyncio.run(limiter.acheck("llm", "b@example.com"))
+        with self.assertRaises(HTTPException) as raised:
+            asyncio.run(limiter.acheck("llm", "c@example.com"))
+        self.assertEqual(raised.exception.status_code, 429)
+        self.assertEqual(raised.exception.headers["Retry-After"], "30")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+"""Tests for the local repair of malformed LLM responses."""
+
+import asyncio
+import json
+import os
+import unittest
+from unittest import mock
+
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+
+from agent import CircuitBreaker, RetryPolicy, WorkoutTrainer  # noqa: E402
+from models import ServerWorkoutResponse  # noqa: E402
+from repair import coerce_int, lenient_loads, repair_response  # noqa: E402
+
+
+def load_workout_response():
+    with open("examples/workout_response.json", encoding="utf-8") as file:
+        return json.load(file)
+
+
+class TestLenientParsing(unittest.TestCase):
+    """Tests for the lenient JSON parser and the type coercion."""
+
+    def test_lenient_loads(self):
+        """Test that fences, prose, comments and trailing commas are
+        tolerated."""
+        text = (
+            "Here is your plan:\n```json\n"
+            '{"url": "http://a.b/c,]", // a comment\n'
+            ' "days": [1, 2, ], }\n```'
+        )
+        self.assertEqual(
+            lenient_loads(text), {"url": "http://a.b/c,]", "days": [1, 2]}
+        )
+        with self.assertRaises(ValueError):
+            lenient_loads("no json here")
+
+    def test_coerce_int(self):
+        """Test the coercion of numbers the model wrote as text."""
+        self.assertEqual(coerce_int("12 reps"), 12)
+        self.assertEqual(coerce_int("8-10"), 8)
+        self.assertEqual(coerce_int(60.4), 60)
+        with self.assertRaises(ValueError):
+            coerce_int("to failure")
+
+
+class TestRepairResponse(unittest.TestCase):
+    """Tests for the repair of whole plan responses."""
+
+    def test_coerces_and_reports_broken_days(self):
+        """Test that fixable days are kept and broken days are reported."""
+        response = load_workout_response()
+        days = response["workout"]
+        days[0]["exercises"][0]["reps"] = "10-12 reps"
+        days[1]["exercises"] = "rest"
+
+        output, broken = repair_response(
+            json.dumps(response) + ",", ServerWorkoutResponse
+        )
+        self.assertEqual(broken, [days[1]["day"]])
+        self.assertEqual(len(output["workout"]), len(days) - 1)
+        self.assertEqual(output["workout"][0]["exercises"][0]["reps"], 10)
+
+
+class TestSalvage(unittest.TestCase):
+    """Tests for the repair path of WorkoutTrainer."""
+
+    def setUp(self):
+        self.trainer = WorkoutTrainer()
+        for attribute, value in [
+            ("breaker", CircuitBreaker()),
+            ("retry_policy", RetryPolicy(base_delay=0, max_delay=0)),
+        ]:
+            patcher = mock.patch.object(self.trainer, attribute, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_only_broken_days_are_regenerated(self):
+        """Test that a malformed day is regenerated, not the whole plan."""
+        response = load_workout_response()
+        days = response["workout"]
+        broken_day = dict(days[2])
+        days[2] = {"day": broken_day["day"], "exercises": None}
+        salvaged = {"workout": [broken_day]}
+
+        llm = mock.Mock()
+        llm.ainvoke = mock.AsyncMock(
+            side_effect=[
+                mock.Mock(content=json.dumps(response)),
+                mock.Mock(content=json.dumps(salvaged)),
+            ]
+        )
+        with mock.patch.object(self.trainer, "llm", llm):
+            output = asyncio.run(
+                self.trainer._agenerate(
+                    "prompt",
+                    ServerWorkoutResponse,
+                    3,
+                    "workout",
+                    lambda days, output: "days prompt",
+                )
+            )
+
+        self.assertEqual(llm.ainvoke.call_count, 2)
+        self.assertEqual(llm.ainvoke.call_args.args, ("days prompt",))
+        self.assertEqual(output["workout"][2], broken_day)
+        self.assertEqual(len(output["workout"]), len(days))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,169 @@
+"""Tests for the retry policy and circuit breaker of the LLM calls."""
+
+import asyncio
+import os
+import unittest
+from unittest import mock
+
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+
+from agent import (  # noqa: E402
+    CircuitBreaker,
+    CircuitOpenError,
+    RetryPolicy,
+    WorkoutTrainer,
+    is_transient_error,
+)
+from models import ServerWorkoutResponse  # noqa: E402
+
+
+class RateLimited(Exception):
+    code = 429
+
+
+class ResourceExhausted(Exception):
+    pass
+
+
+class TestRetryPolicy(unittest.TestCase):
+    """Tests for the backoff and error classification."""
+
+    def test_backoff_is_bounded(self):
+        """Test that the jittered backoff never exceeds its ceiling."""
+        policy = RetryPolicy(base_delay=1, max_delay=5)
+        for attempt in range(1, 10):
+            ceiling = min(5, 2 ** (attempt - 1))
+            self.assertTrue(0 <= policy.backoff(attempt) <= ceiling)
+
+    def test_transient_errors(self):
+        """Test the classification of retryable errors."""
+        self.assertTrue(is_transient_error(TimeoutError()))
+        self.assertTrue(is_transient_error(RateLimited()))
+        self.assertTrue(is_transient_error(ResourceExhausted()))
+        self.assertFalse(is_transient_error(ValueError("bad request")))
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """Tests for the circuit breaker state machine."""
+
+    def test_opens_and_recovers(self):
+        """Test that the breaker opens on failures and closes after a trial."""
+        breaker = CircuitBreaker(
+            failure_rate=0.5, window=4, min_calls=4, reset_timeout=10
+        )
+        with mock.patch("agent.time.monotonic", return_value=0):
+            for _ in range(2):
+                breaker.record_success()
+                breaker.record_failure()
+            self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+            with self.assertRaises(CircuitOpenError):
+                breaker.before_call()
+
+        with mock.patch("agent.time.monotonic", return_value=11):
+            breaker.before_call()
+            # Only one trial call goes through while half open
+            with self.assertRaises(CircuitOpenError):
+                breaker.before_call()
+            breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertEqual(breaker.snapshot()["trips"], 1)
+        self.assertEqual(breaker.snapshot()["rejected"], 2)
+
+    def test_cancelled_trial_is_released(self):
+        """Test that a cancelled trial call lets the next call be the trial."""
+        breaker = CircuitBreaker(
+            failure_rate=0.5, window=2, min_calls=2, reset_timeout=10
+        )
+        with mock.patch("agent.time.monotonic", return_value=0):
+            breaker.record_failure()
+            breaker.record_failure()
+        with mock.patch("agent.time.monotonic", return_value=11):
+            breaker.before_call()
+            breaker.record_cancelled()
+            breaker.before_call()
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+
+
+class TestGenerateRetries(unittest.TestCase):
+    """Tests for the retry loop of WorkoutTrainer."""
+
+    def setUp(self):
+        self.trainer = WorkoutTrainer()
+        for attribute, value in [
+            ("breaker", CircuitBreaker()),
+            ("retry_policy", RetryPolicy(base_delay=0, max_delay=0)),
+        ]:
+            patcher = mock.patch.object(self.trainer, attribute, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_transient_errors_are_retried(self):
+        """Test that a rate limited call is retried and then succeeds."""
+        with open("examples/workout_response.json", encoding="utf-8") as file:
+            response = mock.Mock(content=file.read())
+        llm = mock.Mock()
+        llm.ainvoke = mock.AsyncMock(side_effect=[RateLimited(), response])
+
+        with mock.patch.object(self.trainer, "llm", llm):
+            output = asyncio.run(
+                self.trainer._agenerate(
+                    "prompt", ServerWorkoutResponse, 3, "workout"
+                )
+            )
+        self.assertIn("workout", output)
+        self.assertEqual(llm.ainvoke.call_count, 2)
+
+    def test_cancelled_calls_release_the_breaker(self):
+        """Test that a call cancelled during the trial does not keep the
+        breaker rejecting calls."""
+        llm = mock.Mock()
+        llm.ainvoke = mock.AsyncMock(side_effect=asyncio.CancelledError)
+        self.trainer.breaker.state = CircuitBreaker.HALF_OPEN
+
+        with mock.patch.object(self.trainer, "llm", llm):
+            with self.assertRaises(asyncio.CancelledError):
+                asyncio.run(
+                    self.trainer._agenerate(
+                        "prompt", ServerWorkoutResponse, 3, "workout"
+                    )
+                )
+        self.trainer.breaker.before_call()
+
+    def test_stalled_streams_time_out(self):
+        """Test that a stream whose provider stops sending chunks fails."""
+
+        async def astream(prompt, request_type=None):
+            await asyncio.sleep(10)
+            yield mock.Mock(content="")
+
+        async def consume():
+            stream = self.trainer._astream(
+                "prompt", ServerWorkoutResponse, "workout"
+            )
+            return [day async for day in stream]
+
+        llm = mock.Mock(astream=astream)
+        policy = RetryPolicy(call_timeout=0.01)
+        with (
+            mock.patch.object(self.trainer, "llm", llm),
+            mock.patch.object(self.trainer, "retry_policy", policy),
+        ):
+            with self.assertRaises(TimeoutError):
+                asyncio.run(consume())
+        self.assertEqual(self.trainer.limiter.active, 0)
+
+    def test_permanent_errors_are_raised(self):
+        """Test that non transient errors are not retried."""
+        llm = mock.Mock()
+        llm.invoke.side_effect = ValueError("bad request")
+
+        with mock.patch.object(self.trainer, "llm", llm):
+            with self.assertRaises(ValueError):
+                self.trainer._generate(
+                    "prompt", ServerWorkoutResponse, 3, "workout"
+                )
+        self.assertEqual(llm.invoke.call_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+"""Tests for JSON serialization and response compression."""
+
+import unittest
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from responses import CompressionMiddleware, FastJSONResponse, choose_encoding
+
+
+def make_client():
+    app = FastAPI(default_response_class=FastJSONResponse)
+    app.add_middleware(CompressionMiddleware, minimum_size=100)
+
+    @app.get("/large")
+    def large():
+        return FastJSONResponse(
+            {"days": ["Monday"] * 100}, headers={"ETag": '"plan-1-1"'}
+        )
+
+    @app.get("/small")
+    def small():
+        return {"ok": True}
+
+    return TestClient(app)
+
+
+class CompressionTest(unittest.TestCase):
+    def test_choose_encoding(self):
+        self.assertEqual(choose_encoding("gzip, deflate"), "gzip")
+        self.assertEqual(choose_encoding("*"), "gzip")
+        self.assertIsNone(choose_encoding("gzip;q=0, identity"))
+        self.assertIsNone(choose_encoding(""))
+
+    def test_large_responses_are_compressed(self):
+        response = make_client().get(
+            "/large", headers={"Accept-Encoding": "gzip"}
+        )
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+        self.assertEqual(response.headers["etag"], 'W/"plan-1-1"')
+        self.assertEqual(response.json(), {"days": ["Monday"] * 100})
+        self.assertLess(int(response.headers["content-length"]), 100)
+
+    def test_small_or_unaccepted_responses_are_not_compressed(self):
+        client = make_client()
+        small = client.get("/small", headers={"Accept-Encoding": "gzip"})
+        self.assertNotIn("content-encoding", small.headers)
+        self.assertEqual(small.json(), {"ok": True})
+
+        identity = client.get("/large", headers={"Accept-Encoding": "identity"})
+        self.assertNotIn("content-encoding", identity.headers)
+        self.assertEqual(identity.headers["etag"], '"plan-1-1"')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+"""Tests for the priority scheduling of model calls."""
+
+import asyncio
+import unittest
+
+from scheduler import (
+    BATCH,
+    INTERACTIVE,
+    REGENERATION,
+    PriorityScheduler,
+    prioritized,
+)
+
+WEIGHTS = {INTERACTIVE: 8, REGENERATION: 3, BATCH: 1}
+
+
+class TestPriorityScheduler(unittest.IsolatedAsyncioTestCase):
+    async def run_calls(self, scheduler, priorities):
+        """Queue a call of each priority behind a held slot, return the order
+        in which they ran."""
+        order = []
+
+        async def call(priority):
+            async with prioritized(priority), scheduler.ahold():
+                order.append(priority)
+                await asyncio.sleep(0)
+
+        held = await scheduler.acquire_async()
+        tasks = [asyncio.create_task(call(priority)) for priority in priorities]
+        await asyncio.sleep(0)
+        scheduler.release(held)
+        await asyncio.gather(*tasks)
+        return order
+
+    async def test_weighted_order(self):
+        scheduler = PriorityScheduler(1, WEIGHTS, {})
+        order = await self.run_calls(scheduler, [BATCH] * 3 + [INTERACTIVE] * 8)
+        # Interactive calls go first, but batch work is not starved
+        self.assertEqual(order[0], INTERACTIVE)
+        self.assertIn(BATCH, order[:9])
+        self.assertEqual(order.count(BATCH), 3)
+        self.assertEqual(scheduler.active, 0)
+
+    async def test_batch_share(self):
+        scheduler = PriorityScheduler(4, WEIGHTS, {BATCH: 0.5})
+        self.assertEqual(scheduler.caps[BATCH], 2)
+        async with prioritized(BATCH):
+            await scheduler.acquire_async()
+            await scheduler.acquire_async()
+            waiting = asyncio.create_task(scheduler.acquire_async())
+            await asyncio.sleep(0)
+        self.assertFalse(waiting.done())
+        self.assertEqual(scheduler.snapshot()["queued"][BATCH], 1)
+
+        # Free slots still go to other classes
+        async with prioritized(INTERACTIVE):
+            await asyncio.wait_for(scheduler.acquire_async(), 1)
+        scheduler.release(BATCH)
+        await asyncio.wait_for(waiting, 1)
+
+    async def test_release_charges_the_acquired_priority(self):
+        scheduler = PriorityScheduler(2, WEIGHTS, {})
+        async with prioritized(BATCH):
+            held = await scheduler.acquire_async()
+        # The context changed between acquiring and releasing the slot
+        async with prioritized(INTERACTIVE):
+            scheduler.release(held)
+        self.assertEqual(
+            scheduler.snapshot()["active"], dict.fromkeys(WEIGHTS, 0)
+        )
+
+    def test_every_class_needs_a_weight(self):
+        with self.assertRaises(ValueError):
+            PriorityScheduler(1, {INTERACTIVE: 8, BATCH: 1}, {})
+
+    async def test_cancelled_waiter_hands_on_its_slot(self):
+        scheduler = PriorityScheduler(1, WEIGHTS, {})
+        held = await scheduler.acquire_async()
+        cancelled = asyncio.create_task(scheduler.acquire_async())
+        await asyncio.sleep(0)
+        async with prioritized(BATCH):
+            waiting = asyncio.create_task(scheduler.acquire_async())
+            await asyncio.sleep(0)
+
+        # The slot is handed to the regeneration call, which is cancelled
+        # before it runs
+        scheduler.release(held)
+        cancelled.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await cancelled
+        await asyncio.wait_for(waiting, 1)
+        self.assertEqual(scheduler.snapshot()["active"][BATCH], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,21 @@
+"""Tests for the validation of request models."""
+
+import unittest
+
+from pydantic import ValidationError
+
+from schemas import PlanDaysModel
+
+
+class TestPlanDaysModel(unittest.TestCase):
+    def test_days_are_normalized(self):
+        request = PlanDaysModel(days=[" friday", "Monday", "FRIDAY"])
+        self.assertEqual(request.days, ["Friday", "Monday"])
+
+    def test_unknown_days_are_rejected(self):
+        with self.assertRaises(ValidationError):
+            PlanDaysModel(days=["Monday", "funday"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+"""Tests for the coalescing of in-flight calls."""
+
+import asyncio
+import threading
+import time
+import unittest
+
+from singleflight import SingleFlight
+
+
+class TestSingleFlight(unittest.TestCase):
+    """Tests for threaded and asyncio callers of SingleFlight."""
+
+    def test_threads_share_one_call(self):
+        """Test that concurrent threads with the same key run the call once."""
+        flights = SingleFlight()
+        calls = []
+        results = []
+
+        def generate():
+            calls.append(1)
+            time.sleep(0.05)
+            return {"workout": ["Monday"]}
+
+        def caller():
+            results.append(flights.do("key", generate))
+
+        threads = [threading.Thread(target=caller) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{"workout": ["Monday"]}] * 8)
+        self.assertEqual(flights.in_flight, 0)
+
+    def test_asyncio_tasks_share_one_call_and_failure(self):
+        """Test that concurrent tasks share the call and its exception."""
+        flights = SingleFlight()
+        calls = []
+
+        async def generate():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            raise TimeoutError("provider timeout")
+
+        async def main():
+            return await asyncio.gather(
+                *(flights.ado("key", generate) for _ in range(5)),
+                return_exceptions=True,
+            )
+
+        results = asyncio.run(main())
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(isinstance(r, TimeoutError) for r in results))
+        self.assertEqual(flights.followers, 4)
+
+    def test_different_keys_do_not_coalesce(self):
+        """Test that calls with different keys run independently."""
+        flights = SingleFlight()
+
+        async def generate(value):
+            await asyncio.sleep(0.01)
+            return value
+
+        async def main():
+            return await asyncio.gather(
+                flights.ado("a", generate, 1), flights.ado("b", generate, 2)
+            )
+
+        self.assertEqual(asyncio.run(main()), [1, 2])
+        self.assertEqual(flights.leaders, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
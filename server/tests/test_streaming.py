@@ -0,0 +1,61 @@
+"""Tests for the incremental parsing of streamed plans."""
+
+import asyncio
+import json
+import unittest
+
+from models import Workout
+from streaming import IncrementalArrayParser, ndjson_stream
+
+
+class TestIncrementalArrayParser(unittest.TestCase):
+    """Tests for IncrementalArrayParser."""
+
+    def load_text(self, file_path):
+        """Helper function to load a file as text."""
+
+        with open(file_path, "r", encoding="utf-8") as file:
+            return file.read()
+
+    def test_days_are_emitted_as_they_complete(self):
+        """Test that each day is returned by the chunk that completes it."""
+        text = "```json\n" + self.load_text("examples/workout_response.json")
+        expected = json.loads(text[len("```json\n") :])["workout"]
+
+        parser = IncrementalArrayParser("workout")
+        days = []
+        for i in range(0, len(text), 7):
+            for day in parser.feed(text[i : i + 7]):
+                Workout(**day)
+                self.assertEqual(day, expected[len(days)])
+                days.append(day)
+        self.assertEqual(days, expected)
+        self.assertTrue(parser.done)
+
+    def test_brackets_inside_strings(self):
+        """Test that brackets and escaped quotes in strings are ignored."""
+        parser = IncrementalArrayParser("diet_plan")
+        items = parser.feed('{"diet_plan": [{"day": "Mon } ] \\" {"}, ')
+        items += parser.feed('{"day": "Tue"}]}')
+        self.assertEqual(items, [{"day": 'Mon } ] " {'}, {"day": "Tue"}])
+
+
+class TestNdjsonStream(unittest.TestCase):
+    """Tests for ndjson_stream."""
+
+    def test_failures_end_with_an_error_event(self):
+        """Test that a provider error mid-stream is reported, not cut off."""
+
+        async def events():
+            yield {"type": "day", "day": {"day": "Monday"}}
+            raise ValueError("provider error")
+
+        async def collect():
+            return [json.loads(line) async for line in ndjson_stream(events())]
+
+        lines = asyncio.run(collect())
+        self.assertEqual([line["type"] for line in lines], ["day", "error"])
+
+
+if __name__ == "__main__":
+    unittest.main()